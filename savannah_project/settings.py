@@ -98,6 +98,7 @@ AUTHENTICATION_BACKENDS = (
     "django.contrib.auth.backends.ModelBackend",
 )
 MIDDLEWARE = [
+    'shop.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
      "whitenoise.middleware.WhiteNoiseMiddleware",
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -125,7 +126,8 @@ ROOT_URLCONF = 'savannah_project.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates that reports template render time to shop.metrics
+        'BACKEND': 'shop.metrics.TimedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -252,6 +254,95 @@ else:
     AFRICASTALKING_USERNAME=os.getenv('AFRICASTALKING_USERNAME', 'austino')
     AFRICASTALKING_API_KEY = os.getenv('AFRICASTALKING_API_KEY')
 
+# How shop.stock reserves units: "optimistic" (conditional F() update) or "locking" (SELECT ... FOR UPDATE)
+STOCK_RESERVATION_MODE = os.getenv('STOCK_RESERVATION_MODE', 'optimistic')
+
+# Order numbers: shop.order_numbers.SnowflakeGenerator (time + worker id + sequence),
+# SequenceGenerator (database counter) or RandomGenerator (legacy random hex)
+ORDER_NUMBER_GENERATOR = os.getenv('ORDER_NUMBER_GENERATOR', 'shop.order_numbers.SnowflakeGenerator')
+ORDER_NUMBER_WORKER_ID = os.getenv('ORDER_NUMBER_WORKER_ID')  # derived from host name + pid when unset
+ORDER_NUMBER_MAX_ATTEMPTS = 3
+
+# Seconds an Idempotency-Key response is replayed (expired keys are removed by `manage.py purge_idempotency_keys`)
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+
+# SMS gateway; use shop.sms.FakeBackend (with SMS_BACKEND_OPTIONS such as
+# {"latency": 0.2, "failure_rate": 0.1}) to run without the provider
+SMS_BACKEND = os.getenv('SMS_BACKEND', 'shop.sms.AfricasTalkingBackend')
+SMS_BACKEND_OPTIONS = {}
+SMS_MAX_RECIPIENTS_PER_CALL = 100
+
+# Order notification outbox (drained by `manage.py dispatch_notifications`)
+# Set ORDER_EMAIL_DIGEST_SECONDS to merge admin order emails into one digest per interval
+ORDER_EMAIL_DIGEST_SECONDS = int(os.getenv('ORDER_EMAIL_DIGEST_SECONDS', 0))
+# Seconds an idle SMTP session is kept open by shop.mailer before reconnecting
+EMAIL_CONNECTION_MAX_IDLE = 60
+# Seconds the admin recipient list is cached; other processes see staff changes after at most this long
+ADMIN_EMAILS_CACHE_TIMEOUT = 300
+NOTIFICATION_SMS_TRANSPORT = os.getenv('NOTIFICATION_SMS_TRANSPORT', 'shop.notifications.SMSTransport')
+NOTIFICATION_EMAIL_TRANSPORT = os.getenv('NOTIFICATION_EMAIL_TRANSPORT', 'shop.notifications.EmailTransport')
+NOTIFICATION_MAX_ATTEMPTS = 5
+NOTIFICATION_BACKOFF_SECONDS = 30
+NOTIFICATION_MAX_BACKOFF_SECONDS = 3600
+# Seconds a dispatcher holds the notifications it claimed while sending them; rows of a dispatcher
+# that dies mid-batch are retried after this long
+NOTIFICATION_LEASE_SECONDS = 300
+
+# Seconds a worker serves its in-memory category tree (shop.categories) before checking the database
+# for changes made by other workers; changes made in the worker itself are seen at once
+CATEGORY_TREE_CHECK_INTERVAL = 1.0
+
+# Keyset pagination of the product and customer list APIs (?page_size= is capped at the max)
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 200
+# Serialize product list pages from values() rows instead of model instances (same output)
+API_FAST_LIST_SERIALIZATION = True
+# Orders per page on the web "My Orders" page
+ORDERS_PAGE_SIZE = 20
+# Dashboard: cached per-user summary (keyed on the state of the user's orders) and the shared featured list
+DASHBOARD_CACHE_TIMEOUT = 600
+DASHBOARD_RECENT_ORDERS = 5
+DASHBOARD_FEATURED_PRODUCTS = 5
+
+# Cache-Control directives per URL name (keyword arguments of django.utils.cache.patch_cache_control).
+# These endpoints also answer If-None-Match / If-Modified-Since with 304, see shop.conditional.
+CACHE_CONTROL = {
+    'product-list-create': {'public': True, 'max_age': 30},
+    'category-list-create': {'public': True, 'max_age': 300},
+    'category-detail': {'public': True, 'max_age': 300},
+    'product-list': {'private': True, 'no_cache': True},
+}
+
+# Server-side cache of catalogue responses (shop.response_cache). Any configured cache alias works,
+# e.g. a FileBasedCache shared by all workers on one host:
+# CACHES = {'default': ..., 'responses': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+#                                         'LOCATION': BASE_DIR / 'cache' / 'responses'}}
+# `manage.py response_cache_stats` reads the hit/miss counters from this cache, so it needs a shared one;
+# each worker also exposes its own counts on /metrics
+RESPONSE_CACHE_ALIAS = os.getenv('RESPONSE_CACHE_ALIAS', 'default')
+RESPONSE_CACHE_TIMEOUT = 300
+# Seconds a worker keeps using its cached responses before checking the database for catalogue
+# changes made by other workers (whose invalidation may not reach a per-worker cache)
+RESPONSE_CACHE_CHECK_INTERVAL = 1.0
+
+# Country code given to national phone numbers ("0712...") when normalizing them to E.164 (shop.phones)
+PHONE_DEFAULT_COUNTRY_CODE = os.getenv('PHONE_DEFAULT_COUNTRY_CODE', '254')
+
+# Bulk product import (POST /api/products/import/, `manage.py import_products`): rows per bulk_create
+# batch, rows per committed transaction, and how many rejected rows are listed in the report
+PRODUCT_IMPORT_BATCH_SIZE = 1000
+PRODUCT_IMPORT_CHUNK_SIZE = 20000
+PRODUCT_IMPORT_MAX_REPORTED_ERRORS = 1000
+# Orders read per server-side cursor fetch (and rows per written chunk) by the order export
+ORDER_EXPORT_CHUNK_SIZE = 2000
+
+# Request metrics (shop.metrics): every request gets a Server-Timing header and lands in the duration
+# histograms on /metrics; METRICS_SAMPLE_RATE of them are also broken down into DB, serialize, render
+# and outbound-call time. Set METRICS_TOKEN to require "Authorization: Bearer <token>" on /metrics.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', '1') == '1'
+METRICS_SAMPLE_RATE = float(os.getenv('METRICS_SAMPLE_RATE', '0.1'))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 
 CSRF_TRUSTED_ORIGINS = ['https://savannah.austino.online','http://127.0.0.1:8000']
@@ -24,6 +24,8 @@ from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 from django.views.generic import RedirectView
 
+from shop.views import metrics_view
+
 schema_view = get_schema_view(
    openapi.Info(
       title="My API",
@@ -53,6 +55,7 @@ urlpatterns = [
     path('oidc/', include('mozilla_django_oidc.urls')),
     
      path("api/", include("shop.api_urls")),
+    path("metrics", metrics_view, name="metrics"),
     #  path("logout/", include("shop.urls")),
     path("logout/", redirect_to_shop_logout, name="logout"),
      re_path(r'^docs(?P<format>\.json|\.yaml)$',
@@ -1,12 +1,12 @@
 from django.contrib import admin
 from mptt.admin import MPTTModelAdmin
-from .models import Customer, Category, Product, Order, OrderItem
+from .models import Customer, Category, Product, Order, OrderItem, Notification
 
 
 @admin.register(Customer)
 class CustomerAdmin(admin.ModelAdmin):
     list_display = ('user', 'phone', 'created_at')
-    search_fields = ('user__username', 'user__email', 'phone')
+    search_fields = ('user__username', 'user__email', 'phone', 'phone_e164')
 
 
 @admin.register(Category)
@@ -34,3 +34,9 @@ class OrderAdmin(admin.ModelAdmin):
     list_filter = ('status', 'created_at')
     search_fields = ('order_number', 'customer__user__username')
     inlines = [OrderItemInline]
+
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ('id', 'channel', 'order', 'status', 'attempts', 'next_attempt_at')
+    list_filter = ('channel', 'status')
@@ -1,14 +1,231 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from django.db.models import Prefetch, prefetch_related_objects
 from .models import Product, Customer, Category, Order, OrderItem
+from .categories import attach_product_tree_data, attach_tree_data
+from .metrics import timed
 
 
-class CategorySerializer(serializers.ModelSerializer):
+# -------- Sparse fieldsets --------
+def parse_field_spec(value):
+    """
+    "id,name,category_detail.name" -> {"id": {}, "name": {}, "category_detail": {"name": {}}}.
+    None or "" -> None (no restriction).
+    """
+    if not value:
+        return None
+    spec = {}
+    for path in value.split(","):
+        node = spec
+        for part in path.strip().split("."):
+            if part:
+                node = node.setdefault(part, {})
+    return spec or None
+
+
+def _model_field(model, name):
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+
+
+class SparseFieldsMixin:
+    """
+    ?fields=id,name,category_detail.name keeps only those fields (dotted
+    names reach into nested serializers); ?expand=customer renders the
+    relations listed in Meta.expandable_fields as nested objects instead of
+    ids. Without either parameter the output is unchanged.
+
+    Fields that are not output are not computed, and optimize_queryset()
+    loads only what the remaining fields need. Fields backed by properties
+    declare their columns in Meta.field_sources; any other non-column field
+    makes its serializer load every column.
+    """
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None or expand is not None:
+            self._sparse = (fields, expand or {})
+
+    @property
+    @timed("serialize")
+    def data(self):
+        return super().data
+
+    def _sparse_spec(self):
+        spec = getattr(self, "_sparse", None)
+        if spec is not None:
+            return spec
+        root = self.parent is None or (isinstance(self.parent, serializers.ListSerializer) and self.parent.parent is None)
+        request = self.context.get("request")
+        if root and request is not None:
+            params = getattr(request, "query_params", request.GET)
+            return parse_field_spec(params.get("fields")), parse_field_spec(params.get("expand")) or {}
+        return None, {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selected, expand = self._sparse_spec()
+        for name, target in getattr(self.Meta, "expandable_fields", {}).items():
+            if name in expand:
+                serializer_class = globals()[target] if isinstance(target, str) else target
+                fields[name] = serializer_class(read_only=True)
+        if selected is not None:
+            # writable fields stay (see _readable_fields) so ?fields= never changes what a POST accepts
+            fields = {name: field for name, field in fields.items() if name in selected or not field.read_only}
+        for name, field in fields.items():
+            child = getattr(field, "child", field)
+            if isinstance(child, SparseFieldsMixin):
+                child._sparse = ((selected or {}).get(name) or None, expand.get(name, {}))
+        return fields
+
+    @property
+    def _readable_fields(self):
+        selected, _ = self._sparse_spec()
+        for field in super()._readable_fields:
+            if selected is None or field.field_name in selected:
+                yield field
+
+    def _query_plan(self, model, prefix=""):
+        """(columns for only() or None for all, select_related paths, prefetches) for these fields."""
+        only, select, prefetch = {prefix + model._meta.pk.name}, [], []
+        complete = True
+        for field in self._readable_fields:
+            name, source = field.field_name, field.source
+            child = getattr(field, "child", field)
+            if isinstance(child, SparseFieldsMixin):
+                relation = _model_field(model, source)
+                if relation is None:
+                    complete = False
+                elif relation.many_to_one or (relation.one_to_one and relation.concrete):
+                    path = prefix + source
+                    sub_only, sub_select, sub_prefetch = child._query_plan(relation.related_model, path + "__")
+                    if sub_only is None:
+                        sub_only = {f"{path}__{f.name}" for f in relation.related_model._meta.concrete_fields}
+                    only |= {path} | sub_only
+                    select += [path] + sub_select
+                    prefetch += sub_prefetch
+                else:
+                    # reverse foreign key: a separate query shaped by the child serializer
+                    queryset = child.optimize_queryset(relation.related_model.objects.all(), [relation.field.name])
+                    prefetch.append(Prefetch(prefix + source, queryset=queryset))
+                continue
+            for dependency in getattr(self.Meta, "field_sources", {}).get(name, [source]):
+                model_field = _model_field(model, dependency)
+                if model_field is None or not model_field.concrete:
+                    complete = False
+                else:
+                    only.add(prefix + dependency)
+        return (only if complete else None), select, prefetch
+
+    def optimize_queryset(self, queryset, extra_fields=()):
+        """`queryset` with only(), select_related() and prefetch_related() matching the fields output."""
+        only, select, prefetch = self._query_plan(queryset.model)
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        if only is not None:
+            queryset = queryset.only(*only, *extra_fields)
+        return queryset
+
+
+# -------- List serializers --------
+def attach_category_data(category_serializer, categories):
+    """The bulk work a CategorySerializer needs before rendering `categories`, for the fields it outputs."""
+    fields = {field.field_name for field in category_serializer._readable_fields}
+    categories = [c for c in categories if c is not None]
+    if "parent" in fields:
+        prefetch_related_objects(categories, "parent")
+    if "full_path" in fields:
+        attach_tree_data([c for c in categories if not hasattr(c, "_full_path")])
+
+
+def _category_sources(serializer):
+    """The attributes `serializer` reads off `category` through dotted sources (e.g. "category.full_path")."""
+    return {
+        field.source_attrs[1] for field in serializer._readable_fields
+        if len(field.source_attrs) > 1 and field.source_attrs[0] == "category"
+    }
+
+
+class TimedListSerializer(serializers.ListSerializer):
+    """Counts the time spent building `data` as "serialize" time (see shop.metrics)."""
+
+    @property
+    @timed("serialize")
+    def data(self):
+        return super().data
+
+
+class TreeDataListSerializer(TimedListSerializer):
+    """
+    List serializer that computes category paths and child counts for the
+    whole list up front (see shop.categories.attach_tree_data) instead of
+    once per row.
+    """
+
+    def attach(self, items):
+        """Do the bulk work for `items` before they are rendered; subclasses say what. Nothing by default."""
+
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        self.attach(items)
+        return super().to_representation(items)
+
+
+class CategoryTreeListSerializer(TreeDataListSerializer):
+    def attach(self, categories):
+        attach_category_data(self.child, categories)
+
+
+class ProductTreeListSerializer(TreeDataListSerializer):
+    def attach(self, products):
+        category = self.child.fields.get("category_detail")
+        sources = _category_sources(self.child)
+        if category is not None:
+            prefetch_related_objects(products, "category")
+            attach_category_data(category, [p.category for p in products])
+        elif "full_path" in sources:
+            attach_product_tree_data(products)
+        elif sources:
+            prefetch_related_objects(products, "category")
+
+
+class OrderItemTreeListSerializer(TreeDataListSerializer):
+    def attach(self, order_items):
+        product = self.child.fields.get("product_detail")
+        category = product.fields.get("category_detail") if product is not None else None
+        if product is not None:
+            prefetch_related_objects(order_items, "product")
+        if category is not None:
+            products = [item.product for item in order_items]
+            prefetch_related_objects(products, "category")
+            attach_category_data(category, [p.category for p in products])
+
+
+class OrderTreeListSerializer(TreeDataListSerializer):
+    def attach(self, orders):
+        # one tree query for the items of every order, instead of one per order
+        items = self.child.fields.get("items")
+        if items is not None:
+            prefetch_related_objects(orders, "items")
+            items.attach([item for order in orders for item in order.items.all()])
+
+
+class CategorySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     parent = serializers.CharField(required=False, allow_null=True)
 
     class Meta:
         model = Category
         fields = ["id", "name", "description", "parent", "full_path", "created_at", "updated_at"]
+        list_serializer_class = CategoryTreeListSerializer
+        expandable_fields = {"parent": "CategorySerializer"}
+        # full_path falls back to get_ancestors() when it was not attached in bulk
+        field_sources = {"full_path": ["parent", "tree_id", "lft", "rght", "level"]}
 
     def create(self, validated_data):
         parent_value = validated_data.pop("parent", None)
@@ -43,7 +260,7 @@ class CategorySerializer(serializers.ModelSerializer):
 
 #         return Product.objects.create(category=category_obj, **validated_data)
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     category_id = serializers.IntegerField(required=False, write_only=True)
     category_name = serializers.CharField(required=False, write_only=True)
     category_detail = CategorySerializer(source="category", read_only=True)
@@ -56,6 +273,7 @@ class ProductSerializer(serializers.ModelSerializer):
             "category_id", "category_name",  "category_detail"
         )
         read_only_fields = ("category",)
+        list_serializer_class = ProductTreeListSerializer
 
     def create(self, validated_data):
         category_id = validated_data.pop("category_id", None)
@@ -73,10 +291,84 @@ class ProductSerializer(serializers.ModelSerializer):
         return Product.objects.create(category=category, **validated_data)
 
 
-class CustomerSerializer(serializers.ModelSerializer):
+class ProductFastListSerializer:
+    """
+    Read-only list serialization for products that skips the per-row DRF
+    machinery. Rows come from a values() query of exactly the needed
+    columns, each distinct category is serialized once with
+    CategorySerializer, and the output matches ProductSerializer(many=True)
+    field for field, including ?fields= and ?expand=.
+    """
+    serializer_class = ProductSerializer
+    # not necessarily output, but shop.pagination builds cursors from them
+    key_columns = ("id", "created_at", "price")
+    nested = {"category_detail": "category_id"}
+    # values() already hands these back as the JSON type DRF would produce
+    passthrough = (serializers.CharField, serializers.IntegerField, serializers.BooleanField)
+
+    def __init__(self, rows, context=None):
+        self.rows = rows
+        self.context = context or {}
+
+    @classmethod
+    def _readable(cls, context):
+        return {field.field_name: field for field in cls.serializer_class(context=context or {})._readable_fields}
+
+    @classmethod
+    def values(cls, queryset, context=None):
+        columns = set(cls.key_columns)
+        for name, field in cls._readable(context).items():
+            columns.add(cls.nested.get(name, field.source))
+        return queryset.values(*columns)
+
+    def _fields(self, readable):
+        """(name, column, converter) for each readable field, in serializer order."""
+        fields = []
+        for name, field in readable.items():
+            if name in self.nested:
+                fields.append((name, self.nested[name], None))
+            elif isinstance(field, self.passthrough):
+                fields.append((name, field.source, None))
+            else:
+                fields.append((name, field.source, field.to_representation))
+        return fields
+
+    def _categories(self, nested, category_ids):
+        selected, expand = getattr(nested, "_sparse", (None, {}))
+        categories = list(Category.objects.filter(id__in=category_ids))
+        data = CategorySerializer(categories, many=True, fields=selected, expand=expand).data
+        return {category.id: item for category, item in zip(categories, data)}
+
+    @property
+    @timed("serialize")
+    def data(self):
+        rows = list(self.rows)
+        readable = self._readable(self.context)
+        categories = {}
+        if "category_detail" in readable:
+            categories = self._categories(readable["category_detail"], {row["category_id"] for row in rows})
+        fields = self._fields(readable)
+        data = []
+        for row in rows:
+            item = {}
+            for name, column, convert in fields:
+                value = row[column]
+                if name in self.nested:
+                    item[name] = categories.get(value)
+                elif convert is not None and value is not None:
+                    item[name] = convert(value)
+                else:
+                    item[name] = value
+            data.append(item)
+        return data
+
+
+class CustomerSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Customer
         fields = ["id", "user", "phone", "address"]
+        list_serializer_class = TimedListSerializer
+        expandable_fields = {"user": "UserSerializer"}
 
 
 # class UserSerializer(serializers.ModelSerializer):
@@ -85,12 +377,13 @@ class CustomerSerializer(serializers.ModelSerializer):
 #     class Meta:
 #         model = User
 #         fields = ["id", "username", "first_name", "last_name", "email", "phone"]
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     phone = serializers.CharField(write_only=True)  # accept phone but don't try to store on User
 
     class Meta:
         model = User
         fields = ("id", "username", "password", "first_name", "last_name", "phone")
+        list_serializer_class = TimedListSerializer
         extra_kwargs = {"password": {"write_only": True}}
 
     def create(self, validated_data):
@@ -103,17 +396,21 @@ class UserSerializer(serializers.ModelSerializer):
         Customer.objects.create(user=user, phone=phone)
         return user
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     product_detail = ProductSerializer(source="product", read_only=True)
 
     class Meta:
         model = OrderItem
         fields = ["product", "product_detail", "quantity", "unit_price", "subtotal"]
+        list_serializer_class = OrderItemTreeListSerializer
+        field_sources = {"subtotal": ["quantity", "unit_price"]}
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
 
     class Meta:
         model = Order
         fields = ["id", "order_number", "customer", "status", "total_amount", "items", "created_at"]
+        list_serializer_class = OrderTreeListSerializer
+        expandable_fields = {"customer": "CustomerSerializer"}
@@ -6,9 +6,11 @@ urlpatterns = [
     path("categories/", api_views.CategoryListCreateView.as_view(), name="category-list-create"),
     path("categories/<int:pk>/", api_views.CategoryDetailView.as_view(), name="category-detail"),
     path("categories/<int:pk>/avg-price/", api_views.CategoryAvgPriceView.as_view(), name="category-avg-price"),
+    path("categories/<int:pk>/price-stats/", api_views.CategoryPriceStatsView.as_view(), name="category-price-stats"),
 
     # Products
     path("products/", api_views.ProductListCreateView.as_view(), name="product-list-create"),
+    path("products/import/", api_views.ProductImportView.as_view(), name="product-import"),
     # path("products/", api_views.ProductListCreateView.as_view(), name="product-list"),  # GET (list w/ filters), POST (create)
 
 
@@ -22,7 +24,9 @@ urlpatterns = [
     path("users/", api_views.UserCreateView.as_view(), name="user-create"),
 
     # Orders
-    path("orders/", api_views.OrderCreateView.as_view(), name="order-create"),
+    path("orders/", api_views.OrderListCreateView.as_view(), name="order-create"),
+    path("orders/export/", api_views.OrderExportView.as_view(), name="order-export"),
+    path("orders/<str:order_number>/", api_views.OrderDetailView.as_view(), name="order-detail"),
 ]
 
 
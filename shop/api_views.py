@@ -1,22 +1,47 @@
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.db.models import Avg
-from rest_framework import generics, status
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from rest_framework import generics, permissions, status
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from .models import Product, Category, Customer, Order, OrderItem
 from .api_serializers import (
     ProductSerializer, CustomerSerializer, UserSerializer,
-    CategorySerializer, OrderSerializer
+    CategorySerializer, OrderSerializer, ProductFastListSerializer
 )
-from .views import send_confirmation_messages
+from .conditional import conditional_get, category_state, product_state
+from .response_cache import cached_response
+from .idempotency import idempotent, IdempotentCreateMixin
+from .phones import digits_only, normalize_phone, normalize_phone_prefix
+from .pagination import ProductKeysetPagination, CustomerKeysetPagination, OrderKeysetPagination
+from .orders import create_order, filter_orders, OrderItemsError
+from .order_export import export_orders, FORMATS as EXPORT_FORMATS
+from .product_import import import_products, format_for, ImportFormatError, ImportReport
+from .price_stats import get_stats
+from .stock import OutOfStock
+from .notifications import queue_confirmation_messages
+
+class SparseFieldsViewMixin:
+    """Shape the queryset to the fields requested with ?fields= / ?expand= (see SparseFieldsMixin)."""
+
+    def filter_queryset(self, queryset):
+        return self.get_serializer().optimize_queryset(super().filter_queryset(queryset))
+
 
 # -------- Categories --------
-class CategoryListCreateView(generics.ListCreateAPIView):
+@method_decorator([conditional_get(category_state), cached_response("category-list-create")], name="dispatch")
+class CategoryListCreateView(SparseFieldsViewMixin, IdempotentCreateMixin, generics.ListCreateAPIView):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
 
 
-class CategoryDetailView(generics.RetrieveAPIView):
+@method_decorator([conditional_get(category_state), cached_response("category-detail")], name="dispatch")
+class CategoryDetailView(SparseFieldsViewMixin, generics.RetrieveAPIView):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
 
@@ -24,13 +49,37 @@ class CategoryDetailView(generics.RetrieveAPIView):
 class CategoryAvgPriceView(APIView):
     def get(self, request, pk):
         try:
-            category = Category.objects.get(pk=pk)
+            stats = get_stats(pk)
+        except Category.DoesNotExist:
+            return Response({"error": "Category not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        return Response({"category": stats.category.name, "average_price": stats.subtree_avg})
+
+
+class CategoryPriceStatsView(APIView):
+    """
+    GET: Count, sum, min, max and average price of a category's products,
+    for the category itself ("direct") and including its descendants ("subtree").
+    """
+    def get(self, request, pk):
+        try:
+            stats = get_stats(pk)
         except Category.DoesNotExist:
             return Response({"error": "Category not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        products = Category.get_products_for_category(category.id)
-        avg_price = products.aggregate(avg=Avg("price"))["avg"]
-        return Response({"category": category.name, "average_price": avg_price})
+        return Response({
+            "category": stats.category.name,
+            **{
+                scope: {
+                    "count": getattr(stats, f"{scope}_count"),
+                    "sum": getattr(stats, f"{scope}_sum"),
+                    "min_price": getattr(stats, f"{scope}_min"),
+                    "max_price": getattr(stats, f"{scope}_max"),
+                    "average_price": getattr(stats, f"{scope}_avg"),
+                }
+                for scope in ("direct", "subtree")
+            },
+        })
 
 
 # -------- Products --------
@@ -55,16 +104,19 @@ class CategoryAvgPriceView(APIView):
 #             product = serializer.save()
 #             return Response(ProductSerializer(product).data, status=status.HTTP_201_CREATED)
 #         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-class ProductListCreateView(generics.ListCreateAPIView):
+@method_decorator([conditional_get(product_state), cached_response("product-list-create")], name="dispatch")
+class ProductListCreateView(SparseFieldsViewMixin, IdempotentCreateMixin, generics.ListCreateAPIView):
     """
-    GET: List all products (optionally filter by category_id or category_name).
+    GET: List products a page at a time (optionally filter by category_id or category_name,
+         or rank them against ?search=).
     POST: Create a new product.
     """
     serializer_class = ProductSerializer
+    pagination_class = ProductKeysetPagination
     queryset = Product.objects.all()
 
     def get_queryset(self):
-        queryset = Product.objects.all()
+        queryset = Product.objects.select_related("category")
         category_id = self.request.query_params.get("category_id")
         category_name = self.request.query_params.get("category_name")
 
@@ -75,6 +127,43 @@ class ProductListCreateView(generics.ListCreateAPIView):
 
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        if not getattr(settings, "API_FAST_LIST_SERIALIZATION", True):
+            return super().list(request, *args, **kwargs)
+        context = self.get_serializer_context()
+        queryset = ProductFastListSerializer.values(self.filter_queryset(self.get_queryset()), context)
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(ProductFastListSerializer(page, context).data)
+
+class ProductImportView(APIView):
+    """
+    POST: Create or update products in bulk from a CSV (text/csv) or NDJSON
+          (application/x-ndjson) body, or from a multipart upload in `file`.
+          The body is read a line at a time; the response counts created and
+          updated rows and lists the rejected ones by line number.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request):
+        upload = request.FILES.get("file") if request.content_type.startswith("multipart/") else None
+        if upload is not None:
+            stream, fmt = upload, format_for(upload.name) or format_for(upload.content_type)
+        else:
+            stream, fmt = request.stream or [], format_for(request.content_type)
+        if fmt is None:
+            return Response(
+                {"error": "Send text/csv or application/x-ndjson, or upload a .csv or .ndjson file."},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            )
+
+        report = ImportReport()
+        try:
+            import_products(stream, fmt, report=report)
+        except ImportFormatError as e:
+            return Response({"error": str(e), **report.as_dict()}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report.as_dict())
+
+
 # -------- Customers --------
 # class CustomerListCreateView(generics.ListCreateAPIView):
 #     queryset = Customer.objects.all()
@@ -91,12 +180,15 @@ class ProductListCreateView(generics.ListCreateAPIView):
 #             queryset = queryset.filter(user_id=user_id)
 
 #         return queryset
-class CustomerListCreateView(generics.ListCreateAPIView):
+class CustomerListCreateView(SparseFieldsViewMixin, IdempotentCreateMixin, generics.ListCreateAPIView):
     """
-    GET: List all customers (filterable by phone or user_id).
+    GET: List customers a page at a time (filterable by phone or user_id).
+         ?phone= matches the normalized number; ?phone_match=prefix (default),
+         exact or suffix (the last digits) picks how.
     POST: Create a new customer.
     """
     serializer_class = CustomerSerializer
+    pagination_class = CustomerKeysetPagination
     queryset = Customer.objects.all()
 
     def get_queryset(self):
@@ -105,12 +197,24 @@ class CustomerListCreateView(generics.ListCreateAPIView):
         user_id = self.request.query_params.get("user_id")
 
         if phone:
-            queryset = queryset.filter(phone__icontains=phone)
+            queryset = self.filter_phone(queryset, phone, self.request.query_params.get("phone_match", "prefix"))
         if user_id:
             queryset = queryset.filter(user_id=user_id)
 
         return queryset
 
+    def filter_phone(self, queryset, phone, mode):
+        # every mode is an exact or LIKE 'prefix%' lookup on an indexed, normalized column
+        if mode == "exact":
+            value, lookup = normalize_phone(phone), "phone_e164"
+        elif mode == "prefix":
+            value, lookup = normalize_phone_prefix(phone), "phone_e164__startswith"
+        elif mode == "suffix":
+            value, lookup = digits_only(phone)[::-1], "phone_digits_reversed__startswith"
+        else:
+            raise ValidationError({"phone_match": "Choose one of: exact, prefix, suffix."})
+        return queryset.filter(**{lookup: value}) if value else queryset.none()
+
 
 # -------- Users --------
 # class UserCreateView(APIView):
@@ -131,15 +235,50 @@ class CustomerListCreateView(generics.ListCreateAPIView):
 #             return Response(serializer.data, status=status.HTTP_201_CREATED)
 #         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 class UserCreateView(APIView):
+    @idempotent
     def post(self, request):
         serializer = UserSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.save()  # serializer handles Customer creation
-            return Response(UserSerializer(user).data, status=status.HTTP_201_CREATED)
+            return Response(UserSerializer(user, context={"request": request}).data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 # -------- Orders --------
-class OrderCreateView(APIView):
+class CustomerOrdersMixin:
+    """Orders of the authenticated customer only; anyone else gets an empty queryset."""
+    serializer_class = OrderSerializer
+
+    def get_queryset(self):
+        customer = getattr(self.request.user, "customer", None)
+        if customer is None:
+            return Order.objects.none()
+        return Order.objects.filter(customer=customer)
+
+
+class OrderListCreateView(SparseFieldsViewMixin, CustomerOrdersMixin, generics.ListAPIView):
+    """
+    GET: The authenticated customer's orders a page at a time, newest first.
+         ?status=pending,shipped filters by status; ?date_from= and ?date_to=
+         (dates or datetimes, inclusive) by creation time.
+    POST: Place an order for customer_id.
+    """
+    pagination_class = OrderKeysetPagination
+
+    def get_permissions(self):
+        if self.request.method == "POST":
+            return super().get_permissions()
+        return [permissions.IsAuthenticated()]
+
+    def get_queryset(self):
+        params = self.request.query_params
+        try:
+            return filter_orders(
+                super().get_queryset(), params.get("status"), params.get("date_from"), params.get("date_to")
+            )
+        except DjangoValidationError as e:
+            raise ValidationError(e.message_dict)
+
+    @idempotent
     def post(self, request):
         customer_id = request.data.get("customer_id")
         items = request.data.get("items")
@@ -152,25 +291,56 @@ class OrderCreateView(APIView):
         except Customer.DoesNotExist:
             return Response({"error": "Customer not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        order = Order.objects.create(customer=customer)
-
-        for item in items:
-            product_id = item.get("product_id")
-            quantity = int(item.get("quantity", 1))
-            try:
-                product = Product.objects.get(pk=product_id)
-            except Product.DoesNotExist:
-                return Response({"error": f"Product {product_id} not found"}, status=status.HTTP_404_NOT_FOUND)
-
-            OrderItem.objects.create(
-                order=order,
-                product=product,
-                quantity=quantity,
-                unit_price=product.price
-            )
-
-        order.calculate_total()
-        serializer = OrderSerializer(order)
-        messages_results=send_confirmation_messages(customer=customer,user=customer.user,order=order,product=product,quantity=quantity)
-        
+        try:
+            with transaction.atomic():
+                order, order_items = create_order(customer, items)
+                last_item = order_items[-1]
+                product, quantity = last_item.product, last_item.quantity
+                messages_results = queue_confirmation_messages(
+                    customer=customer, user=customer.user, order=order, product=product, quantity=quantity
+                )
+        except OrderItemsError as e:
+            if e.missing_product_ids:
+                return Response(
+                    {"error": e.message, "missing_product_ids": e.missing_product_ids},
+                    status=status.HTTP_404_NOT_FOUND,
+                )
+            return Response({"error": e.message}, status=status.HTTP_400_BAD_REQUEST)
+        except OutOfStock as e:
+            return Response({"error": str(e), "shortages": e.shortages}, status=status.HTTP_409_CONFLICT)
+
+        serializer = OrderSerializer(order, context={"request": request})
         return Response({"order":serializer.data,"confirmation_messages":messages_results}, status=status.HTTP_201_CREATED)
+
+
+class OrderDetailView(SparseFieldsViewMixin, CustomerOrdersMixin, generics.RetrieveAPIView):
+    """GET: One of the authenticated customer's orders, by order number."""
+    permission_classes = [permissions.IsAuthenticated]
+    lookup_field = "order_number"
+
+
+class OrderExportView(APIView):
+    """
+    GET: Every order item matching ?status= / ?date_from= / ?date_to= (as on
+         the order list), streamed as ?export_format=csv (default), ndjson or
+         columnar without loading the result set into memory. Staff only.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        params = request.query_params
+        fmt = params.get("export_format", "csv")
+        if fmt not in EXPORT_FORMATS:
+            raise ValidationError({"export_format": f"Choose one of: {', '.join(EXPORT_FORMATS)}."})
+        try:
+            orders = filter_orders(
+                Order.objects.all(), params.get("status"), params.get("date_from"), params.get("date_to")
+            )
+        except DjangoValidationError as e:
+            raise ValidationError(e.message_dict)
+
+        _, content_type, extension = EXPORT_FORMATS[fmt]
+        response = StreamingHttpResponse(export_orders(orders, fmt), content_type=content_type)
+        filename = f"orders-{timezone.localdate():%Y%m%d}.{extension}"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
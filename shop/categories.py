@@ -0,0 +1,180 @@
+import threading
+from bisect import bisect_left
+from time import monotonic
+
+from django.conf import settings
+from django.db.models import Count, Max, prefetch_related_objects
+
+from .conditional import touch_catalogue
+from .models import Category
+
+_lock = threading.Lock()
+_tree = None
+
+
+class _CategoryTree:
+    """
+    In-memory snapshot of the MPTT tree structure. Subtree and ancestor id
+    sets are computed from (tree_id, lft) order on first use and memoized.
+    """
+
+    def __init__(self, version):
+        self.version = version
+        self.checked_at = monotonic()
+        rows = list(
+            Category.objects.order_by("tree_id", "lft").values_list("id", "tree_id", "lft", "rght", "level", "name")
+        )
+        self.nodes = [row[:4] for row in rows]
+        # (id, level, name) in tree order, for indented selectors
+        self.outline = [(pk, level, name) for pk, _, _, _, level, name in rows]
+        self.keys = [(tree_id, lft) for _, tree_id, lft, _ in self.nodes]
+        self.position = {node[0]: i for i, node in enumerate(self.nodes)}
+        self.subtrees = {}
+        self.ancestors = {}
+
+    def subtree_ids(self, category_id):
+        ids = self.subtrees.get(category_id)
+        if ids is None:
+            i = self.position[category_id]
+            _, tree_id, _, rght = self.nodes[i]
+            # descendants are the nodes that follow in the same tree with lft < rght
+            end = bisect_left(self.keys, (tree_id, rght), lo=i)
+            ids = frozenset(node[0] for node in self.nodes[i:end])
+            self.subtrees[category_id] = ids
+        return ids
+
+    def ancestor_ids(self, category_id):
+        ids = self.ancestors.get(category_id)
+        if ids is None:
+            i = self.position[category_id]
+            _, tree_id, lft, rght = self.nodes[i]
+            start = bisect_left(self.keys, (tree_id, 0))
+            ids = frozenset(
+                node[0] for node in self.nodes[start:i + 1] if node[2] <= lft and node[3] >= rght
+            )
+            self.ancestors[category_id] = ids
+        return ids
+
+
+def _current_version():
+    """
+    MAX(updated_at) and COUNT of the category table: the same in every
+    process, and changed by every save (a move saves the node) and delete.
+    """
+    state = Category.objects.aggregate(last=Max("updated_at"), count=Count("id"))
+    return state["last"], state["count"]
+
+
+def get_category_tree(refresh=False):
+    """
+    The process-local tree snapshot. The database is asked whether it is
+    still current at most every CATEGORY_TREE_CHECK_INTERVAL seconds (or
+    now, with `refresh`); saves in this process drop it at once.
+    """
+    global _tree
+    tree = _tree
+    interval = getattr(settings, "CATEGORY_TREE_CHECK_INTERVAL", 1.0)
+    if tree is not None and not refresh and monotonic() - tree.checked_at < interval:
+        return tree
+    version = _current_version()
+    if tree is None or tree.version != version:
+        with _lock:
+            tree = _tree
+            if tree is None or tree.version != version:
+                tree = _tree = _CategoryTree(version)
+    tree.checked_at = monotonic()
+    return tree
+
+
+def _lookup(method, category_id):
+    try:
+        category_id = int(category_id)
+    except (ValueError, TypeError):
+        raise Category.DoesNotExist(f"Category {category_id} does not exist.")
+    tree = get_category_tree()
+    if category_id not in tree.position:
+        # perhaps created by another process since the last check
+        tree = get_category_tree(refresh=True)
+        if category_id not in tree.position:
+            raise Category.DoesNotExist(f"Category {category_id} does not exist.")
+    return getattr(tree, method)(category_id)
+
+
+def get_category_options(indent="\u00a0\u00a0\u00a0"):
+    """
+    (id, label) for every category in tree order, each name indented by its
+    MPTT level, for a <select>. Served from the tree snapshot, so rendering
+    the selector costs no query.
+    """
+    return [(pk, f"{indent * level}{name}") for pk, level, name in get_category_tree().outline]
+
+
+def get_subtree_ids(category_id):
+    """
+    Ids of a category and all of its descendants, served from memory.
+    Raises Category.DoesNotExist for an unknown id.
+    """
+    return _lookup("subtree_ids", category_id)
+
+
+def get_ancestor_ids(category_id):
+    """Ids of a category and all of its ancestors, served from memory."""
+    return _lookup("ancestor_ids", category_id)
+
+
+def invalidate_category_tree(touch=False):
+    """
+    Drop this process's tree snapshot; called on every save, move and delete.
+    Other processes notice through _current_version(). Bulk operations that
+    bypass save(), such as Category.objects.rebuild(), do not change it:
+    call this with touch=True after them to stamp a row's updated_at.
+    """
+    global _tree
+    if touch:
+        touch_catalogue()
+    with _lock:
+        _tree = None
+
+
+def attach_tree_data(categories):
+    """
+    Compute full_path and children_count for many categories from one
+    query over their trees, and store them on the instances
+    (`_full_path`, `_children_count`) so serializers do not query per row.
+    """
+    categories = [c for c in categories if c is not None]
+    if not categories:
+        return categories
+
+    rows = Category.objects.filter(tree_id__in={c.tree_id for c in categories}).values_list("id", "parent_id", "name")
+    parents, names, children = {}, {}, {}
+    for category_id, parent_id, name in rows:
+        parents[category_id] = parent_id
+        names[category_id] = name
+        children[parent_id] = children.get(parent_id, 0) + 1
+
+    paths = {}
+
+    def path(category_id):
+        chain = []
+        while category_id is not None and category_id not in paths:
+            chain.append(category_id)
+            category_id = parents.get(category_id)
+        prefix = paths.get(category_id)
+        for node in reversed(chain):
+            prefix = paths[node] = f"{prefix} > {names[node]}" if prefix else names[node]
+        return prefix
+
+    for category in categories:
+        if category.id in names:
+            category._full_path = path(category.id)
+            category._children_count = children.get(category.id, 0)
+    return categories
+
+
+def attach_product_tree_data(products):
+    """attach_tree_data for the categories of many products (fetched in one query if needed)."""
+    products = [p for p in products if p is not None]
+    prefetch_related_objects(products, "category")
+    attach_tree_data([p.category for p in products])
+    return products
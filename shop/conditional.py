@@ -0,0 +1,99 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from .models import Category, Product
+
+
+def touch_catalogue(category_id=None):
+    """
+    Advance MAX(Category.updated_at), which every catalogue validator
+    includes, after a change that leaves no newer updated_at behind (a
+    delete, a bulk write that bypasses save()). Stamps `category_id` if it
+    still exists, else any category.
+    """
+    now = timezone.now()
+    if category_id is not None and Category.objects.filter(pk=category_id).update(updated_at=now):
+        return
+    Category.objects.filter(pk=Category.objects.values_list("pk", flat=True).first()).update(updated_at=now)
+
+
+# -------- Validators --------
+# built from the database alone, so every worker hands out the same validators for the same data
+def _table_state(model):
+    state = model.objects.aggregate(last=Max("updated_at"), count=Count("id"))
+    return state["last"], state["count"]
+
+
+def catalogue_state():
+    """(last_modified, count) of the products and of the categories: moves on with any catalogue write."""
+    return _table_state(Product), _table_state(Category)
+
+
+def _combine(*states):
+    """Fold (last_modified, count) pairs into one (last_modified, token) pair."""
+    stamps = [last for last, _ in states if last is not None]
+    return (max(stamps) if stamps else None), tuple(states)
+
+
+def category_state(request, *args, **kwargs):
+    # a move saves the moved node, so it advances MAX(updated_at) too
+    return _combine(_table_state(Category))
+
+
+def product_state(request, *args, **kwargs):
+    # product bodies embed their category's name and path
+    return _combine(*catalogue_state())
+
+
+def products_page_state(request, *args, **kwargs):
+    if len(messages.get_messages(request)):
+        return None  # a flash message is waiting to be shown; always render
+    last_modified, token = product_state(request)
+    user = getattr(request, "user", None)
+    return last_modified, token + (getattr(user, "pk", None),)
+
+
+# -------- Decorator --------
+def apply_cache_control(request, response):
+    """Add the Cache-Control directives configured for this URL name in settings.CACHE_CONTROL."""
+    match = getattr(request, "resolver_match", None)
+    directives = getattr(settings, "CACHE_CONTROL", {}).get(match.url_name if match else None)
+    if directives and response.status_code in (200, 304):
+        patch_cache_control(response, **directives)
+
+
+def conditional_get(state_func):
+    """
+    Answer If-None-Match / If-Modified-Since with a 304 before the view
+    runs. `state_func(request, *args, **kwargs)` returns (last_modified,
+    token) from cheap aggregate queries, or None to skip validation. The
+    ETag is a hash of the token, the full path and the Accept header, so
+    every page, filter and rendering gets its own tag.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            validators = state_func(request, *args, **kwargs) if request.method in ("GET", "HEAD") else None
+            if validators is None:
+                response = view(request, *args, **kwargs)
+            else:
+                last_modified, token = validators
+                etag = hashlib.md5(
+                    repr((token, request.get_full_path(), request.META.get("HTTP_ACCEPT", ""))).encode()
+                ).hexdigest()
+                response = condition(
+                    etag_func=lambda *a, **k: etag,
+                    last_modified_func=lambda *a, **k: last_modified,
+                )(view)(request, *args, **kwargs)
+                patch_vary_headers(response, ["Accept"])
+            apply_cache_control(request, response)
+            return response
+        return wrapped
+    return decorator
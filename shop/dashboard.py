@@ -0,0 +1,86 @@
+import hashlib
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Count, Max, Sum
+
+from .models import Order, Product
+from .response_cache import fragment_key, get_cache
+
+SUMMARY_CACHE_KEY = "shop:dashboard:{}:{}"
+FEATURED_FRAGMENT = "featured-products"
+
+
+def _timeout():
+    return getattr(settings, "DASHBOARD_CACHE_TIMEOUT", 600)
+
+
+def compute_summary(customer):
+    """
+    A customer's dashboard figures as plain, cacheable data: the latest
+    orders, order counts by status and lifetime spend (cancelled orders
+    excluded). Two queries; an empty summary for no customer.
+    """
+    summary = {"recent_orders": [], "status_counts": [], "order_count": 0, "lifetime_spend": Decimal("0.00")}
+    if customer is None:
+        return summary
+
+    orders = Order.objects.filter(customer=customer)
+    recent = orders.order_by("-created_at", "-id").values("order_number", "status", "total_amount", "created_at")
+    labels = dict(Order.STATUS_CHOICES)
+    summary["recent_orders"] = [
+        {**order, "status_display": labels.get(order["status"], order["status"])}
+        for order in recent[:getattr(settings, "DASHBOARD_RECENT_ORDERS", 5)]
+    ]
+
+    by_status = {
+        row["status"]: row
+        for row in orders.order_by().values("status").annotate(count=Count("id"), spend=Sum("total_amount"))
+    }
+    summary["status_counts"] = [
+        (label, by_status[status]["count"]) for status, label in labels.items() if status in by_status
+    ]
+    summary["order_count"] = sum(row["count"] for row in by_status.values())
+    summary["lifetime_spend"] = sum(
+        (row["spend"] for status, row in by_status.items() if status != "cancelled"), Decimal("0.00")
+    )
+    return summary
+
+
+def compute_featured_products():
+    """The newest active products, shared by every dashboard."""
+    products = Product.objects.filter(is_active=True).order_by("-created_at", "-id")
+    return list(products.values("id", "name", "price")[:getattr(settings, "DASHBOARD_FEATURED_PRODUCTS", 5)])
+
+
+def _orders_state(user):
+    """A digest of MAX(updated_at) and COUNT of the user's orders: moves on with any order write, in any worker."""
+    state = Order.objects.filter(customer__user_id=user.pk).aggregate(last=Max("updated_at"), count=Count("id"))
+    return hashlib.md5(repr((state["last"], state["count"])).encode()).hexdigest()
+
+
+def get_dashboard(user):
+    """
+    (summary, featured products) for a logged-in user. On the hot path this
+    is one aggregate query over the user's orders, the response cache
+    version and one get_many() for the user's summary and the shared
+    featured list. Misses are computed and stored; the summary is keyed by
+    user and the state of their orders, so no Customer lookup is needed to
+    find it and no invalidation is needed when an order changes.
+    """
+    cache = get_cache()
+    summary_key = SUMMARY_CACHE_KEY.format(user.pk, _orders_state(user))
+    # the featured list lives in the catalogue namespace, so product saves and stock changes drop it
+    featured_key = fragment_key(FEATURED_FRAGMENT, [])
+    found = cache.get_many([summary_key, featured_key])
+
+    summary = found.get(summary_key)
+    if summary is None:
+        summary = compute_summary(getattr(user, "customer", None))
+        cache.set(summary_key, summary, _timeout())
+    featured = found.get(featured_key)
+    if featured is None:
+        featured = compute_featured_products()
+        cache.set(featured_key, featured, _timeout())
+    return summary, featured
+
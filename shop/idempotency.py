@@ -0,0 +1,107 @@
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = "Idempotency-Key"
+
+
+def _ttl():
+    return timedelta(seconds=getattr(settings, "IDEMPOTENCY_KEY_TTL", 24 * 60 * 60))
+
+
+def request_scope(request):
+    """Keys are only unique per endpoint and per authenticated user."""
+    user_id = request.user.pk if request.user.is_authenticated else "anon"
+    return f"{request.method}:{request.path}:{user_id}"[:255]
+
+
+def request_fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f"{request.method}\n{request.path}\n{body}".encode()).hexdigest()
+
+
+def _replay(record):
+    response = Response(record.response_body, status=record.response_status)
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def _mismatch():
+    return Response(
+        {"error": f"{HEADER} was already used with a different request"},
+        status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+    )
+
+
+def idempotent_call(request, handler):
+    """
+    Run `handler` at most once per Idempotency-Key. A completed key is
+    answered from the stored response with one indexed lookup; a duplicate
+    that arrives while the first request is still running waits on the
+    key's row lock and then replays its result. 5xx responses and
+    exceptions are not stored, so the client may retry them.
+    """
+    key = request.headers.get(HEADER)
+    if not key:
+        return handler()
+    if len(key) > 255:
+        return Response({"error": f"{HEADER} is too long"}, status=status.HTTP_400_BAD_REQUEST)
+
+    scope = request_scope(request)
+    fingerprint = request_fingerprint(request)
+    now = timezone.now()
+
+    record = IdempotencyKey.objects.filter(key=key, scope=scope, expires_at__gt=now).first()
+    if record is not None and record.response_status is not None:
+        return _replay(record) if record.fingerprint == fingerprint else _mismatch()
+
+    if record is None:
+        # make sure the row exists (and is committed) so there is something to lock
+        try:
+            with transaction.atomic():
+                IdempotencyKey.objects.create(key=key, scope=scope, fingerprint=fingerprint, expires_at=now + _ttl())
+        except IntegrityError:
+            pass
+
+    with transaction.atomic():
+        record = IdempotencyKey.objects.select_for_update().get(key=key, scope=scope)
+        if record.expires_at <= now:
+            record.fingerprint = fingerprint
+            record.response_status = record.response_body = None
+            record.expires_at = now + _ttl()
+        elif record.fingerprint != fingerprint:
+            return _mismatch()
+        elif record.response_status is not None:
+            return _replay(record)
+
+        response = handler()
+        if response.status_code < 500:
+            record.response_status = response.status_code
+            record.response_body = json.loads(JSONRenderer().render(response.data) or b"null")
+            record.save()
+        return response
+
+
+def idempotent(view_method):
+    """Decorator for an APIView handler method, e.g. `post`."""
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        return idempotent_call(request, lambda: view_method(self, request, *args, **kwargs))
+    return wrapper
+
+
+class IdempotentCreateMixin:
+    """Honour an Idempotency-Key header on a generic view's inherited POST handler."""
+
+    def post(self, request, *args, **kwargs):
+        return idempotent_call(request, lambda: super(IdempotentCreateMixin, self).post(request, *args, **kwargs))
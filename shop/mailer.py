@@ -0,0 +1,116 @@
+import smtplib
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.mail import get_connection
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .metrics import timed
+
+ADMIN_EMAILS_CACHE_KEY = "shop:admin-emails"
+
+
+def get_admin_emails():
+    """
+    Emails of active staff users. Cached for ADMIN_EMAILS_CACHE_TIMEOUT
+    seconds, and dropped at once in the process that saves or deletes a
+    User; other processes (workers, the dispatcher) catch up on expiry.
+    """
+    emails = cache.get(ADMIN_EMAILS_CACHE_KEY)
+    if emails is None:
+        emails = list(
+            User.objects.filter(is_staff=True, is_active=True).exclude(email="").values_list("email", flat=True)
+        )
+        cache.set(ADMIN_EMAILS_CACHE_KEY, emails, getattr(settings, "ADMIN_EMAILS_CACHE_TIMEOUT", 300))
+    return emails
+
+
+def invalidate_admin_emails():
+    cache.delete(ADMIN_EMAILS_CACHE_KEY)
+
+
+class Mailer:
+    """
+    Keeps one email backend connection (one SMTP/TLS session) open across
+    sends instead of reconnecting per message. Quacks like a Django email
+    backend, so it can be passed as `connection=` to send_mail and friends.
+    Idle sessions are recycled after `max_idle` seconds and a dropped
+    session is reopened once before giving up.
+    """
+
+    def __init__(self, max_idle=60):
+        self.max_idle = max_idle
+        self._connection = None
+        self._last_used = 0.0
+        self._lock = threading.Lock()
+
+    def _get_connection(self):
+        if self._connection is not None and time.monotonic() - self._last_used > self.max_idle:
+            self._close()
+        if self._connection is None:
+            self._connection = get_connection(fail_silently=False)
+            self._connection.open()
+        return self._connection
+
+    def _close(self):
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except Exception:
+                pass
+            self._connection = None
+
+    def _send(self, message):
+        for attempt in (1, 2):
+            connection = self._get_connection()
+            try:
+                sent = connection.send_messages([message])
+            except smtplib.SMTPServerDisconnected:
+                self._close()
+                if attempt == 2:
+                    raise
+            else:
+                self._last_used = time.monotonic()
+                return sent
+
+    @timed("external")
+    def send_messages(self, email_messages):
+        # one message at a time, so reconnecting re-sends only the message that was cut off
+        with self._lock:
+            return sum(self._send(message) for message in email_messages)
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+
+_mailer = None
+_mailer_lock = threading.Lock()
+
+
+def get_mailer():
+    """Return the process-wide Mailer, building it on first use."""
+    global _mailer
+    if _mailer is None:
+        with _mailer_lock:
+            if _mailer is None:
+                _mailer = Mailer(max_idle=getattr(settings, "EMAIL_CONNECTION_MAX_IDLE", 60))
+    return _mailer
+
+
+def reset_mailer():
+    global _mailer
+    with _mailer_lock:
+        if _mailer is not None:
+            _mailer.close()
+        _mailer = None
+
+
+@receiver(setting_changed)
+def _reset_on_setting_change(setting, **kwargs):
+    if setting.startswith("EMAIL_"):
+        reset_mailer()
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from shop.models import Customer
+from shop.phones import normalize_phone, reversed_digits
+
+
+class Command(BaseCommand):
+    help = "Fill phone_e164 and phone_digits_reversed for customers saved before they existed."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--all", action="store_true", help="Recompute every row, not only the empty ones.")
+
+    def handle(self, *args, **options):
+        queryset = Customer.objects.exclude(phone="")
+        if not options["all"]:
+            queryset = queryset.filter(phone_e164="")
+        updated = invalid = 0
+        last_id = 0
+        while True:
+            # walk by primary key so each batch is an index range, not an OFFSET
+            batch = list(queryset.filter(id__gt=last_id).order_by("id").only("id", "phone")[:options["batch_size"]])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            for customer in batch:
+                customer.phone_e164 = normalize_phone(customer.phone)
+                customer.phone_digits_reversed = reversed_digits(customer.phone_e164)
+                if not customer.phone_e164:
+                    invalid += 1
+            with transaction.atomic():
+                Customer.objects.bulk_update(batch, ["phone_e164", "phone_digits_reversed"])
+            updated += len(batch)
+        self.stdout.write(self.style.SUCCESS(f"Normalized {updated} customers ({invalid} numbers could not be parsed)."))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.price_stats import find_inconsistencies, rebuild_stats
+
+
+class Command(BaseCommand):
+    help = "Compare the per-category price rollup table with freshly computed values."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true", help="Rebuild the table if anything is wrong.")
+
+    def handle(self, *args, **options):
+        problems = find_inconsistencies()
+        for category_id, field, stored, expected in problems:
+            self.stdout.write(f"category {category_id}: {field} is {stored}, expected {expected}")
+        if not problems:
+            self.stdout.write("Category price stats are consistent")
+            return
+        if options["fix"]:
+            rebuild_stats()
+            self.stdout.write(f"Fixed {len(problems)} inconsistent values")
+            return
+        raise CommandError(f"{len(problems)} inconsistent values found")
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from shop.notifications import dispatch_batch
+
+
+class Command(BaseCommand):
+    help = "Deliver queued order notifications from the outbox."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--loop", action="store_true", help="Keep polling instead of exiting once drained.")
+        parser.add_argument("--interval", type=float, default=5.0, help="Seconds to sleep between polls in --loop mode.")
+
+    def handle(self, *args, **options):
+        while True:
+            stats = dispatch_batch(batch_size=options["batch_size"])
+            processed = sum(stats.values())
+            if processed:
+                self.stdout.write(f"sent={stats['sent']} retried={stats['retried']} dead={stats['dead']}")
+            if processed < options["batch_size"]:
+                if not options["loop"]:
+                    break
+                time.sleep(options["interval"])
@@ -0,0 +1,38 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.models import Order
+from shop.order_export import FORMATS, export_orders
+from shop.orders import filter_orders
+
+
+class Command(BaseCommand):
+    help = (
+        "Write one row per order item (with order, customer and product "
+        "columns) to a file or stdout, streaming in chunks so memory stays "
+        "flat however many orders there are."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=list(FORMATS), default="csv")
+        parser.add_argument("--output", "-o", default="-", help="File to write, or - for stdout.")
+        parser.add_argument("--status", help="Comma-separated statuses to include.")
+        parser.add_argument("--date-from", help="First day (YYYY-MM-DD) or datetime to include.")
+        parser.add_argument("--date-to", help="Last day (YYYY-MM-DD) or datetime to include.")
+        parser.add_argument("--chunk-size", type=int, help="Orders per fetch (ORDER_EXPORT_CHUNK_SIZE).")
+
+    def handle(self, *args, **options):
+        try:
+            orders = filter_orders(Order.objects.all(), options["status"], options["date_from"], options["date_to"])
+        except ValidationError as e:
+            raise CommandError("; ".join(f"{key}: {' '.join(messages)}" for key, messages in e.message_dict.items()))
+
+        chunks = export_orders(orders, options["format"], options["chunk_size"])
+        if options["output"] == "-":
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
+            return
+        with open(options["output"], "w", newline="", encoding="utf-8") as output:
+            for chunk in chunks:
+                output.write(chunk)
+        self.stderr.write(self.style.SUCCESS(f"Orders written to {options['output']}."))
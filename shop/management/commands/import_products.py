@@ -0,0 +1,49 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.product_import import ImportFormatError, ImportReport, format_for, import_products
+
+
+class Command(BaseCommand):
+    help = (
+        "Create or update products from a CSV or NDJSON file (or - for stdin), "
+        "streamed in batches. Rejected rows are listed on stderr by line number."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to import, or - to read stdin.")
+        parser.add_argument("--format", choices=["csv", "ndjson"], help="Defaults to the file extension.")
+        parser.add_argument("--batch-size", type=int, help="Rows per bulk_create (PRODUCT_IMPORT_BATCH_SIZE).")
+        parser.add_argument("--chunk-size", type=int, help="Rows per transaction (PRODUCT_IMPORT_CHUNK_SIZE).")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or format_for(path)
+        if fmt is None:
+            raise CommandError("Cannot tell the format from the file name; pass --format.")
+
+        report = ImportReport()
+        started = time.perf_counter()
+        stream = sys.stdin.buffer if path == "-" else open(path, "rb")
+        try:
+            import_products(stream, fmt, options["batch_size"], options["chunk_size"], report=report)
+        except ImportFormatError as e:
+            raise CommandError(str(e))
+        finally:
+            if stream is not sys.stdin.buffer:
+                stream.close()
+            elapsed = time.perf_counter() - started
+
+        for error in report.errors:
+            messages = "; ".join(f"{column}: {message}" for column, message in error["errors"].items())
+            self.stderr.write(f"line {error['line']}: {messages}")
+        if report.error_count > len(report.errors):
+            self.stderr.write(f"... and {report.error_count - len(report.errors)} more rejected rows")
+
+        rate = report.written / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {report.created} and updated {report.updated} products in {elapsed:.1f}s "
+            f"({rate:,.0f} rows/s); {report.error_count} rows rejected."
+        ))
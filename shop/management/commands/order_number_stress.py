@@ -0,0 +1,53 @@
+import multiprocessing
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from shop.models import Customer, Order
+
+
+def _create_orders(customer_id, count):
+    # children must not reuse the parent's database connection
+    connections.close_all()
+    customer = Customer.objects.get(pk=customer_id)
+    numbers = [Order.objects.create(customer=customer).order_number for _ in range(count)]
+    connections.close_all()
+    return numbers
+
+
+class Command(BaseCommand):
+    help = (
+        "Create orders from many processes at once and check that every "
+        "order number is unique and sorted within its process. Needs a "
+        "database shared between processes (PostgreSQL or a file-backed SQLite)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=8)
+        parser.add_argument("--orders", type=int, default=200, help="Orders created per process.")
+
+    def handle(self, *args, **options):
+        user = User.objects.create_user(username=f"order-number-stress-{time.time_ns()}")
+        customer = Customer.objects.create(user=user)
+        connections.close_all()
+        try:
+            started = time.perf_counter()
+            with multiprocessing.get_context("fork").Pool(options["processes"]) as pool:
+                batches = pool.starmap(
+                    _create_orders, [(customer.pk, options["orders"])] * options["processes"]
+                )
+            elapsed = time.perf_counter() - started
+
+            numbers = [number for batch in batches for number in batch]
+            self.stdout.write(
+                f"processes={options['processes']} orders={len(numbers)} "
+                f"unique={len(set(numbers))} orders/sec={len(numbers) / elapsed:.1f}"
+            )
+            if len(set(numbers)) != len(numbers):
+                raise CommandError("Duplicate order numbers were generated")
+            if any(batch != sorted(batch) for batch in batches):
+                raise CommandError("Order numbers are not sorted within a process")
+        finally:
+            user.delete()
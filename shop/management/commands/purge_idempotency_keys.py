@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from shop.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = "Delete Idempotency-Key records whose TTL has passed."
+
+    def handle(self, *args, **options):
+        deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+        self.stdout.write(f"Deleted {deleted} expired idempotency keys")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from shop.price_stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-category price rollup table from the products table."
+
+    def handle(self, *args, **options):
+        count = rebuild_stats()
+        self.stdout.write(f"Rebuilt price stats for {count} categories")
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from shop.search import install, rebuild_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the product search structures if needed and index every "
+        "product. Run after bulk imports, which skip the save signals."
+    )
+
+    def handle(self, *args, **options):
+        install()
+        rebuild_index()
+        self.stdout.write(self.style.SUCCESS("Product search index rebuilt."))
@@ -0,0 +1,30 @@
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+
+from shop import api_views, views  # noqa: F401  (registers the cached views)
+from shop.response_cache import get_cache, get_counters, reset_counters
+
+
+class Command(BaseCommand):
+    help = (
+        "Print hit/miss counters of the catalogue response cache. They are kept in the response cache, so "
+        "this needs RESPONSE_CACHE_ALIAS to name a cache shared with the server (not LocMemCache); "
+        "otherwise read shop_response_cache_lookups_total on /metrics."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="Zero the counters after printing them.")
+
+    def handle(self, *args, **options):
+        if isinstance(get_cache(), LocMemCache):
+            raise CommandError(
+                "The response cache is in-process memory, so this command cannot see the server's counters. "
+                "Set RESPONSE_CACHE_ALIAS to a shared cache, or read shop_response_cache_lookups_total on /metrics."
+            )
+        for name, counts in get_counters().items():
+            total = counts["hit"] + counts["miss"]
+            ratio = counts["hit"] / total if total else 0
+            self.stdout.write(f"{name:<24} hits {counts['hit']:>8}  misses {counts['miss']:>8}  hit ratio {ratio:6.1%}")
+        if options["reset"]:
+            reset_counters()
+            self.stdout.write("Counters reset.")
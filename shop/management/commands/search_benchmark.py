@@ -0,0 +1,77 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from shop.models import Category, Product
+from shop.search import install, rebuild_index, search_ids, search_ids_by_scan, terms
+
+WORDS = (
+    "phone case charger cable laptop stand lamp kettle mug towel shirt jacket boot sock blender knife "
+    "pan pot chair desk shelf rug pillow blanket speaker headset camera tripod battery drill hammer "
+    "wrench glove helmet bottle backpack wallet watch ring necklace perfume soap brush comb razor"
+).split()
+ADJECTIVES = "red blue green black white large small steel wooden leather cotton wireless smart compact".split()
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a catalogue (1M products by default), index it and time "
+        "ranked search against an icontains scan. Runs in a transaction "
+        "that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=1_000_000)
+        parser.add_argument("--categories", type=int, default=200)
+        parser.add_argument("--queries", nargs="+", default=["phone", "wireless speaker", "leather wallet", "kettle 4242"])
+        parser.add_argument("--page-size", type=int, default=50)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def _time(self, fn):
+        started = time.perf_counter()
+        result = fn()
+        return (time.perf_counter() - started) * 1000, result
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        install()
+        with transaction.atomic():
+            root = Category.objects.create(name=f"Search benchmark {time.time_ns()}")
+            categories = [root] + [
+                Category.objects.create(name=f"{root.name} {word} {i}", parent=root)
+                for i, word in enumerate(rng.choice(WORDS) for _ in range(options["categories"] - 1))
+            ]
+
+            started = time.perf_counter()
+            batch = []
+            for i in range(options["products"]):
+                batch.append(Product(
+                    name=f"{rng.choice(ADJECTIVES)} {rng.choice(WORDS)} {i}",
+                    description=" ".join(rng.choice(WORDS) for _ in range(12)),
+                    price=f"{rng.randint(1, 99999) / 100:.2f}",
+                    category=rng.choice(categories),
+                ))
+                if len(batch) == 5000:
+                    Product.objects.bulk_create(batch)
+                    batch = []
+            Product.objects.bulk_create(batch)
+            self.stdout.write(f"Generated {options['products']} products in {time.perf_counter() - started:.1f}s")
+
+            elapsed, _ = self._time(rebuild_index)
+            self.stdout.write(f"Indexed in {elapsed / 1000:.1f}s")
+
+            products = Product.objects.filter(category__in=categories)
+            for query in options["queries"]:
+                fts_ms, matches = self._time(lambda: search_ids(query, products, limit=options["page_size"]))
+
+                # the same ranked page computed with LIKE '%word%' over every row
+                scan_ms, _ = self._time(
+                    lambda: search_ids_by_scan(terms(query), products, None, options["page_size"])
+                )
+                self.stdout.write(
+                    f"{query!r:>20}: ranked search {fts_ms:8.1f} ms ({len(matches)} rows), "
+                    f"icontains scan {scan_ms:8.1f} ms"
+                )
+            transaction.set_rollback(True)
@@ -0,0 +1,71 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from shop.api_serializers import ProductFastListSerializer, ProductSerializer
+from shop.models import Category, Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Time ProductSerializer(many=True) against ProductFastListSerializer "
+        "for lists of 1k/10k/100k products and check both render the same "
+        "JSON. The data is created inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+        parser.add_argument("--categories", type=int, default=20)
+        parser.add_argument("--repeat", type=int, default=3, help="Best of this many runs is reported.")
+
+    def _best(self, repeat, fn):
+        timings, result = [], None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = fn()
+            timings.append(time.perf_counter() - started)
+        return min(timings), result
+
+    def handle(self, *args, **options):
+        renderer = JSONRenderer()
+
+        with transaction.atomic():
+            root = Category.objects.create(name="Serializer benchmark")
+            categories = [root] + [
+                Category.objects.create(name=f"Serializer benchmark {i}", parent=root)
+                for i in range(options["categories"] - 1)
+            ]
+            products = Product.objects.filter(category__in=categories).order_by("id")
+
+            def standard():
+                queryset = products.select_related("category")
+                return renderer.render(ProductSerializer(queryset, many=True).data)
+
+            def fast():
+                queryset = ProductFastListSerializer.values(products)
+                return renderer.render(ProductFastListSerializer(queryset).data)
+
+            created = 0
+            for rows in sorted(options["rows"]):
+                # bulk_create skips the price rollup signals; the rollback discards everything anyway
+                Product.objects.bulk_create(
+                    [
+                        Product(name=f"Item {i}", description="Benchmark item", price=f"{i % 997}.99",
+                                category=categories[i % len(categories)])
+                        for i in range(created, rows)
+                    ],
+                    batch_size=1000,
+                )
+                created = rows
+
+                slow_time, slow_body = self._best(options["repeat"], standard)
+                fast_time, fast_body = self._best(options["repeat"], fast)
+                if slow_body != fast_body:
+                    raise CommandError(f"Outputs differ at {rows} rows.")
+                self.stdout.write(
+                    f"{rows:>7} rows: serializer {slow_time * 1000:9.1f} ms, "
+                    f"fast {fast_time * 1000:9.1f} ms ({slow_time / fast_time:4.1f}x)"
+                )
+            transaction.set_rollback(True)
@@ -0,0 +1,89 @@
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, OperationalError
+
+from shop.models import Category, Customer, Order, Product
+from shop.orders import create_order
+from shop.stock import OutOfStock
+
+
+class Command(BaseCommand):
+    help = (
+        "Hammer one hot product with concurrent orders and check that no "
+        "stock update is lost. Creates its own data and removes it afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--orders", type=int, default=100, help="Orders attempted per thread.")
+        parser.add_argument("--stock", type=int, default=500, help="Starting stock of the hot product.")
+        parser.add_argument("--mode", choices=["optimistic", "locking"], default=None)
+
+    def handle(self, *args, **options):
+        from django.conf import settings
+        if options["mode"]:
+            settings.STOCK_RESERVATION_MODE = options["mode"]
+
+        label = f"stock-benchmark-{time.time_ns()}"
+        user = User.objects.create_user(username=label)
+        customer = Customer.objects.create(user=user)
+        category = Category.objects.create(name=label)
+        product = Product.objects.create(name="Hot SKU", price="1.00", category=category, stock_quantity=options["stock"])
+        try:
+            self.benchmark(customer, product, options)
+        finally:
+            # the orders go with the user; the category's price stats row with the category
+            user.delete()
+            product.delete()
+            category.delete()
+
+    def benchmark(self, customer, product, options):
+        from django.conf import settings
+
+        results = {"placed": 0, "out_of_stock": 0, "retries": 0}
+        lock = threading.Lock()
+
+        def worker():
+            try:
+                for _ in range(options["orders"]):
+                    while True:
+                        try:
+                            create_order(customer, [{"product_id": product.id, "quantity": 1}])
+                            outcome = "placed"
+                        except OutOfStock:
+                            outcome = "out_of_stock"
+                        except OperationalError:
+                            # lock timeouts / serialization failures: retry like a client would
+                            with lock:
+                                results["retries"] += 1
+                            time.sleep(0.001)
+                            continue
+                        break
+                    with lock:
+                        results[outcome] += 1
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(options["threads"])]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        product.refresh_from_db()
+        ordered = Order.objects.filter(customer=customer).count()
+        expected_stock = options["stock"] - ordered
+        self.stdout.write(
+            f"mode={settings.STOCK_RESERVATION_MODE} threads={options['threads']} "
+            f"placed={results['placed']} out_of_stock={results['out_of_stock']} retries={results['retries']} "
+            f"orders/sec={results['placed'] / elapsed:.1f} final_stock={product.stock_quantity}"
+        )
+        if ordered != results["placed"] or product.stock_quantity != expected_stock:
+            raise CommandError(
+                f"Lost update: {ordered} orders recorded, stock is {product.stock_quantity}, expected {expected_stock}"
+            )
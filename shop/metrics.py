@@ -0,0 +1,257 @@
+import random
+import threading
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import DjangoTemplates
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Server-Timing / histogram components; they can overlap (a template may run queries)
+COMPONENTS = ("db", "serialize", "render", "external")
+
+
+# -------- Per-request timings --------
+class RequestTimings:
+    """Time spent per component (seconds) and the query count of one sampled request."""
+
+    def __init__(self):
+        self.durations = defaultdict(float)
+        self.db_queries = 0
+        self._depth = defaultdict(int)
+
+    def db_wrapper(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_queries += 1
+            self.durations["db"] += perf_counter() - started
+
+
+_current = ContextVar("shop_request_timings", default=None)
+
+
+@contextmanager
+def timed(component):
+    """
+    Add the time spent in the block to `component` of the current sampled
+    request. A no-op outside one; nested blocks of the same component
+    count once. Works as a decorator too.
+    """
+    timings = _current.get()
+    if timings is None or timings._depth[component]:
+        yield
+        return
+    timings._depth[component] += 1
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        timings.durations[component] += perf_counter() - started
+        timings._depth[component] -= 1
+
+
+class TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        with timed("render"):
+            return self.template.render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, with template rendering counted as "render" time."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+# -------- Histograms --------
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Histogram:
+    """A Prometheus histogram kept in this process's memory."""
+
+    def __init__(self, name, documentation, labelnames, buckets=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets or getattr(settings, "METRICS_BUCKETS", DEFAULT_BUCKETS))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((labels, [list(s[0]), s[1], s[2]]) for labels, s in self._series.items())
+        for labels, (counts, total, count) in series:
+            base = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labels))
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {bucket_count}')
+            lines.append(f'{self.name}_bucket{{{base},le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{base}}} {total}")
+            lines.append(f"{self.name}_count{{{base}}} {count}")
+        return lines
+
+
+class Counter:
+    """A Prometheus counter kept in this process's memory."""
+
+    def __init__(self, name, documentation, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            base = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labels))
+            lines.append(f"{self.name}{{{base}}} {value}")
+        return lines
+
+
+REQUEST_DURATION = Histogram(
+    "shop_http_request_duration_seconds", "Time to produce a response, by URL name.",
+    ("view", "method", "status"),
+)
+REQUEST_COMPONENT = Histogram(
+    "shop_http_request_component_seconds",
+    "Time spent in the database, serializers, template rendering and outbound calls (sampled requests).",
+    ("view", "component"),
+)
+REQUEST_QUERIES = Histogram(
+    "shop_http_request_db_queries", "Database queries per request (sampled requests).", ("view",),
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200),
+)
+RESPONSE_CACHE_LOOKUPS = Counter(
+    "shop_response_cache_lookups_total", "Response cache lookups (shop.response_cache), by cached view and outcome.",
+    ("name", "outcome"),
+)
+HISTOGRAMS = [REQUEST_DURATION, REQUEST_COMPONENT, REQUEST_QUERIES]
+COUNTERS = [RESPONSE_CACHE_LOOKUPS]
+
+
+def render_metrics():
+    """All histograms and counters in the Prometheus text exposition format."""
+    return "\n".join(line for metric in HISTOGRAMS + COUNTERS for line in metric.expose()) + "\n"
+
+
+def reset_metrics():
+    for metric in HISTOGRAMS + COUNTERS:
+        metric.clear()
+
+
+# -------- Middleware --------
+def _view_name(request):
+    match = getattr(request, "resolver_match", None)
+    return match.view_name if match else "<unmatched>"
+
+
+def server_timing(total, timings=None):
+    """The Server-Timing header value for a request (components only when it was sampled)."""
+    parts = []
+    if timings is not None:
+        for component in COMPONENTS:
+            entry = f"{component};dur={timings.durations[component] * 1000:.1f}"
+            if component == "db":
+                entry += f';desc="{timings.db_queries} queries"'
+            parts.append(entry)
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+class MetricsMiddleware:
+    """
+    Time every request into REQUEST_DURATION and add a Server-Timing
+    header. A METRICS_SAMPLE_RATE share of requests is also broken down
+    into DB time and query count (through a connection execute_wrapper),
+    serializer and template render time, and outbound calls (timed()).
+    Unsampled requests pay for two perf_counter() calls and one lock.
+
+    Histograms live in this process; scrape every worker (or run one per
+    scrape target) to see them all.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, "METRICS_ENABLED", True):
+            return self.get_response(request)
+
+        timings = None
+        started = perf_counter()
+        if random.random() < getattr(settings, "METRICS_SAMPLE_RATE", 1.0):
+            timings = RequestTimings()
+            token = _current.set(timings)
+            try:
+                with ExitStack() as stack:
+                    for connection in connections.all():
+                        stack.enter_context(connection.execute_wrapper(timings.db_wrapper))
+                    response = self.get_response(request)
+            finally:
+                _current.reset(token)
+        else:
+            response = self.get_response(request)
+        elapsed = perf_counter() - started
+
+        view = _view_name(request)
+        REQUEST_DURATION.observe((view, request.method, str(response.status_code)), elapsed)
+        if timings is not None:
+            for component in COMPONENTS:
+                REQUEST_COMPONENT.observe((view, component), timings.durations[component])
+            REQUEST_QUERIES.observe((view,), timings.db_queries)
+        response["Server-Timing"] = server_timing(elapsed, timings)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF and TemplateResponse render after the view returns; count that as render time
+        if _current.get() is not None:
+            render = response.render
+
+            def timed_render():
+                with timed("render"):
+                    return render()
+
+            response.render = timed_render
+        return response
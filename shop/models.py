@@ -1,20 +1,45 @@
-from django.db import models
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
 from django.contrib.auth.models import User
+from django.utils import timezone
 from mptt.models import MPTTModel, TreeForeignKey
 from decimal import Decimal
-import uuid
+
+from .phones import normalize_phone, reversed_digits
 
 
 class Customer(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     phone = models.CharField(max_length=20, blank=True)
+    # derived from phone on save (see shop.phones); "" when phone is not a valid number
+    phone_e164 = models.CharField(max_length=16, blank=True, editable=False)
+    phone_digits_reversed = models.CharField(max_length=15, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     address = models.CharField(max_length=255, blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # keyset pagination orderings, see shop.pagination
+            models.Index(fields=['created_at', 'id']),
+            # exact and LIKE 'prefix%' phone lookups; pattern ops let PostgreSQL use them for LIKE
+            models.Index(fields=['phone_e164'], name='shop_customer_phone_e164', opclasses=['varchar_pattern_ops']),
+            models.Index(
+                fields=['phone_digits_reversed'], name='shop_customer_phone_rev', opclasses=['varchar_pattern_ops']
+            ),
+        ]
+
     def __str__(self):
         return f"{self.user.first_name} {self.user.last_name}"
 
+    def save(self, *args, **kwargs):
+        self.phone_e164 = normalize_phone(self.phone)
+        self.phone_digits_reversed = reversed_digits(self.phone_e164)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'phone' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'phone_e164', 'phone_digits_reversed'}
+        super().save(*args, **kwargs)
+
 
 class Category(MPTTModel):
     name = models.CharField(max_length=200, unique=True)
@@ -28,12 +53,15 @@ class Category(MPTTModel):
 
     class Meta:
         verbose_name_plural = "categories"
+        indexes = [
+            # MAX(updated_at) for conditional GET validators, see shop.conditional
+            models.Index(fields=['updated_at']),
+        ]
 
     def get_products_for_category(category_id):
-        category = Category.objects.get(id=category_id)
+        from .categories import get_subtree_ids
         # include parent + all descendants
-        categories = category.get_descendants(include_self=True)
-        return Product.objects.filter(category__in=categories)
+        return Product.objects.filter(category_id__in=get_subtree_ids(category_id))
 
     def __str__(self):
         return self.name
@@ -41,6 +69,9 @@ class Category(MPTTModel):
     @property
     def full_path(self):
         """Returns the full category path, e.g., 'All Products > Bakery > Bread'"""
+        # set in bulk by shop.categories.attach_tree_data when serializing lists
+        if getattr(self, '_full_path', None) is not None:
+            return self._full_path
         ancestors = self.get_ancestors(include_self=True)
         return ' > '.join([cat.name for cat in ancestors])
 
@@ -55,9 +86,56 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # keyset pagination orderings, see shop.pagination
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['price', 'id']),
+            # MAX(updated_at) for conditional GET validators, see shop.conditional
+            models.Index(fields=['updated_at']),
+        ]
+
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remembered so shop.price_stats can apply the change as a delta on save
+        instance._loaded_price_state = (instance.__dict__.get('category_id'), instance.__dict__.get('price'))
+        return instance
+
+
+class CategoryPriceStats(models.Model):
+    """
+    Price rollup for one category, kept up to date by shop.price_stats:
+    `direct_*` covers the category's own products, `subtree_*` also its
+    descendants'.
+    """
+    category = models.OneToOneField(Category, on_delete=models.CASCADE, primary_key=True, related_name='price_stats')
+    direct_count = models.PositiveIntegerField(default=0)
+    direct_sum = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0.00'))
+    direct_min = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    direct_max = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    subtree_count = models.PositiveIntegerField(default=0)
+    subtree_sum = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0.00'))
+    subtree_min = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    subtree_max = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = "category price stats"
+
+    def __str__(self):
+        return f"Price stats for {self.category_id}"
+
+    @property
+    def subtree_avg(self):
+        return self.subtree_sum / self.subtree_count if self.subtree_count else None
+
+    @property
+    def direct_avg(self):
+        return self.direct_sum / self.direct_count if self.direct_count else None
+
 
 class Order(models.Model):
     STATUS_CHOICES = [
@@ -75,12 +153,49 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # a customer's order history, newest first, optionally by status (see api_views.OrderListCreateView)
+            models.Index(fields=['customer', 'created_at', 'id']),
+            models.Index(fields=['customer', 'status', 'created_at', 'id']),
+            # status and date filters across all customers (order export, admin)
+            models.Index(fields=['status', 'created_at']),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.order_number:
-            # generate something like ORD-1A2B3C4D
-            self.order_number = f"ORD-{uuid.uuid4().hex[:8].upper()}"
+            return self._insert_with_order_number(*args, **kwargs)
+        if self.pk and self.status == 'cancelled':
+            from .stock import release_stock
+            with transaction.atomic():
+                # only the save that actually flips the status gives stock back
+                newly_cancelled = Order.objects.filter(pk=self.pk).exclude(status='cancelled').update(status='cancelled')
+                if newly_cancelled:
+                    release_stock(self)
+                super().save(*args, **kwargs)
+            return
         super().save(*args, **kwargs)
 
+    def _insert_with_order_number(self, *args, **kwargs):
+        """
+        Save with a number from the configured generator, drawing a fresh
+        one if the unique index reports a collision.
+        """
+        from .order_numbers import next_order_number
+        attempts = getattr(settings, 'ORDER_NUMBER_MAX_ATTEMPTS', 3)
+        for attempt in range(1, attempts + 1):
+            self.order_number = next_order_number()
+            try:
+                with transaction.atomic():
+                    super().save(*args, **kwargs)
+                return
+            except IntegrityError:
+                self.pk = None
+                self._state.adding = True
+                if attempt == attempts or not Order.objects.filter(order_number=self.order_number).exists():
+                    self.order_number = ''
+                    raise
+
     def __str__(self):
         return f"Order {self.order_number}"
 
@@ -107,3 +222,59 @@ class OrderItem(models.Model):
     def __str__(self):
         return f"{self.product.name} x {self.quantity}"
 
+
+
+class Notification(models.Model):
+    """Outbox row for a message that must be delivered after an order commits."""
+    CHANNEL_CHOICES = [
+        ('sms', 'SMS'),
+        ('email', 'Email'),
+    ]
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('sent', 'Sent'),
+        ('dead', 'Dead'),
+    ]
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, null=True, blank=True, related_name='notifications')
+    channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES)
+    recipients = models.JSONField(default=list)
+    subject = models.CharField(max_length=255, blank=True)
+    body = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.channel} notification {self.pk} ({self.status})"
+
+
+class IdempotencyKey(models.Model):
+    """Stored outcome of a POST made with an Idempotency-Key header."""
+    key = models.CharField(max_length=255)
+    scope = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['key', 'scope'], name='unique_idempotency_key_per_scope'),
+        ]
+
+    def __str__(self):
+        return f"{self.scope} {self.key}"
+
+
+class OrderNumberSequence(models.Model):
+    """Counter backing shop.order_numbers.SequenceGenerator."""
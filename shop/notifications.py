@@ -0,0 +1,249 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Notification
+from .mailer import get_admin_emails, get_mailer
+from .sms import get_gateway
+
+
+class DeliveryError(Exception):
+    """Raised by a transport when a message could not be delivered."""
+
+
+# -------- Transports --------
+class SMSTransport:
+    """
+    Delivers SMS notifications through the shared SMS gateway. A batch of
+    notifications is handed over at once so identical texts share one
+    provider call.
+    """
+
+    def send(self, notification):
+        error = self.send_many([notification])[notification.pk]
+        if error:
+            raise DeliveryError(error)
+
+    def send_many(self, notifications):
+        pairs = [(number, n.body) for n in notifications for number in n.recipients]
+        statuses = iter(get_gateway().send_many(pairs))
+        errors = {}
+        for n in notifications:
+            failed = [status for status in (next(statuses) for _ in n.recipients) if status != 'Success']
+            errors[n.pk] = ', '.join(failed) or None
+        return errors
+
+
+class EmailTransport:
+    """
+    Delivers email notifications over the shared Mailer connection. A batch
+    goes out in a single SMTP session, one email at a time, and each email's
+    outcome is reported for its own notifications; with
+    ORDER_EMAIL_DIGEST_SECONDS set, notifications to the same recipients
+    are merged into one digest email.
+    """
+
+    def send(self, notification):
+        error = self.send_many([notification])[notification.pk]
+        if error:
+            raise DeliveryError(error)
+
+    def send_many(self, notifications):
+        if getattr(settings, 'ORDER_EMAIL_DIGEST_SECONDS', 0):
+            groups = {}
+            for n in notifications:
+                groups.setdefault(tuple(n.recipients), []).append(n)
+            batches = list(groups.values())
+        else:
+            batches = [[n] for n in notifications]
+
+        mailer = get_mailer()
+        errors = {}
+        for batch in batches:
+            if len(batch) == 1:
+                subject, body = batch[0].subject, batch[0].body
+            else:
+                subject = f"{len(batch)} new orders placed"
+                body = "\n".join(n.body for n in batch)
+            # each email on its own, so a failure marks only its own notifications for retry
+            try:
+                mailer.send_messages([EmailMessage(subject, body, 'info@austino.online', list(batch[0].recipients))])
+            except Exception as e:
+                error = str(e) or e.__class__.__name__
+            else:
+                error = None
+            errors.update({n.pk: error for n in batch})
+        return errors
+
+
+class ConsoleTransport:
+    """Writes notifications to stdout instead of delivering them."""
+
+    def send(self, notification):
+        print(f"[{notification.channel}] to={notification.recipients} {notification.subject}\n{notification.body}")
+
+
+# Messages delivered by LocMemTransport, in the spirit of django.core.mail.outbox
+outbox = []
+
+
+class LocMemTransport:
+    """Keeps delivered notifications in memory so tests can inspect them."""
+
+    def send(self, notification):
+        outbox.append(notification)
+
+
+def get_transport(channel):
+    transports = {
+        'sms': getattr(settings, 'NOTIFICATION_SMS_TRANSPORT', 'shop.notifications.SMSTransport'),
+        'email': getattr(settings, 'NOTIFICATION_EMAIL_TRANSPORT', 'shop.notifications.EmailTransport'),
+    }
+    return import_string(transports[channel])()
+
+
+# -------- Enqueueing --------
+def next_digest_at(now=None):
+    """
+    When digest mode is on, admin emails wait for the next digest boundary
+    so the dispatcher picks them up together; otherwise they are due now.
+    """
+    now = now or timezone.now()
+    interval = getattr(settings, 'ORDER_EMAIL_DIGEST_SECONDS', 0)
+    if not interval:
+        return now
+    timestamp = now.timestamp()
+    return datetime.fromtimestamp(timestamp - timestamp % interval + interval, tz=dt_timezone.utc)
+
+
+def queue_confirmation_messages(customer, user, order, product, quantity):
+    """
+    Write the order confirmation SMS and the admin email to the outbox.
+    Call this inside the transaction that creates the order so the
+    messages exist if and only if the order does.
+    """
+    phone_number = customer.phone
+    if phone_number:
+        message = f"Hello {customer.user.first_name}, your order {order.order_number} for {quantity} x {product.name} totaling ${order.total_amount} has been received. Thank you for shopping with us!"
+        Notification.objects.create(order=order, channel='sms', recipients=[phone_number], body=message)
+        text_status = 'queued'
+    else:
+        text_status = 'User has no phone number'
+
+    admin_emails = get_admin_emails()
+    subject = f"New Order Placed: {order.order_number}"
+    message = f"""
+    Hello Admin,
+
+    A new order has been placed:
+
+    Customer: {user.get_full_name()} ({customer.phone})
+    Product: {product.name}
+    Quantity: {quantity}
+    Total: ${order.total_amount}
+    Text Status: {text_status}
+
+    Please review the order in the dashboard.
+    """
+    if admin_emails:
+        Notification.objects.create(
+            order=order, channel='email', recipients=admin_emails, subject=subject, body=message,
+            next_attempt_at=next_digest_at(),
+        )
+        mail_status = 'queued'
+    else:
+        mail_status = 'No admin recipients'
+
+    return {'confirmation_text_status': text_status, 'admin_email_status': mail_status}
+
+
+# -------- Dispatching --------
+def backoff_delay(attempts):
+    """Exponential backoff after the given number of failed attempts."""
+    base = getattr(settings, 'NOTIFICATION_BACKOFF_SECONDS', 30)
+    cap = getattr(settings, 'NOTIFICATION_MAX_BACKOFF_SECONDS', 3600)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), cap))
+
+
+def _deliver(transport, batch):
+    """Yield (notification, error message or None) for every row in batch."""
+    if hasattr(transport, 'send_many'):
+        try:
+            errors = transport.send_many(batch)
+        except Exception as e:
+            errors = {n.pk: str(e) for n in batch}
+        for notification in batch:
+            yield notification, errors.get(notification.pk)
+        return
+
+    for notification in batch:
+        try:
+            transport.send(notification)
+        except Exception as e:
+            yield notification, str(e) or e.__class__.__name__
+        else:
+            yield notification, None
+
+
+def _claim(batch_size, now):
+    """
+    Lease up to batch_size due notifications to this dispatcher in a short
+    transaction: the attempt is counted and next_attempt_at moved past the
+    lease, so other dispatchers skip the rows while they are being sent and
+    pick them up again if this one dies before recording the outcome.
+    """
+    lease = timedelta(seconds=getattr(settings, 'NOTIFICATION_LEASE_SECONDS', 300))
+    with transaction.atomic():
+        due = list(
+            Notification.objects.select_for_update(skip_locked=True)
+            .filter(status='queued', next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        for notification in due:
+            notification.attempts += 1
+            notification.next_attempt_at = now + lease
+        Notification.objects.bulk_update(due, ['attempts', 'next_attempt_at'])
+    return due
+
+
+def dispatch_batch(batch_size=100, now=None):
+    """
+    Deliver up to batch_size due notifications. Rows are claimed with
+    SKIP LOCKED so several dispatchers can drain the outbox concurrently,
+    and sent after the claim commits, so no row lock is held across the
+    network calls. Returns a dict with the number of sent, retried and
+    dead-lettered rows.
+    """
+    now = now or timezone.now()
+    max_attempts = getattr(settings, 'NOTIFICATION_MAX_ATTEMPTS', 5)
+    stats = {'sent': 0, 'retried': 0, 'dead': 0}
+
+    due = _claim(batch_size, now)
+    by_channel = {}
+    for notification in due:
+        by_channel.setdefault(notification.channel, []).append(notification)
+
+    for channel, batch in by_channel.items():
+        for notification, error in _deliver(get_transport(channel), batch):
+            if error:
+                notification.last_error = error
+                if notification.attempts >= max_attempts:
+                    notification.status = 'dead'
+                    stats['dead'] += 1
+                else:
+                    notification.next_attempt_at = now + backoff_delay(notification.attempts)
+                    stats['retried'] += 1
+            else:
+                notification.status = 'sent'
+                notification.sent_at = now
+                notification.last_error = ''
+                stats['sent'] += 1
+
+    with transaction.atomic():
+        Notification.objects.bulk_update(due, ['status', 'next_attempt_at', 'last_error', 'sent_at'])
+
+    return stats
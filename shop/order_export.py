@@ -0,0 +1,108 @@
+import csv
+import io
+import json
+from itertools import islice
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+
+from .models import OrderItem
+
+# one row per order item; an order without items gives one row with the item columns empty
+COLUMNS = [
+    "order_number", "created_at", "status", "total_amount",
+    "customer_id", "customer_name", "customer_phone",
+    "product_id", "product_name", "category", "quantity", "unit_price", "subtotal",
+]
+
+
+def _chunk_size(chunk_size):
+    return chunk_size or getattr(settings, "ORDER_EXPORT_CHUNK_SIZE", 2000)
+
+
+def order_rows(queryset, chunk_size=None):
+    """
+    Yield export rows (tuples in COLUMNS order) for the orders in
+    `queryset`, oldest first. Orders are read `chunk_size` at a time
+    through iterator(), which uses a server-side cursor where the database
+    has one, and each chunk's items, products and categories are fetched
+    with one prefetch query, so memory stays bounded by the chunk size.
+    """
+    items = OrderItem.objects.select_related("product__category").only(
+        "order_id", "quantity", "unit_price", "product__id", "product__name", "product__category__name",
+    )
+    orders = (
+        queryset.select_related("customer__user")
+        .prefetch_related(Prefetch("items", items))
+        .only(
+            "order_number", "created_at", "status", "total_amount",
+            "customer__id", "customer__phone", "customer__user__first_name", "customer__user__last_name",
+        )
+        .order_by("created_at", "id")
+    )
+    for order in orders.iterator(chunk_size=_chunk_size(chunk_size)):
+        customer = order.customer
+        head = (
+            order.order_number, order.created_at.isoformat(), order.status, order.total_amount,
+            customer.id, str(customer).strip(), customer.phone,
+        )
+        lines = order.items.all()
+        if not lines:
+            yield head + (None,) * 6
+        for item in lines:
+            product = item.product
+            yield head + (
+                product.id, product.name, product.category.name, item.quantity, item.unit_price, item.subtotal,
+            )
+
+
+def _batches(rows, size):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+# -------- Writers: each yields text chunks of up to `size` rows --------
+def csv_chunks(rows, size):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for batch in _batches(rows, size):
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        # only the header: nothing matched
+        yield buffer.getvalue()
+
+
+def ndjson_chunks(rows, size):
+    for batch in _batches(rows, size):
+        yield "".join(json.dumps(dict(zip(COLUMNS, row)), cls=DjangoJSONEncoder) + "\n" for row in batch)
+
+
+def columnar_chunks(rows, size):
+    """
+    One JSON object per line, mapping each column to the values of up to
+    `size` rows: column-oriented record batches, in the spirit of a
+    Parquet row group, that pandas or pyarrow can load one line at a time.
+    """
+    for batch in _batches(rows, size):
+        yield json.dumps(dict(zip(COLUMNS, zip(*batch))), cls=DjangoJSONEncoder) + "\n"
+
+
+# format -> (writer, content type, file extension)
+FORMATS = {
+    "csv": (csv_chunks, "text/csv", "csv"),
+    "ndjson": (ndjson_chunks, "application/x-ndjson", "ndjson"),
+    "columnar": (columnar_chunks, "application/x-ndjson", "columns.ndjson"),
+}
+
+
+def export_orders(queryset, fmt, chunk_size=None):
+    """The export of `queryset` in `fmt` (a FORMATS key) as an iterator of text chunks."""
+    writer = FORMATS[fmt][0]
+    size = _chunk_size(chunk_size)
+    return writer(order_rows(queryset, size), size)
@@ -0,0 +1,134 @@
+import os
+import socket
+import threading
+import time
+import uuid
+import zlib
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connection
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+# Crockford base32: digits sort before letters, so fixed-width codes sort like the numbers they encode
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+EPOCH_MS = 1704067200000  # 2024-01-01T00:00:00Z
+
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER_ID = (1 << WORKER_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+
+def encode(number, width=13):
+    chars = []
+    for _ in range(width):
+        number, rem = divmod(number, 32)
+        chars.append(ALPHABET[rem])
+    return "".join(reversed(chars))
+
+
+class RandomGenerator:
+    """The original scheme: 8 random hex characters. Not sortable."""
+
+    def __call__(self):
+        return f"ORD-{uuid.uuid4().hex[:8].upper()}"
+
+
+class SnowflakeGenerator:
+    """
+    Time-ordered, coordination-free numbers: 41 bits of milliseconds since
+    EPOCH_MS, 10 bits of worker id and a 12 bit per-millisecond sequence,
+    written as 13 base32 characters (e.g. ORD-0C8Z1QK4A0001).
+
+    The worker id comes from ORDER_NUMBER_WORKER_ID, or is derived from the
+    host name and process id. It is re-derived after a fork so child
+    processes do not share a worker id with their parent.
+    """
+
+    def __init__(self, worker_id=None):
+        self.configured_worker_id = worker_id
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _reset_for_process(self):
+        self._pid = os.getpid()
+        if self.configured_worker_id is not None:
+            self.worker_id = int(self.configured_worker_id) & MAX_WORKER_ID
+        else:
+            # XOR with a per-host constant keeps distinct pids (mod 1024) on distinct worker ids
+            self.worker_id = (zlib.crc32(socket.gethostname().encode()) ^ self._pid) & MAX_WORKER_ID
+        self._last_ms = -1
+        self._sequence = 0
+
+    def next_id(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset_for_process()
+            now = int(time.time() * 1000)
+            if now <= self._last_ms:
+                # same millisecond, or the clock stepped back: keep counting from the last timestamp
+                now = self._last_ms
+                self._sequence = (self._sequence + 1) & MAX_SEQUENCE
+                if self._sequence == 0:
+                    now += 1  # sequence exhausted, borrow the next millisecond
+            else:
+                self._sequence = 0
+            self._last_ms = now
+            return ((now - EPOCH_MS) << (WORKER_BITS + SEQUENCE_BITS)) | (self.worker_id << SEQUENCE_BITS) | self._sequence
+
+    def __call__(self):
+        return f"ORD-{encode(self.next_id())}"
+
+
+class SequenceGenerator:
+    """
+    Numbers from a database counter, zero padded so they sort: ORD-000000001234.
+    PostgreSQL draws from the OrderNumberSequence table's id sequence with
+    nextval(); other databases insert a row into that table and use its id.
+    """
+
+    def __call__(self):
+        from .models import OrderNumberSequence
+
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT nextval(pg_get_serial_sequence(%s, 'id'))", [OrderNumberSequence._meta.db_table]
+                )
+                number = cursor.fetchone()[0]
+        else:
+            number = OrderNumberSequence.objects.create().pk
+        return f"ORD-{number:012d}"
+
+
+_generator = None
+_generator_lock = threading.Lock()
+
+
+def get_generator():
+    global _generator
+    if _generator is None:
+        with _generator_lock:
+            if _generator is None:
+                generator_class = import_string(
+                    getattr(settings, "ORDER_NUMBER_GENERATOR", "shop.order_numbers.SnowflakeGenerator")
+                )
+                if generator_class is SnowflakeGenerator:
+                    _generator = generator_class(worker_id=getattr(settings, "ORDER_NUMBER_WORKER_ID", None))
+                else:
+                    _generator = generator_class()
+    return _generator
+
+
+def next_order_number():
+    return get_generator()()
+
+
+@receiver(setting_changed)
+def _reset_on_setting_change(setting, **kwargs):
+    global _generator
+    if setting.startswith("ORDER_NUMBER_"):
+        with _generator_lock:
+            _generator = None
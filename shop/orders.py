@@ -0,0 +1,124 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Order, OrderItem, Product
+from .stock import reserve_stock
+
+
+class OrderItemsError(Exception):
+    """Raised when the requested line items cannot be turned into an order."""
+
+    def __init__(self, message, missing_product_ids=None):
+        super().__init__(message)
+        self.message = message
+        self.missing_product_ids = missing_product_ids or []
+
+
+def parse_items(items):
+    """Normalise raw request items into a list of (product_id, quantity) pairs."""
+    if not isinstance(items, (list, tuple)):
+        raise OrderItemsError("Items must be a list.")
+    lines = []
+    for item in items:
+        if not isinstance(item, dict):
+            raise OrderItemsError("Each item must be an object with product_id and quantity.")
+        try:
+            product_id = int(item.get("product_id"))
+            quantity = int(item.get("quantity", 1))
+        except (TypeError, ValueError):
+            raise OrderItemsError("Each item needs an integer product_id and quantity.")
+        if quantity <= 0:
+            raise OrderItemsError("Quantity must be at least 1.")
+        lines.append((product_id, quantity))
+    return lines
+
+
+def create_order(customer, items):
+    """
+    Build an order and all of its items with a fixed number of queries:
+    one lookup for every product, one stock reservation, one INSERT for
+    the order and one bulk INSERT for the items, all inside a single
+    transaction.
+
+    Raises OrderItemsError (listing every unknown product id) or
+    stock.OutOfStock before anything is written.
+    """
+    lines = parse_items(items)
+    if not lines:
+        raise OrderItemsError("Items are required")
+
+    product_ids = {product_id for product_id, _ in lines}
+
+    with transaction.atomic():
+        products = Product.objects.in_bulk(product_ids)
+        missing = sorted(product_ids - set(products))
+        if missing:
+            raise OrderItemsError("Products not found", missing_product_ids=missing)
+
+        quantities = {}
+        for product_id, quantity in lines:
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+        reserve_stock(quantities)
+
+        order_items = [
+            OrderItem(product=products[product_id], quantity=quantity, unit_price=products[product_id].price)
+            for product_id, quantity in lines
+        ]
+        order = Order(customer=customer)
+        order.total_amount = sum((item.subtotal for item in order_items), Decimal("0.00"))
+        order.save()
+
+        for item in order_items:
+            item.order = order
+        OrderItem.objects.bulk_create(order_items)
+
+    return order, order_items
+
+
+def _parse_moment(value, param):
+    """
+    A date_from / date_to value as (aware datetime, is_date). A bare date
+    comes back as midnight at its start.
+    """
+    try:
+        day = parse_date(value)
+        moment = None if day else parse_datetime(value)
+    except ValueError:
+        day = moment = None
+    if day is not None:
+        moment = datetime.combine(day, time.min)
+    elif moment is None:
+        raise ValidationError({param: "Use YYYY-MM-DD or an ISO 8601 datetime."})
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment, day is not None
+
+
+def filter_orders(queryset, status=None, date_from=None, date_to=None):
+    """
+    Narrow `queryset` by a comma-separated list of statuses and an
+    inclusive creation date range (dates or ISO datetimes). Raises
+    ValidationError, keyed by argument name, for values it cannot use.
+    """
+    statuses = [s for s in (status or "").split(",") if s]
+    if statuses:
+        valid = dict(Order.STATUS_CHOICES)
+        if any(s not in valid for s in statuses):
+            raise ValidationError({"status": f"Choose from: {', '.join(valid)}."})
+        queryset = queryset.filter(status__in=statuses)
+    if date_from:
+        start, _ = _parse_moment(date_from, "date_from")
+        queryset = queryset.filter(created_at__gte=start)
+    if date_to:
+        end, is_date = _parse_moment(date_to, "date_to")
+        # a bare date includes the whole day; plain range bounds keep the index usable
+        if is_date:
+            queryset = queryset.filter(created_at__lt=end + timedelta(days=1))
+        else:
+            queryset = queryset.filter(created_at__lte=end)
+    return queryset
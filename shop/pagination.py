@@ -0,0 +1,235 @@
+import base64
+import binascii
+import json
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+from .search import search_ids
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset ("seek") pagination over a composite, indexed ordering such as
+    (created_at, id). The cursor holds the sort key of the last row of the
+    page, so page N costs the same index range scan as page 1, unlike
+    OFFSET. Cursors are opaque, URL-safe base64 strings.
+
+    The body stays a plain list; the next/previous page URLs are sent in a
+    `Link` header (rel="next" / rel="prev").
+    """
+    # name accepted in ?ordering= -> fields; the last field must be unique
+    orderings = {
+        "created": ("created_at", "id"),
+        "-created": ("-created_at", "-id"),
+    }
+    default_ordering = "-created"
+    page_size = 50
+    max_page_size = 200
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    ordering_query_param = "ordering"
+
+    # -------- cursor encoding --------
+    @staticmethod
+    def encode_cursor(ordering, values, reverse=False):
+        payload = json.dumps({"o": ordering, "v": values, "r": int(reverse)}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            ordering, values = payload["o"], payload["v"]
+            reverse = bool(payload.get("r"))
+        except (binascii.Error, ValueError, KeyError, TypeError, AttributeError):
+            raise NotFound("Invalid cursor")
+        if not isinstance(ordering, str) or not isinstance(values, list):
+            raise NotFound("Invalid cursor")
+        return ordering, values, reverse
+
+    def _key(self, obj, fields):
+        values = []
+        for field in fields:
+            name = field.lstrip("-")
+            value = obj[name] if isinstance(obj, dict) else getattr(obj, name)
+            values.append(value.isoformat() if hasattr(value, "isoformat") else str(value))
+        return values
+
+    def _seek(self, queryset, fields, values):
+        """Rows strictly after `values` in the order given by `fields`."""
+        model = queryset.model
+        try:
+            parsed = [model._meta.get_field(f.lstrip("-")).to_python(v) for f, v in zip(fields, values)]
+        except (DjangoValidationError, TypeError, ValueError):
+            raise NotFound("Invalid cursor")
+        condition = Q()
+        for i, field in enumerate(fields):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            clause = Q(**{f"{name}__{lookup}": parsed[i]})
+            for prev_field, prev_value in zip(fields[:i], parsed[:i]):
+                clause &= Q(**{prev_field.lstrip("-"): prev_value})
+            condition |= clause
+        return queryset.filter(condition)
+
+    @staticmethod
+    def _reversed(fields):
+        return tuple(f[1:] if f.startswith("-") else f"-{f}" for f in fields)
+
+    # -------- DRF hooks --------
+    def get_page_size(self, request):
+        default = getattr(settings, "API_PAGE_SIZE", self.page_size)
+        cap = getattr(settings, "API_MAX_PAGE_SIZE", self.max_page_size)
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, default))
+        except ValueError:
+            raise ValidationError({self.page_size_query_param: "Must be an integer."})
+        return max(1, min(size, cap))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size_value = self.get_page_size(request)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            ordering, values, reverse = self.decode_cursor(cursor)
+        else:
+            ordering = request.query_params.get(self.ordering_query_param, self.default_ordering)
+            values, reverse = None, False
+        if cursor and ordering not in self.orderings:
+            raise NotFound("Invalid cursor")
+        if ordering not in self.orderings:
+            raise ValidationError({self.ordering_query_param: f"Choose one of: {', '.join(self.orderings)}."})
+        self.ordering = ordering
+        if values is not None and len(values) != len(self.orderings[ordering]):
+            raise NotFound("Invalid cursor")
+        return self.seek(queryset, ordering, values, reverse, self.page_size_value)
+
+    def seek(self, queryset, ordering, values=None, reverse=False, page_size=None):
+        """
+        One page of `queryset` in `ordering`, after the row whose sort key is
+        `values` (before it when `reverse`), setting next_cursor and
+        previous_cursor. paginate_queryset() without the DRF request.
+        """
+        fields = self.orderings[ordering]
+        page_size = page_size or self.page_size
+        scan_fields = self._reversed(fields) if reverse else fields
+        queryset = queryset.order_by(*scan_fields)
+        if values is not None:
+            queryset = self._seek(queryset, scan_fields, values)
+
+        # one extra row tells us whether there is a further page
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        self.next_cursor = self.previous_cursor = None
+        if rows:
+            if has_more or reverse:
+                self.next_cursor = self.encode_cursor(ordering, self._key(rows[-1], fields))
+            if values is not None and (has_more or not reverse):
+                self.previous_cursor = self.encode_cursor(ordering, self._key(rows[0], fields), reverse=True)
+        return rows
+
+    def _page_url(self, cursor):
+        params = self.request.query_params.copy()
+        params[self.cursor_query_param] = cursor
+        params.pop(self.ordering_query_param, None)
+        return self.request.build_absolute_uri(f"{self.request.path}?{urlencode(params, doseq=True)}")
+
+    def get_paginated_response(self, data):
+        links = []
+        if self.next_cursor:
+            links.append(f'<{self._page_url(self.next_cursor)}>; rel="next"')
+        if self.previous_cursor:
+            links.append(f'<{self._page_url(self.previous_cursor)}>; rel="prev"')
+        headers = {"Link": ", ".join(links)} if links else None
+        return Response(data, headers=headers)
+
+    def get_paginated_response_schema(self, schema):
+        return schema
+
+
+def paginate_keyset(queryset, cursor=None, page_size=50, pagination_class=KeysetPagination):
+    """
+    A keyset page for views outside DRF, as (rows, next_cursor,
+    previous_cursor), in the pagination class's default ordering unless
+    the cursor says otherwise. Raises NotFound for a cursor it cannot use.
+    """
+    paginator = pagination_class()
+    if cursor:
+        ordering, values, reverse = paginator.decode_cursor(cursor)
+        if ordering not in paginator.orderings or len(values) != len(paginator.orderings[ordering]):
+            raise NotFound("Invalid cursor")
+    else:
+        ordering, values, reverse = paginator.default_ordering, None, False
+    rows = paginator.seek(queryset, ordering, values, reverse, page_size)
+    return rows, paginator.next_cursor, paginator.previous_cursor
+
+
+def paginate_search(queryset, query, cursor=None, page_size=50):
+    """
+    One page of products matching `query`, best match first, as (rows,
+    next_cursor). Rows come from `queryset` (instances or values() dicts);
+    the cursor holds the (rank, id) of the last row.
+    """
+    after = None
+    if cursor:
+        ordering, values, _ = KeysetPagination.decode_cursor(cursor)
+        try:
+            rank, pk = values
+            after = (float(rank), int(pk))
+        except (TypeError, ValueError):
+            raise NotFound("Invalid cursor")
+        if ordering != "rank":
+            raise NotFound("Invalid cursor")
+
+    matches = search_ids(query, queryset, after, page_size + 1)
+    next_cursor = None
+    if len(matches) > page_size:
+        matches = matches[:page_size]
+        pk, rank = matches[-1]
+        next_cursor = KeysetPagination.encode_cursor("rank", [rank, pk])
+
+    rows = {}
+    for row in queryset.filter(id__in=[pk for pk, _ in matches]):
+        rows[row["id"] if isinstance(row, dict) else row.id] = row
+    return [rows[pk] for pk, _ in matches if pk in rows], next_cursor
+
+
+class ProductKeysetPagination(KeysetPagination):
+    """Adds price orderings, and ranked pages when ?search= is given (see shop.search)."""
+    orderings = {
+        **KeysetPagination.orderings,
+        "price": ("price", "id"),
+        "-price": ("-price", "-id"),
+    }
+    search_query_param = "search"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        query = request.query_params.get(self.search_query_param, "").strip()
+        if not query:
+            return super().paginate_queryset(queryset, request, view)
+        self.request = request
+        rows, self.next_cursor = paginate_search(
+            queryset, query, request.query_params.get(self.cursor_query_param), self.get_page_size(request)
+        )
+        self.previous_cursor = None
+        return rows
+
+
+class CustomerKeysetPagination(KeysetPagination):
+    pass
+
+
+class OrderKeysetPagination(KeysetPagination):
+    pass
@@ -0,0 +1,70 @@
+import re
+
+from django.conf import settings
+
+_NON_DIGITS = re.compile(r"\D")
+
+# national trunk prefix that is dropped after a country code (+254 0712... -> +254712...)
+TRUNK_PREFIX = "0"
+E164_MAX_DIGITS = 15
+E164_MIN_DIGITS = 8
+
+
+def _country_codes():
+    from .forms import COUNTRY_CODES
+    return sorted((code.lstrip("+") for code, _ in COUNTRY_CODES), key=len, reverse=True)
+
+
+def _default_country_code():
+    return str(getattr(settings, "PHONE_DEFAULT_COUNTRY_CODE", "254")).lstrip("+")
+
+
+def _international_digits(raw):
+    """Digits of `raw` with the country code in front, or "" when nothing is left."""
+    raw = (raw or "").strip()
+    digits = _NON_DIGITS.sub("", raw)
+    if not digits:
+        return ""
+    if raw.startswith("+"):
+        pass
+    elif digits.startswith("00"):
+        digits = digits[2:]
+    elif digits.startswith(TRUNK_PREFIX):
+        return _default_country_code() + digits[len(TRUNK_PREFIX):]
+    else:
+        # no marker at all: treat it as international unless it is a bare national number
+        if not any(digits.startswith(code) for code in _country_codes()):
+            return _default_country_code() + digits
+
+    # CustomerPhoneForm glues "+254" to "0712...": drop the trunk zero after a known code
+    for code in _country_codes():
+        if digits.startswith(code + TRUNK_PREFIX):
+            return code + digits[len(code) + len(TRUNK_PREFIX):]
+    return digits
+
+
+def normalize_phone(raw):
+    """
+    The E.164 form of a free-text phone number ("+254712345678"), or ""
+    when it cannot be one. National numbers ("0712 345 678") get
+    PHONE_DEFAULT_COUNTRY_CODE.
+    """
+    digits = _international_digits(raw)
+    if not E164_MIN_DIGITS <= len(digits) <= E164_MAX_DIGITS:
+        return ""
+    return f"+{digits}"
+
+
+def normalize_phone_prefix(raw):
+    """The E.164 prefix for a partial number typed into a search ("2547", "0712")."""
+    digits = _international_digits(raw)
+    return f"+{digits}" if digits else ""
+
+
+def digits_only(raw):
+    return _NON_DIGITS.sub("", raw or "")
+
+
+def reversed_digits(e164):
+    """Stored next to the E.164 number so suffix searches become indexed prefix searches."""
+    return digits_only(e164)[::-1]
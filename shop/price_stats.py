@@ -0,0 +1,236 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Q, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Least
+
+from .categories import get_ancestor_ids, get_category_tree, get_subtree_ids
+from .models import Category, CategoryPriceStats, Product
+
+FIELDS = [
+    "direct_count", "direct_sum", "direct_min", "direct_max",
+    "subtree_count", "subtree_sum", "subtree_min", "subtree_max",
+]
+
+
+def _ancestors(category_id):
+    try:
+        return get_ancestor_ids(category_id)
+    except Category.DoesNotExist:
+        # the category is being deleted; its post_delete handler refreshes the subtrees
+        return frozenset()
+
+
+# -------- Incremental updates --------
+def add_price(category_id, price):
+    """
+    Account for a product of `price` appearing in `category_id`. Only rows
+    that exist are updated; a missing row (a category older than the
+    rollup) is computed in full by get_stats() when first asked for.
+    """
+    ancestors = _ancestors(category_id)
+    if not ancestors:
+        return
+    price = Value(price)
+    CategoryPriceStats.objects.filter(category_id=category_id).update(
+        direct_count=F("direct_count") + 1,
+        direct_sum=F("direct_sum") + price,
+        direct_min=Least(Coalesce("direct_min", price), price),
+        direct_max=Greatest(Coalesce("direct_max", price), price),
+    )
+    CategoryPriceStats.objects.filter(category_id__in=ancestors).update(
+        subtree_count=F("subtree_count") + 1,
+        subtree_sum=F("subtree_sum") + price,
+        subtree_min=Least(Coalesce("subtree_min", price), price),
+        subtree_max=Greatest(Coalesce("subtree_max", price), price),
+    )
+
+
+def remove_price(category_id, price):
+    """
+    Account for a product of `price` leaving `category_id`. Counts and sums
+    are decremented in place; a min or max is only recomputed when the
+    removed price was the boundary.
+    """
+    ancestors = _ancestors(category_id)
+    if not ancestors:
+        return
+    CategoryPriceStats.objects.filter(category_id=category_id).update(
+        direct_count=F("direct_count") - 1, direct_sum=F("direct_sum") - Value(price),
+    )
+    CategoryPriceStats.objects.filter(category_id__in=ancestors).update(
+        subtree_count=F("subtree_count") - 1, subtree_sum=F("subtree_sum") - Value(price),
+    )
+
+    direct = CategoryPriceStats.objects.filter(category_id=category_id).first()
+    if direct is not None and price in (direct.direct_min, direct.direct_max):
+        bounds = Product.objects.filter(category_id=category_id).aggregate(low=Min("price"), high=Max("price"))
+        direct.direct_min, direct.direct_max = bounds["low"], bounds["high"]
+        direct.save(update_fields=["direct_min", "direct_max"])
+
+    tree = get_category_tree()
+    boundary = Q(subtree_min=price) | Q(subtree_max=price)
+    for stats in CategoryPriceStats.objects.filter(boundary, category_id__in=ancestors):
+        # from the products, as rows below may be missing
+        bounds = Product.objects.filter(
+            category_id__in=tree.subtree_ids(stats.category_id)
+        ).aggregate(low=Min("price"), high=Max("price"))
+        stats.subtree_min, stats.subtree_max = bounds["low"], bounds["high"]
+        stats.save(update_fields=["subtree_min", "subtree_max"])
+
+
+def product_changed(product, created):
+    old = getattr(product, "_loaded_price_state", None)
+    new = (product.category_id, Decimal(str(product.price)))
+    if not created and old == new:
+        return
+    with transaction.atomic():
+        if not created and old is not None and old[0] is not None:
+            remove_price(*old)
+        add_price(*new)
+    product._loaded_price_state = new
+
+
+def product_deleted(product):
+    category_id, price = getattr(product, "_loaded_price_state", None) or (product.category_id, product.price)
+    remove_price(category_id, Decimal(str(price)))
+
+
+# -------- Rebuilding and checking --------
+def _fill_subtrees(stats, tree):
+    """Set the subtree_* values of every row in `stats` (category id -> row) from the direct_* values."""
+    for category_id, row in stats.items():
+        if category_id not in tree.position:
+            continue
+        members = [stats[pk] for pk in tree.subtree_ids(category_id) if pk in stats]
+        lows = [m.direct_min for m in members if m.direct_min is not None]
+        highs = [m.direct_max for m in members if m.direct_max is not None]
+        row.subtree_count = sum(m.direct_count for m in members)
+        row.subtree_sum = sum((m.direct_sum for m in members), Decimal("0.00"))
+        row.subtree_min = min(lows) if lows else None
+        row.subtree_max = max(highs) if highs else None
+
+
+def compute_stats():
+    """Recompute every category's stats from scratch: one GROUP BY plus a walk of the tree snapshot."""
+    tree = get_category_tree()
+    direct = {
+        row["category_id"]: row
+        for row in Product.objects.values("category_id").annotate(
+            count=Count("id"), total=Sum("price"), low=Min("price"), high=Max("price")
+        )
+    }
+    stats = {}
+    for category_id, *_ in tree.nodes:
+        row = direct.get(category_id, {})
+        stats[category_id] = CategoryPriceStats(
+            category_id=category_id,
+            direct_count=row.get("count", 0),
+            direct_sum=row.get("total") or Decimal("0.00"),
+            direct_min=row.get("low"),
+            direct_max=row.get("high"),
+        )
+    _fill_subtrees(stats, tree)
+    return stats
+
+
+def rebuild_stats():
+    """Replace the whole rollup table with freshly computed values."""
+    stats = compute_stats()
+    with transaction.atomic():
+        CategoryPriceStats.objects.all().delete()
+        CategoryPriceStats.objects.bulk_create(stats.values(), batch_size=1000)
+    return len(stats)
+
+
+def refresh_subtree_stats():
+    """Recompute only the subtree_* columns from direct_* (after category moves and deletes)."""
+    stats = {row.category_id: row for row in CategoryPriceStats.objects.all()}
+    _fill_subtrees(stats, get_category_tree())
+    CategoryPriceStats.objects.bulk_update(
+        list(stats.values()), ["subtree_count", "subtree_sum", "subtree_min", "subtree_max"], batch_size=1000
+    )
+
+
+def refresh_categories(category_ids):
+    """
+    Recompute direct_* for just these categories and subtree_* for them and
+    their ancestors, e.g. after a bulk write that bypassed the save signals.
+    Costs a few queries however many products changed.
+    """
+    tree = get_category_tree()
+    category_ids = {pk for pk in category_ids if pk in tree.position}
+    if not category_ids:
+        return
+    ancestors = frozenset().union(*(tree.ancestor_ids(pk) for pk in category_ids))
+    # every subtree an ancestor's rollup depends on
+    members = frozenset().union(*(tree.subtree_ids(pk) for pk in ancestors))
+    with transaction.atomic():
+        stats = {
+            row.category_id: row
+            for row in CategoryPriceStats.objects.select_for_update().filter(category_id__in=members)
+        }
+        # rows never built (categories older than the rollup) are computed and stored too
+        missing = members - stats.keys()
+        recompute = category_ids | missing
+        direct = {
+            row["category_id"]: row
+            for row in Product.objects.filter(category_id__in=recompute).values("category_id").annotate(
+                count=Count("id"), total=Sum("price"), low=Min("price"), high=Max("price")
+            )
+        }
+        for category_id in recompute:
+            row = direct.get(category_id, {})
+            stats.setdefault(category_id, CategoryPriceStats(category_id=category_id))
+            stats[category_id].direct_count = row.get("count", 0)
+            stats[category_id].direct_sum = row.get("total") or Decimal("0.00")
+            stats[category_id].direct_min = row.get("low")
+            stats[category_id].direct_max = row.get("high")
+        _fill_subtrees(stats, tree)
+        CategoryPriceStats.objects.bulk_create([stats[pk] for pk in missing], batch_size=1000, ignore_conflicts=True)
+        CategoryPriceStats.objects.bulk_update(
+            [stats[pk] for pk in ancestors if pk not in missing], FIELDS, batch_size=1000
+        )
+
+
+def find_inconsistencies():
+    """Return (category_id, field, stored, expected) for every stored value that is wrong or missing."""
+    expected = compute_stats()
+    stored = {s.category_id: s for s in CategoryPriceStats.objects.all()}
+    problems = []
+    for category_id, want in expected.items():
+        have = stored.get(category_id)
+        for field in FIELDS:
+            stored_value = getattr(have, field) if have is not None else None
+            if stored_value != getattr(want, field):
+                problems.append((category_id, field, stored_value, getattr(want, field)))
+    return problems
+
+
+def compute_category_stats(category_id):
+    """One category's stats straight from its products: two aggregate queries."""
+    products = Product.objects.order_by()
+    values = {}
+    for prefix, scope in (
+        ("direct", products.filter(category_id=category_id)),
+        ("subtree", products.filter(category_id__in=get_subtree_ids(category_id))),
+    ):
+        row = scope.aggregate(count=Count("id"), total=Sum("price"), low=Min("price"), high=Max("price"))
+        values[f"{prefix}_count"] = row["count"]
+        values[f"{prefix}_sum"] = row["total"] or Decimal("0.00")
+        values[f"{prefix}_min"] = row["low"]
+        values[f"{prefix}_max"] = row["high"]
+    return values
+
+
+def get_stats(category_id):
+    """The stats row for a category, computing and storing just that row if it is missing."""
+    try:
+        return CategoryPriceStats.objects.select_related("category").get(category_id=category_id)
+    except CategoryPriceStats.DoesNotExist:
+        category = Category.objects.get(pk=category_id)
+        # get_or_create, as a concurrent request or a product signal may store the row first
+        stats, _ = CategoryPriceStats.objects.get_or_create(
+            category=category, defaults=compute_category_stats(category_id)
+        )
+        return stats
@@ -0,0 +1,290 @@
+import csv
+import json
+from itertools import islice
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Category, Product
+from .price_stats import refresh_categories
+from .response_cache import invalidate_responses
+from .search import index_products
+
+# columns written by an import; `category` is resolved from category_id or category_name
+VALUE_FIELDS = ["name", "description", "price", "stock_quantity", "is_active"]
+
+CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+EXTENSIONS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+
+
+class ImportFormatError(Exception):
+    """Raised when the input as a whole cannot be read (unknown format, bad header, bad encoding)."""
+
+
+class ImportReport:
+    """Counts of a run plus the rows that were rejected, by line number (capped at max_errors)."""
+
+    def __init__(self, max_errors=None):
+        self.max_errors = max_errors or getattr(settings, "PRODUCT_IMPORT_MAX_REPORTED_ERRORS", 1000)
+        self.created = 0
+        self.updated = 0
+        self.error_count = 0
+        self.errors = []
+
+    def add_error(self, line, errors):
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": line, "errors": errors})
+
+    @property
+    def written(self):
+        return self.created + self.updated
+
+    def as_dict(self):
+        return {
+            "created": self.created,
+            "updated": self.updated,
+            "error_count": self.error_count,
+            "errors": self.errors,
+        }
+
+
+def format_for(name):
+    """The import format ("csv" or "ndjson") of a file name or content type, else None."""
+    name = (name or "").split(";")[0].strip().lower()
+    if name in CONTENT_TYPES:
+        return CONTENT_TYPES[name]
+    return next((fmt for ext, fmt in EXTENSIONS.items() if name.endswith(ext)), None)
+
+
+# -------- Reading --------
+def _text_lines(stream):
+    for number, line in enumerate(stream, 1):
+        if isinstance(line, bytes):
+            try:
+                line = line.decode("utf-8")
+            except UnicodeDecodeError:
+                raise ImportFormatError(f"Line {number} is not valid UTF-8.")
+        if number == 1:
+            line = line.lstrip("\ufeff")
+        yield line
+
+
+def _csv_rows(stream):
+    reader = csv.DictReader(_text_lines(stream))
+    if reader.fieldnames is None:
+        return
+    missing = {"name", "price"} - set(reader.fieldnames)
+    if missing:
+        raise ImportFormatError(f"The CSV header has no {', '.join(sorted(missing))} column.")
+    for row in reader:
+        if None in row:
+            yield reader.line_num, None, "More values than header columns."
+        else:
+            yield reader.line_num, row, None
+
+
+def _ndjson_rows(stream):
+    for number, line in enumerate(_text_lines(stream), 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield number, None, "Invalid JSON."
+            continue
+        if isinstance(row, dict):
+            yield number, row, None
+        else:
+            yield number, None, "Each line must be a JSON object."
+
+
+def read_rows(stream, fmt):
+    """
+    Yield (line number, row dict, error) from a CSV or NDJSON byte or text
+    stream, one line at a time. Exactly one of row and error is set.
+    """
+    readers = {"csv": _csv_rows, "ndjson": _ndjson_rows}
+    if fmt not in readers:
+        raise ImportFormatError(f"Unsupported format {fmt!r}; use csv or ndjson.")
+    return readers[fmt](stream)
+
+
+# -------- Cleaning --------
+class CategoryMap:
+    """Every category's id and (case-insensitive) name, loaded once per import."""
+
+    def __init__(self):
+        self.ids = set()
+        self.names = {}
+        for pk, name in Category.objects.values_list("id", "name"):
+            self.ids.add(pk)
+            # same pick as ProductSerializer's name__iexact(...).first()
+            self.names.setdefault(name.lower(), pk)
+
+    def resolve(self, row):
+        category_id, category_name = row.get("category_id"), row.get("category_name")
+        if category_id not in (None, ""):
+            try:
+                category_id = int(category_id)
+            except (TypeError, ValueError):
+                return None, "A valid integer is required."
+            return (category_id, None) if category_id in self.ids else (None, "No category with this id.")
+        if category_name:
+            category_id = self.names.get(str(category_name).strip().lower())
+            return (category_id, None) if category_id else (None, "No category with this name.")
+        return None, "Valid category_id or category_name is required."
+
+
+def clean_row(row, categories):
+    """
+    A Product built from one input row, or a {column: message} dict of what
+    is wrong with it.
+
+    A row with an `id` updates that product and sets only the columns it
+    carries: absent columns (and empty cells, except for a blank-able
+    column such as description) keep their current values rather than
+    the model defaults. The columns to write are left on the product as
+    `import_fields`.
+    """
+    values, errors = {}, {}
+    pk = row.get("id")
+    updating = pk not in (None, "")
+    for name in VALUE_FIELDS:
+        field = Product._meta.get_field(name)
+        raw = row.get(name)
+        if raw is None or raw == "":
+            if updating:
+                if raw == "" and field.blank and not field.has_default():
+                    values[name] = ""
+                continue
+            if field.has_default():
+                values[name] = field.get_default()
+            elif field.blank:
+                values[name] = ""
+            else:
+                errors[name] = "This field is required."
+            continue
+        try:
+            values[name] = field.clean(raw, None)
+        except ValidationError as e:
+            errors[name] = " ".join(e.messages)
+
+    if not updating or row.get("category_id") not in (None, "") or row.get("category_name"):
+        values["category_id"], category_error = categories.resolve(row)
+        if category_error:
+            errors["category"] = category_error
+
+    if updating:
+        try:
+            values["id"] = int(pk)
+        except (TypeError, ValueError):
+            errors["id"] = "A valid integer is required."
+    if errors:
+        return errors
+    product = Product(**values)
+    product.import_fields = [
+        "category" if name == "category_id" else name for name in values if name != "id"
+    ] + ["updated_at"]
+    return product
+
+
+# -------- Writing --------
+def _write(batch, report, touched):
+    """
+    Insert the new products of one batch and update, in place, the columns
+    given for the ones that name an existing id; then reindex them for
+    search. Adds the categories gained or left to `touched`.
+    """
+    now = timezone.now()
+    new = [product for _, product in batch if product.pk is None]
+    updates = {}
+    for line, product in batch:
+        if product.pk is not None:
+            # a repeated id in one batch: the last row wins
+            updates[product.pk] = (line, product)
+    if updates:
+        existing = dict(Product.objects.filter(pk__in=updates).values_list("id", "category_id"))
+        for pk, (line, _) in list(updates.items()):
+            if pk not in existing:
+                report.add_error(line, {"id": "No product with this id."})
+                del updates[pk]
+        touched.update(existing[pk] for pk in updates)
+
+    if new:
+        Product.objects.bulk_create(new)
+        report.created += len(new)
+    # one UPDATE per set of columns (usually one per file, the header's)
+    by_fields = {}
+    for _, product in updates.values():
+        product.updated_at = now
+        by_fields.setdefault(tuple(product.import_fields), []).append(product)
+    for fields, products in by_fields.items():
+        Product.objects.bulk_update(products, fields)
+    report.updated += len(updates)
+
+    written = new + [product for _, product in updates.values()]
+    # an update without a category column has no category_id; its current one was added above
+    touched.update(product.category_id for product in written if product.category_id is not None)
+    index_products([product.pk for product in written])
+
+
+def _products(rows, categories, report):
+    for line, row, error in rows:
+        if error is not None:
+            report.add_error(line, {"row": error})
+            continue
+        product = clean_row(row, categories)
+        if isinstance(product, Product):
+            yield line, product
+        else:
+            report.add_error(line, product)
+
+
+def refresh_derived_data(category_ids):
+    """Bring what the Product signals normally maintain up to date for the categories a bulk write touched."""
+    # bulk_create and the updates set updated_at, so the conditional-GET validators move on by themselves
+    refresh_categories(category_ids)
+    invalidate_responses()
+
+
+def import_products(stream, fmt, batch_size=None, chunk_size=None, report=None):
+    """
+    Create or update products from a CSV or NDJSON stream in constant
+    memory and return an ImportReport.
+
+    Columns are the ProductSerializer ones (name, description, price,
+    stock_quantity, is_active, category_id or category_name); rows with an
+    `id` update just the columns they carry on that product. Rows are
+    written with bulk_create / bulk_update in batches of `batch_size`, and each `chunk_size` rows are committed in
+    their own transaction, so a failure loses at most one chunk. Rejected
+    rows are reported rather than stopping the import.
+
+    The save signals do not run for bulk writes; each batch is reindexed
+    for search as it is written, and the price stats of the categories the
+    import touched and the caches are refreshed once at the end.
+    """
+    batch_size = batch_size or getattr(settings, "PRODUCT_IMPORT_BATCH_SIZE", 1000)
+    chunk_size = max(chunk_size or getattr(settings, "PRODUCT_IMPORT_CHUNK_SIZE", 20000), batch_size)
+    report = report or ImportReport()
+    products = _products(read_rows(stream, fmt), CategoryMap(), report)
+    touched = set()
+    try:
+        while True:
+            chunk = list(islice(products, chunk_size))
+            if not chunk:
+                break
+            with transaction.atomic():
+                for start in range(0, len(chunk), batch_size):
+                    _write(chunk[start:start + batch_size], report, touched)
+    finally:
+        if report.written:
+            refresh_derived_data(touched)
+    return report
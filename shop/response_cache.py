@@ -0,0 +1,183 @@
+import hashlib
+import time
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+
+from .conditional import catalogue_state
+from .metrics import RESPONSE_CACHE_LOOKUPS
+
+VERSION_CACHE_KEY = "shop:response-cache-version"
+COUNTER_CACHE_KEY = "shop:response-cache:{}:{}"
+
+# names passed to cached_response(), for get_counters()
+_names = set()
+
+# (catalogue state, time.monotonic() when it was read) of this worker, see _catalogue_state()
+_state = None
+
+
+def get_cache():
+    return caches[getattr(settings, "RESPONSE_CACHE_ALIAS", "default")]
+
+
+def _catalogue_state():
+    """
+    The database's catalogue state, read at most every
+    RESPONSE_CACHE_CHECK_INTERVAL seconds. The cache may be private to
+    this worker, so this is how writes made by other workers reach it.
+    """
+    global _state
+    state = _state
+    if state is None or time.monotonic() - state[1] >= getattr(settings, "RESPONSE_CACHE_CHECK_INTERVAL", 1.0):
+        state = _state = catalogue_state(), time.monotonic()
+    return state[0]
+
+
+def _version():
+    cache = get_cache()
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_CACHE_KEY)
+    return hashlib.md5(repr((version, _catalogue_state())).encode()).hexdigest()
+
+
+def invalidate_responses():
+    """
+    Orphan every cached catalogue response by moving to a new key
+    namespace. Called from the Product and Category signals and after
+    stock changes; call it yourself after bulk writes that skip signals.
+    Other workers move on once they see the write in the database.
+    """
+    def bump():
+        global _state
+        get_cache().set(VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+        _state = None
+
+    bump()
+    # bump again once committed, so nothing read before the commit stays cached
+    transaction.on_commit(bump)
+
+
+# -------- Hit/miss counters --------
+def _count(name, outcome):
+    RESPONSE_CACHE_LOOKUPS.inc((name, outcome))
+    cache = get_cache()
+    key = COUNTER_CACHE_KEY.format(name, outcome)
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def get_counters():
+    """
+    {name: {"hit": n, "miss": n}} for every cached view loaded in this
+    process, as stored in the response cache: the totals of all workers
+    only when that cache is shared. Each worker also counts its own
+    lookups on /metrics (shop_response_cache_lookups_total).
+    """
+    cache = get_cache()
+    return {
+        name: {outcome: cache.get(COUNTER_CACHE_KEY.format(name, outcome), 0) for outcome in ("hit", "miss")}
+        for name in sorted(_names)
+    }
+
+
+def reset_counters():
+    get_cache().delete_many([COUNTER_CACHE_KEY.format(name, outcome) for name in _names for outcome in ("hit", "miss")])
+
+
+# -------- Fragments --------
+def fragment_key(name, parts):
+    """The cache key of a fragment in the current version namespace (for get_many() with other keys)."""
+    return f"shop:fragment:{_version()}:{name}:{hashlib.md5(repr(parts).encode()).hexdigest()}"
+
+
+def cached_fragment(name, parts, render):
+    """
+    The value of render() (typically a rendered template fragment), cached
+    under `name` and the key `parts` in the current version namespace, so
+    the same invalidate_responses() calls drop it.
+    """
+    _names.add(name)
+    cache = get_cache()
+    key = fragment_key(name, parts)
+    value = cache.get(key)
+    if value is not None:
+        _count(name, "hit")
+        return value
+    _count(name, "miss")
+    value = render()
+    cache.set(key, value, getattr(settings, "RESPONSE_CACHE_TIMEOUT", 300))
+    return value
+
+
+# -------- Decorator --------
+def _cache_key(name, request, vary_on_user):
+    params = sorted((key, value) for key, values in request.GET.lists() for value in values if value != "")
+    # the host and scheme too: the bodies and Link headers hold absolute URLs
+    parts = [request.scheme, request.get_host(), request.path, params, request.META.get("HTTP_ACCEPT", "")]
+    if vary_on_user:
+        user = getattr(request, "user", None)
+        parts += [getattr(user, "pk", None), request.COOKIES.get(settings.CSRF_COOKIE_NAME)]
+    digest = hashlib.md5(repr(parts).encode()).hexdigest()
+    return f"shop:response:{_version()}:{name}:{digest}"
+
+
+def cached_response(name, vary_on_user=False):
+    """
+    Serve successful GET responses of a view from the cache, keyed by the
+    scheme, host, path, query parameters (sorted, blanks dropped) and the
+    Accept header. Entries live in the current version namespace, so
+    invalidate_responses() drops them all at once. API responses are only
+    cached when rendered as JSON.
+
+    With vary_on_user the key also includes the user and CSRF cookie, and
+    nothing is cached for a browser without a CSRF cookie or with flash
+    messages waiting, since the rendered page embeds both.
+    """
+    _names.add(name)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view(request, *args, **kwargs)
+            if vary_on_user and (
+                settings.CSRF_COOKIE_NAME not in request.COOKIES or len(messages.get_messages(request))
+            ):
+                return view(request, *args, **kwargs)
+
+            cache = get_cache()
+            key = _cache_key(name, request, vary_on_user)
+            cached = cache.get(key)
+            if cached is not None:
+                _count(name, "hit")
+                status, content, headers = cached
+                response = HttpResponse(content, status=status, headers=headers)
+                response["X-Cache"] = "HIT"
+                return response
+
+            _count(name, "miss")
+            response = view(request, *args, **kwargs)
+            if hasattr(response, "render") and not response.is_rendered:
+                response.render()
+            # the browsable API page shows the user and a CSRF token (set after this runs), so only JSON is shared
+            renderer = getattr(response, "accepted_renderer", None)
+            json_or_page = renderer is None or renderer.format == "json"
+            if response.status_code == 200 and not response.streaming and not response.cookies and json_or_page:
+                headers = {k: v for k, v in response.items() if k.lower() not in ("set-cookie", "x-cache")}
+                cache.set(key, (response.status_code, response.content, headers),
+                          getattr(settings, "RESPONSE_CACHE_TIMEOUT", 300))
+            response["X-Cache"] = "MISS"
+            return response
+        return wrapped
+    return decorator
@@ -0,0 +1,192 @@
+import re
+
+from django.db import connection
+from django.db.models import Case, FloatField, Q, Value, When
+
+from .categories import attach_tree_data, get_subtree_ids
+from .models import Category, Product
+
+FTS_TABLE = "shop_product_fts"
+GIN_INDEX = "shop_product_search_gin"
+# relative weight of name, description and category path matches
+SQLITE_WEIGHTS = (10.0, 4.0, 2.0)
+POSTGRES_CONFIG = "english"
+# categories reindexed per statement (two bound parameters each)
+INDEX_BATCH = 500
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+def _vendor():
+    return connection.vendor
+
+
+# -------- Schema --------
+def install():
+    """
+    Create the search structures next to the product table (idempotent):
+    a tsvector column with a GIN index on PostgreSQL, an FTS5 table on
+    SQLite. Run from post_migrate; other databases fall back to LIKE scans.
+    """
+    with connection.cursor() as cursor:
+        if _vendor() == "postgresql":
+            cursor.execute(f"ALTER TABLE {Product._meta.db_table} ADD COLUMN IF NOT EXISTS search_vector tsvector")
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {GIN_INDEX} ON {Product._meta.db_table} USING gin (search_vector)"
+            )
+        elif _vendor() == "sqlite":
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+                "USING fts5(name, description, category_path, tokenize='porter unicode61')"
+            )
+
+
+# -------- Keeping the index in sync --------
+def _category_paths(category_ids):
+    categories = list(Category.objects.filter(id__in=category_ids))
+    attach_tree_data(categories)
+    return {category.id: category.full_path for category in categories}
+
+
+def _index(products_filter, params, paths):
+    """(Re)index the products matching `products_filter`, one statement per INDEX_BATCH categories."""
+    table = Product._meta.db_table
+    paths = list(paths.items())
+    with connection.cursor() as cursor:
+        for start in range(0, len(paths), INDEX_BATCH):
+            batch = paths[start:start + INDEX_BATCH]
+            # the (category_id, path) pairs of the batch as an inline table to join the products to
+            values = ", ".join(["(%s, %s)"] * len(batch))
+            pairs = [value for pair in batch for value in pair]
+            if _vendor() == "postgresql":
+                cursor.execute(
+                    f"UPDATE {table} SET search_vector = "
+                    f"setweight(to_tsvector('{POSTGRES_CONFIG}', {table}.name), 'A') || "
+                    f"setweight(to_tsvector('{POSTGRES_CONFIG}', coalesce({table}.description, '')), 'B') || "
+                    f"setweight(to_tsvector('{POSTGRES_CONFIG}', paths.path), 'C') "
+                    f"FROM (VALUES {values}) AS paths (category_id, path) "
+                    f"WHERE {table}.category_id = paths.category_id AND {products_filter}",
+                    [*pairs, *params],
+                )
+            elif _vendor() == "sqlite":
+                category_ids = ", ".join(["%s"] * len(batch))
+                cursor.execute(
+                    f"DELETE FROM {FTS_TABLE} WHERE rowid IN "
+                    f"(SELECT id FROM {table} WHERE category_id IN ({category_ids}) AND {products_filter})",
+                    [category_id for category_id, _ in batch] + list(params),
+                )
+                cursor.execute(
+                    f"WITH paths (category_id, path) AS (VALUES {values}) "
+                    f"INSERT INTO {FTS_TABLE} (rowid, name, description, category_path) "
+                    f"SELECT {table}.id, {table}.name, {table}.description, paths.path "
+                    f"FROM {table} JOIN paths ON {table}.category_id = paths.category_id WHERE {products_filter}",
+                    [*pairs, *params],
+                )
+
+
+def index_products(product_ids):
+    """Reindex a few products, e.g. after a save."""
+    product_ids = list(product_ids)
+    if not product_ids or _vendor() not in ("postgresql", "sqlite"):
+        return
+    category_ids = set(Product.objects.filter(id__in=product_ids).values_list("category_id", flat=True))
+    placeholders = ", ".join(["%s"] * len(product_ids))
+    _index(f"id IN ({placeholders})", product_ids, _category_paths(category_ids))
+
+
+def unindex_products(product_ids):
+    product_ids = list(product_ids)
+    if product_ids and _vendor() == "sqlite":
+        placeholders = ", ".join(["%s"] * len(product_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", product_ids)
+
+
+def index_categories(category_ids):
+    """Reindex every product under these categories (their paths changed)."""
+    if _vendor() not in ("postgresql", "sqlite"):
+        return
+    subtree = set()
+    for category_id in category_ids:
+        try:
+            subtree |= get_subtree_ids(category_id)
+        except Category.DoesNotExist:
+            continue
+    if subtree:
+        _index("1 = 1", [], _category_paths(subtree))
+
+
+def rebuild_index():
+    """Index every product from scratch; needed after bulk_create or raw writes."""
+    if _vendor() == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+    if _vendor() in ("postgresql", "sqlite"):
+        _index("1 = 1", [], _category_paths(Category.objects.values("id")))
+
+
+# -------- Querying --------
+def terms(query):
+    return _TERM.findall(query or "")
+
+
+def search_ids(query, queryset=None, after=None, limit=50):
+    """
+    Ranked matches for `query` as a list of (product_id, rank), best first
+    (rank descending, then id). `queryset` restricts the candidates (e.g.
+    the category filters); `after` is the (rank, id) of the last row of
+    the previous page, so deeper pages are a seek rather than an OFFSET.
+    """
+    words = terms(query)
+    if not words:
+        return []
+    queryset = Product.objects.all() if queryset is None else queryset
+    candidates, candidate_params = queryset.order_by().values("id").query.sql_with_params()
+    table = Product._meta.db_table
+
+    if _vendor() == "postgresql":
+        rank = f"ts_rank_cd({table}.search_vector, q)::float8"
+        sql = (
+            f"SELECT {table}.id, {rank} FROM {table}, websearch_to_tsquery('{POSTGRES_CONFIG}', %s) q "
+            f"WHERE {table}.search_vector @@ q AND {table}.id IN ({candidates})"
+        )
+        params = [" ".join(words), *candidate_params]
+        id_column = f"{table}.id"
+    elif _vendor() == "sqlite":
+        rank = f"-bm25({FTS_TABLE}, {', '.join(map(str, SQLITE_WEIGHTS))})"
+        # unary + keeps the IN from being pushed into the FTS5 scan, which would run the MATCH once per candidate
+        sql = f"SELECT rowid, {rank} FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND +rowid IN ({candidates})"
+        params = [" ".join(f'"{word}"' for word in words), *candidate_params]
+        id_column = "rowid"
+    else:
+        return search_ids_by_scan(words, queryset, after, limit)
+
+    if after is not None:
+        sql += f" AND ({rank} < %s OR ({rank} = %s AND {id_column} > %s))"
+        params += [after[0], after[0], after[1]]
+    sql += " ORDER BY 2 DESC, 1 LIMIT %s"
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [(row[0], float(row[1])) for row in cursor.fetchall()]
+
+
+def search_ids_by_scan(words, queryset, after=None, limit=50):
+    """
+    search_ids() for databases without a full-text index: every word must
+    appear somewhere (LIKE '%word%' on every row) and name matches rank first.
+    """
+    for word in words:
+        queryset = queryset.filter(
+            Q(name__icontains=word) | Q(description__icontains=word) | Q(category__name__icontains=word)
+        )
+    queryset = queryset.annotate(
+        rank=sum(
+            (Case(When(name__icontains=word, then=Value(1.0)), default=Value(0.1), output_field=FloatField())
+             for word in words),
+            Value(0.0),
+        )
+    )
+    if after is not None:
+        queryset = queryset.filter(Q(rank__lt=after[0]) | Q(rank=after[0], id__gt=after[1]))
+    return [(pk, float(rank)) for pk, rank in queryset.order_by("-rank", "id").values_list("id", "rank")[:limit]]
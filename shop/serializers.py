@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Customer, Category, Product, Order, OrderItem
+from .api_serializers import CategoryTreeListSerializer, ProductTreeListSerializer
 from decimal import Decimal
 
 
@@ -23,8 +24,12 @@ class CategorySerializer(serializers.ModelSerializer):
         model = Category
         fields = ['id', 'name', 'description', 'parent', 'full_path', 
                  'children_count', 'created_at', 'updated_at']
+        list_serializer_class = CategoryTreeListSerializer
 
     def get_children_count(self, obj):
+        # set in bulk by shop.categories.attach_tree_data when serializing lists
+        if getattr(obj, '_children_count', None) is not None:
+            return obj._children_count
         return obj.get_children().count()
 
 
@@ -37,6 +42,7 @@ class ProductSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'description', 'price', 'category', 
                  'category_name', 'category_path', 'stock_quantity', 'is_active', 
                  'created_at', 'updated_at']
+        list_serializer_class = ProductTreeListSerializer
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
@@ -1,6 +1,7 @@
 from django.core.mail import send_mail
-import africastalking
 from django.conf import settings
+from .mailer import get_mailer
+from .sms import get_gateway
 
 def sendmail(subject,message,fromEmail='info@austino.online', toEmails=[]):
     print(subject,message,fromEmail, toEmails)
@@ -11,7 +12,8 @@ def sendmail(subject,message,fromEmail='info@austino.online', toEmails=[]):
             message,
             'info@austino.online',  # From email
             toEmails,
-            fail_silently=False
+            fail_silently=False,
+            connection=get_mailer(),
         )
 
         print('mm',mm)
@@ -28,23 +30,10 @@ def sendmail(subject,message,fromEmail='info@austino.online', toEmails=[]):
 
 def sendText(phone_number,message):
     try:
-        # username='sandbox'
-        # api_key=""
-        username=settings.AFRICASTALKING_USERNAME
-        api_key=settings.AFRICASTALKING_API_KEY
-        print(username)
-        print(api_key)
-        africastalking.initialize(username,api_key)
-        sms = africastalking.SMS
-        # blacklisted = sms.fetch_blacklist()
-        # print(blacklisted)
-        res= sms.send(message, [phone_number,])
-        recepients= res['SMSMessageData']['Recipients'][0]
-        print(recepients)
-        if(recepients['status']=='Success'):
-             return(recepients['status']) 
-        return f"Failed-{recepients['status']}"
+        status = get_gateway().send(message, [phone_number])[phone_number]
+        if(status=='Success'):
+             return(status)
+        return f"Failed-{status}"
     except Exception as e:
         print("Failed to send SMS:", e)
-        # return(f"Failed-{str(e)}")
-        return(f"Failed to send SMS to client")
\ No newline at end of file
+        return(f"Failed to send SMS to client")
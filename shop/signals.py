@@ -0,0 +1,76 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete, post_migrate
+from django.dispatch import receiver
+
+from mptt.signals import node_moved
+
+from .categories import invalidate_category_tree
+from .conditional import touch_catalogue
+from .mailer import invalidate_admin_emails
+from .response_cache import invalidate_responses
+from .models import Category, CategoryPriceStats, Product
+from . import price_stats, search
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, **kwargs):
+    invalidate_admin_emails()
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, created, **kwargs):
+    # the snapshot holds names too (see get_category_options), so renames count
+    invalidate_category_tree()
+    if created:
+        CategoryPriceStats.objects.get_or_create(category=instance)
+
+
+@receiver([node_moved, post_delete], sender=Category)
+def category_moved_or_deleted(sender, **kwargs):
+    invalidate_category_tree()
+    invalidate_responses()
+    price_stats.refresh_subtree_stats()
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, created, **kwargs):
+    price_stats.product_changed(instance, created)
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    price_stats.product_deleted(instance)
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Category)
+def catalogue_changed(sender, instance, signal, **kwargs):
+    if signal is post_delete:
+        # a delete leaves no newer updated_at behind for the validators
+        touch_catalogue(instance.category_id if sender is Product else instance.parent_id)
+    invalidate_responses()
+
+
+# -------- Search index --------
+@receiver(post_migrate)
+def install_search(sender, **kwargs):
+    if sender.name == "shop":
+        search.install()
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    search.index_products([instance.id])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    search.unindex_products([instance.id])
+
+
+@receiver(post_save, sender=Category)
+@receiver(node_moved, sender=Category)
+def index_category(sender, instance, created=False, **kwargs):
+    if not created:
+        # a rename or move changes the path of every product below
+        search.index_categories([instance.id])
@@ -0,0 +1,154 @@
+import random
+import threading
+import time
+
+import requests
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .metrics import timed
+
+
+class SMSGatewayError(Exception):
+    """Raised when the SMS provider rejects or fails a whole request."""
+
+
+# -------- Backends --------
+class AfricasTalkingBackend:
+    """
+    Talks to the Africa's Talking messaging endpoint over one long-lived
+    requests.Session so connections (and TLS) are reused between sends.
+    Accepts many recipients per call.
+    """
+
+    def __init__(self, username=None, api_key=None, timeout=(3.05, 9.05)):
+        self.username = username or settings.AFRICASTALKING_USERNAME
+        api_key = api_key or settings.AFRICASTALKING_API_KEY
+        if not self.username or not api_key:
+            raise SMSGatewayError("Africa's Talking username and api key must be configured.")
+        domain = "sandbox.africastalking.com" if self.username == "sandbox" else "africastalking.com"
+        self.url = f"https://api.{domain}/version1/messaging"
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update({"Accept": "application/json", "apiKey": api_key})
+
+    def send(self, message, recipients):
+        try:
+            res = self.session.post(
+                self.url,
+                data={"username": self.username, "to": ",".join(recipients), "message": message, "bulkSMSMode": 1},
+                timeout=self.timeout,
+            )
+        except requests.RequestException as e:
+            raise SMSGatewayError(str(e))
+        if not 200 <= res.status_code < 300:
+            raise SMSGatewayError(res.text)
+        return res.json()
+
+
+class FakeBackend:
+    """
+    Offline stand-in for the provider. Simulates per-call latency and a
+    per-recipient failure rate, and records every call in `calls`.
+    """
+
+    def __init__(self, latency=0.0, failure_rate=0.0, seed=None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.calls = []
+
+    def send(self, message, recipients):
+        self.calls.append((message, list(recipients)))
+        if self.latency:
+            time.sleep(self.latency)
+        results = []
+        for number in recipients:
+            if self.random.random() < self.failure_rate:
+                results.append({"number": number, "status": "InvalidPhoneNumber", "statusCode": 403})
+            else:
+                results.append({
+                    "number": number, "status": "Success", "statusCode": 101,
+                    "messageId": f"fake-{len(self.calls)}-{number}", "cost": "KES 0.0000",
+                })
+        return {"SMSMessageData": {"Message": f"Sent to {len(recipients)}", "Recipients": results}}
+
+
+# -------- Gateway --------
+class SMSGateway:
+    """
+    Front door for outbound SMS. Wraps a backend and coalesces messages
+    with identical text into multi-recipient calls.
+    """
+
+    def __init__(self, backend, max_recipients=100):
+        self.backend = backend
+        self.max_recipients = max_recipients
+
+    @staticmethod
+    def parse_recipients(response, recipients):
+        """Map every requested number to its provider status ('Success' or the failure reason)."""
+        statuses = {number: "NoResponse" for number in recipients}
+        for entry in response.get("SMSMessageData", {}).get("Recipients", []):
+            statuses[entry.get("number")] = entry.get("status", "Unknown")
+        return statuses
+
+    @timed("external")
+    def send(self, message, recipients):
+        """Send one text to many numbers, chunked to max_recipients per call."""
+        recipients = list(dict.fromkeys(recipients))
+        statuses = {}
+        for start in range(0, len(recipients), self.max_recipients):
+            chunk = recipients[start:start + self.max_recipients]
+            try:
+                response = self.backend.send(message, chunk)
+            except SMSGatewayError as e:
+                statuses.update({number: f"Error: {e}" for number in chunk})
+                continue
+            statuses.update(self.parse_recipients(response, chunk))
+        return statuses
+
+    def send_many(self, messages):
+        """
+        Send a list of (phone_number, message) pairs, grouping identical
+        texts into shared calls. Returns a status per pair, in order.
+        """
+        by_text = {}
+        for phone_number, message in messages:
+            by_text.setdefault(message, []).append(phone_number)
+        statuses = {}
+        for message, recipients in by_text.items():
+            for number, status in self.send(message, recipients).items():
+                statuses[(number, message)] = status
+        return [statuses[(phone_number, message)] for phone_number, message in messages]
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    """Return the process-wide SMS gateway, building it on first use."""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                backend_class = import_string(getattr(settings, "SMS_BACKEND", "shop.sms.AfricasTalkingBackend"))
+                backend = backend_class(**getattr(settings, "SMS_BACKEND_OPTIONS", {}))
+                _gateway = SMSGateway(backend, max_recipients=getattr(settings, "SMS_MAX_RECIPIENTS_PER_CALL", 100))
+    return _gateway
+
+
+def reset_gateway():
+    """Drop the cached gateway, e.g. after changing SMS settings in tests."""
+    global _gateway
+    with _gateway_lock:
+        _gateway = None
+
+
+@receiver(setting_changed)
+def _reset_on_setting_change(setting, **kwargs):
+    if setting.startswith("SMS_"):
+        reset_gateway()
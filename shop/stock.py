@@ -0,0 +1,95 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from .models import Product
+from .response_cache import invalidate_responses
+
+
+class OutOfStock(Exception):
+    """Raised when an order asks for more units than are in stock."""
+
+    def __init__(self, shortages):
+        super().__init__("Insufficient stock")
+        # product id -> units currently available
+        self.shortages = shortages
+
+
+def _quantity_case(quantities):
+    return Case(
+        *[When(pk=product_id, then=Value(quantity)) for product_id, quantity in quantities.items()],
+        output_field=IntegerField(),
+    )
+
+
+def _shortages(quantities):
+    available = dict(Product.objects.filter(pk__in=quantities).values_list("id", "stock_quantity"))
+    return {
+        product_id: available.get(product_id, 0)
+        for product_id, quantity in sorted(quantities.items())
+        if available.get(product_id, 0) < quantity
+    }
+
+
+def _reserve_optimistic(quantities):
+    # One conditional UPDATE for the whole order; a row only changes if it
+    # still has enough stock when the database applies the write.
+    quantity = _quantity_case(quantities)
+    updated = Product.objects.filter(pk__in=quantities, stock_quantity__gte=quantity).update(
+        stock_quantity=F("stock_quantity") - quantity, updated_at=timezone.now()
+    )
+    if updated != len(quantities):
+        raise OutOfStock(_shortages(quantities))
+
+
+def _reserve_locking(quantities):
+    # Lock the rows in id order (so concurrent orders cannot deadlock),
+    # check them, then write the new values in one statement.
+    products = list(Product.objects.select_for_update().filter(pk__in=quantities).order_by("id"))
+    available = {p.id: p.stock_quantity for p in products}
+    shortages = {
+        product_id: available.get(product_id, 0)
+        for product_id, quantity in sorted(quantities.items())
+        if available.get(product_id, 0) < quantity
+    }
+    if shortages:
+        raise OutOfStock(shortages)
+    now = timezone.now()
+    for p in products:
+        p.stock_quantity -= quantities[p.id]
+        p.updated_at = now
+    Product.objects.bulk_update(products, ["stock_quantity", "updated_at"])
+
+
+RESERVATION_MODES = {
+    "optimistic": _reserve_optimistic,
+    "locking": _reserve_locking,
+}
+
+
+def reserve_stock(quantities, mode=None):
+    """
+    Take stock for every product in `quantities` (product id -> units) or
+    for none of them. Raises OutOfStock listing every short product.
+    Run inside the transaction that creates the order so a later failure
+    gives the stock back.
+    """
+    mode = mode or getattr(settings, "STOCK_RESERVATION_MODE", "optimistic")
+    with transaction.atomic():
+        RESERVATION_MODES[mode](quantities)
+    # stock_quantity is part of the cached product list
+    invalidate_responses()
+
+
+def release_stock(order):
+    """Put the units of every item of `order` back on the shelf."""
+    quantities = {}
+    for product_id, quantity in order.items.values_list("product_id", "quantity"):
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    if quantities:
+        quantity = _quantity_case(quantities)
+        Product.objects.filter(pk__in=quantities).update(
+            stock_quantity=F("stock_quantity") + quantity, updated_at=timezone.now()
+        )
+        invalidate_responses()
@@ -1,9 +1,24 @@
 # shop/tests/conftest.py
+import os
+import re
+import traceback
+from contextlib import ExitStack, contextmanager
+
 import pytest
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
 from django.contrib.auth.models import User
 from rest_framework.test import APIClient
 from shop.models import Category, Product, Customer
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # cached data would otherwise outlive each test's database rollback
+    cache.clear()
+    yield
+    cache.clear()
+
 @pytest.fixture()
 def client():
     return APIClient()
@@ -25,3 +40,92 @@ def user():
 @pytest.fixture()
 def customer(user):
     return Customer.objects.create(user=user, phone="+254700000000")
+
+@pytest.fixture()
+def tree():
+    root = Category.objects.create(name="All")
+    food = Category.objects.create(name="Food", parent=root)
+    bread = Category.objects.create(name="Bread", parent=food)
+    tech = Category.objects.create(name="Tech", parent=root)
+    return root, food, bread, tech
+
+
+# -------- Query budgets --------
+SQL_LITERALS = [
+    (re.compile(r'"s\d+_x\d+"'), '"s?"'),  # savepoint names
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\b\d+\b"), "?"),
+    (re.compile(r"%s"), "?"),
+    (re.compile(r"\((?:\?, )+\?\)"), "(...)"),
+]
+
+
+def query_shape(sql):
+    """The SQL with its values and IN-list lengths blanked out, so repeats of one query compare equal."""
+    for pattern, replacement in SQL_LITERALS:
+        sql = pattern.sub(replacement, sql)
+    return sql
+
+
+class QueryRecorder:
+    """Every query run on any connection while active, with the project stack frames that issued it."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __len__(self):
+        return len(self.queries)
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self._record))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def _record(self, execute, sql, params, many, context):
+        base = str(settings.BASE_DIR)
+        frames = [
+            frame for frame in traceback.extract_stack()[:-1]
+            if frame.filename.startswith(base) and "site-packages" not in frame.filename
+            and os.sep + "tests" + os.sep not in frame.filename
+        ]
+        self.queries.append((sql, frames))
+        return execute(sql, params, many, context)
+
+    def shapes(self):
+        """{shape: [stack of its first run, count]}, most repeated first."""
+        shapes = {}
+        for sql, frames in self.queries:
+            entry = shapes.setdefault(query_shape(sql), [frames, 0])
+            entry[1] += 1
+        return dict(sorted(shapes.items(), key=lambda item: -item[1][1]))
+
+    def report(self, headline, limit=10):
+        lines = [headline]
+        for shape, (frames, count) in list(self.shapes().items())[:limit]:
+            lines.append(f"  {count} x {shape}")
+            lines.extend(
+                f"      {os.path.relpath(frame.filename, settings.BASE_DIR)}:{frame.lineno} in {frame.name}"
+                for frame in frames[-6:]
+            )
+        return "\n".join(lines)
+
+
+@pytest.fixture()
+def query_budget():
+    """
+    with query_budget(5, "GET /shop/orders/"): ... fails the test when the
+    block runs more than 5 queries, listing each query shape with how often
+    it ran and where from. The block gets the QueryRecorder.
+    """
+    @contextmanager
+    def check(limit, label="The block"):
+        with QueryRecorder() as recorder:
+            yield recorder
+        if len(recorder) > limit:
+            pytest.fail(recorder.report(f"{label} ran {len(recorder)} queries; the budget is {limit}."), pytrace=False)
+
+    return check
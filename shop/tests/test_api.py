@@ -1,5 +1,8 @@
 # shop/tests/test_api.py
 import pytest
+from decimal import Decimal
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth.models import User
 from shop.models import Category, Product, Customer, Order
@@ -50,6 +53,30 @@ def test_product_list_filter(client, category, product):
     assert client.get(url + f"?category_id={category.id}").status_code == 200
     assert client.get(url + f"?category_name={category.name}").status_code == 200
 
+@pytest.mark.django_db
+def test_product_list_fast_path_matches_serializer(client, category, settings):
+    child = Category.objects.create(name="Phones", parent=category)
+    Product.objects.create(name="Cable", description="", price="0.50", category=child, is_active=False)
+    Product.objects.create(name="Case", description="Blue", price="12.00", category=category)
+    url = reverse("product-list-create") + "?ordering=price"
+    fast = client.get(url)
+    settings.API_FAST_LIST_SERIALIZATION = False
+    standard = client.get(url)
+    assert fast.content == standard.content
+    assert fast.data[0]["category_detail"]["full_path"] == "Electronics > Phones"
+
+@pytest.mark.django_db
+def test_product_list_query_count_is_flat(client, category):
+    url = reverse("product-list-create")
+    Product.objects.create(name="One", price="1.00", category=category)
+    with CaptureQueriesContext(connection) as one:
+        client.get(url)
+    for i in range(20):
+        Product.objects.create(name=f"P{i}", price="1.00", category=Category.objects.create(name=f"C{i}"))
+    with CaptureQueriesContext(connection) as many:
+        client.get(url)
+    assert len(many) == len(one)
+
 @pytest.mark.django_db
 def test_product_create_with_category_id(client, category):
     url = reverse("product-list-create")
@@ -140,3 +167,46 @@ def test_order_create_without_items(client, customer):
     data = {"customer_id": customer.id, "items": []}
     r = client.post(url, data, format="json")
     assert r.status_code == 400
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("items", [{"product_id": 1}, [1], ["abc"], [[1, 2]], "abc"])
+def test_order_create_with_malformed_items(client, customer, product, items):
+    url = reverse("order-create")
+    r = client.post(url, {"customer_id": customer.id, "items": items}, format="json")
+    assert r.status_code == 400
+    assert not Order.objects.exists()
+
+@pytest.mark.django_db
+def test_order_create_reports_all_missing_products(client, customer, product):
+    url = reverse("order-create")
+    data = {"customer_id": customer.id, "items": [
+        {"product_id": 998, "quantity": 1},
+        {"product_id": product.id, "quantity": 1},
+        {"product_id": 999, "quantity": 1},
+    ]}
+    r = client.post(url, data, format="json")
+    assert r.status_code == 404
+    assert r.data["missing_product_ids"] == [998, 999]
+    assert not Order.objects.exists()
+
+@pytest.mark.django_db
+def test_order_create_sets_total_once(client, customer, product):
+    url = reverse("order-create")
+    data = {"customer_id": customer.id, "items": [{"product_id": product.id, "quantity": 3}]}
+    r = client.post(url, data, format="json")
+    assert r.status_code == 201
+    assert Order.objects.get(customer=customer).total_amount == Decimal("2097.00")
+
+@pytest.mark.django_db
+def test_create_order_query_count_is_flat(customer, category):
+    from shop.orders import create_order
+
+    products = [Product.objects.create(name=f"P{i}", price="1.50", category=category) for i in range(40)]
+
+    def count_queries(n):
+        items = [{"product_id": p.id, "quantity": 2} for p in products[:n]]
+        with CaptureQueriesContext(connection) as ctx:
+            create_order(customer, items)
+        return len(ctx.captured_queries)
+
+    assert count_queries(1) == count_queries(40)
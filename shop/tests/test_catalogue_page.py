@@ -0,0 +1,93 @@
+import re
+
+import pytest
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from shop.models import Category, Product
+from shop.response_cache import get_counters
+
+
+@pytest.fixture()
+def catalogue(category):
+    phones = Category.objects.create(name="Phones", parent=category)
+    products = [
+        Product.objects.create(name=f"Item {i}", price=f"{i + 1}.00", category=phones if i % 2 else category)
+        for i in range(5)
+    ]
+    return phones, products
+
+
+def names(response):
+    return re.findall(r"<h5>(.*?)</h5>", response.content.decode())
+
+
+def next_link(response):
+    match = re.search(r'<a href="([^"]+)"[^>]*>More results</a>', response.content.decode())
+    return match and match.group(1).replace("&amp;", "&")
+
+
+@pytest.mark.django_db
+def test_pages_walk_the_catalogue_by_keyset(settings, catalogue):
+    settings.API_PAGE_SIZE = 2
+    url = reverse("product-list")
+    r = Client().get(url)
+    seen = names(r)
+    while next_link(r):
+        r = Client().get(url + next_link(r))
+        seen += names(r)
+    assert seen == [f"Item {i}" for i in reversed(range(5))]
+    assert "Previous" in r.content.decode()
+
+
+@pytest.mark.django_db
+def test_grid_fragment_is_shared_but_the_csrf_token_is_not(catalogue):
+    url = reverse("product-list") + "?max_price=3"
+    first = Client().get(url)
+    with CaptureQueriesContext(connection) as queries:
+        second = Client().get(url)
+    assert names(first) == names(second) == ["Item 2", "Item 1", "Item 0"]
+    assert get_counters()["product-grid"] == {"hit": 1, "miss": 1}
+    assert not any('"shop_product"."name"' in q["sql"] for q in queries.captured_queries)
+
+    token = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', second.content.decode()).group(1)
+    assert token != "__csrf_token__"
+    assert second.cookies["csrftoken"].value
+
+
+@pytest.mark.django_db
+def test_saves_drop_the_cached_grid_and_selector(catalogue):
+    phones, products = catalogue
+    url = reverse("product-list")
+    Client().get(url)
+    products[4].name = "Renamed"
+    products[4].save()
+    phones.name = "Mobiles"
+    phones.save()
+    r = Client().get(url)
+    assert names(r)[0] == "Renamed"
+    assert "   Mobiles</option>" in r.content.decode()
+
+
+@pytest.mark.django_db
+def test_category_selector_comes_from_the_tree_snapshot(catalogue):
+    url = reverse("product-list")
+    Client().get(url)
+    with CaptureQueriesContext(connection) as queries:
+        r = Client().get(url + "?min_price=1")
+    assert ">Electronics</option>" in r.content.decode()
+    assert not any('"shop_category"."name"' in q["sql"] for q in queries.captured_queries)
+
+
+@pytest.mark.django_db
+def test_filled_in_token_passes_the_csrf_check(catalogue, customer):
+    Client().get(reverse("product-list"))  # warm the shared fragment
+    client = Client(enforce_csrf_checks=True)
+    client.force_login(customer.user)
+    page = client.get(reverse("product-list")).content.decode()
+    token = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', page).group(1)
+    product = catalogue[1][0]
+    r = client.post(reverse("order_product", args=[product.id]), {"quantity": 1, "csrfmiddlewaretoken": token})
+    assert r.status_code != 403
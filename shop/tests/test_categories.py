@@ -0,0 +1,124 @@
+import pytest
+from django.urls import reverse
+
+from shop import categories
+from shop.categories import get_subtree_ids
+from shop.models import Category, Product
+
+pytestmark = pytest.mark.django_db
+
+
+def test_subtree_ids(tree):
+    root, food, bread, tech = tree
+    assert get_subtree_ids(root.id) == {root.id, food.id, bread.id, tech.id}
+    assert get_subtree_ids(food.id) == {food.id, bread.id}
+    assert get_subtree_ids(bread.id) == {bread.id}
+
+
+def test_subtree_served_from_memory(tree, django_assert_num_queries):
+    root, food, _, _ = tree
+    get_subtree_ids(root.id)
+    with django_assert_num_queries(0):
+        get_subtree_ids(food.id)
+        get_subtree_ids(root.id)
+
+
+def test_insert_invalidates(tree):
+    _, food, bread, _ = tree
+    get_subtree_ids(food.id)
+    rye = Category.objects.create(name="Rye", parent=food)
+    assert get_subtree_ids(food.id) == {food.id, bread.id, rye.id}
+
+
+def test_move_invalidates(tree):
+    _, food, bread, tech = tree
+    get_subtree_ids(food.id)
+    bread.move_to(tech)
+    assert get_subtree_ids(food.id) == {food.id}
+    assert get_subtree_ids(tech.id) == {tech.id, bread.id}
+
+    bread = Category.objects.get(pk=bread.pk)
+    bread.parent = Category.objects.get(pk=food.pk)
+    bread.save()
+    assert get_subtree_ids(food.id) == {food.id, bread.id}
+
+
+def test_delete_invalidates(tree):
+    root, food, _, tech = tree
+    get_subtree_ids(root.id)
+    food.delete()
+    assert get_subtree_ids(root.id) == {root.id, tech.id}
+    with pytest.raises(Category.DoesNotExist):
+        get_subtree_ids(food.id)
+
+
+def test_changes_made_by_another_worker_are_picked_up(settings, tree):
+    _, food, bread, tech = tree
+    stale = categories.get_category_tree()
+    bread.move_to(tech)
+    categories._tree = stale  # as in a worker that never saw the signals
+    settings.CATEGORY_TREE_CHECK_INTERVAL = 0
+    assert get_subtree_ids(tech.id) == {tech.id, bread.id}
+
+    stale = categories.get_category_tree()
+    Category.objects.filter(pk=bread.pk).update(parent=food)
+    Category.objects.rebuild()
+    categories.invalidate_category_tree(touch=True)
+    categories._tree = stale
+    assert get_subtree_ids(food.id) == {food.id, bread.id}
+
+    stale = categories.get_category_tree()
+    rye = Category.objects.create(name="Rye", parent=food)
+    categories._tree = stale
+    settings.CATEGORY_TREE_CHECK_INTERVAL = 3600
+    assert get_subtree_ids(rye.id) == {rye.id}  # an unknown id forces a check
+
+
+def test_avg_price_and_products_page_use_subtree(client, tree):
+    root, food, bread, _ = tree
+    Product.objects.create(name="Loaf", price="2.00", category=bread)
+    Product.objects.create(name="Flour", price="4.00", category=food)
+    r = client.get(reverse("category-avg-price", args=[food.id]))
+    assert r.data["average_price"] == 3
+    r = client.get(reverse("product-list") + f"?category={food.id}")
+    assert {p.name for p in r.context["products"]} == {"Loaf", "Flour"}
+    assert client.get(reverse("product-list") + "?category=999").status_code == 404
+
+
+def _make_categories(n):
+    root = Category.objects.create(name="Root")
+    for i in range(n):
+        parent = Category.objects.create(name=f"Parent {i}", parent=root)
+        child = Category.objects.create(name=f"Child {i}", parent=parent)
+        Product.objects.create(name=f"Product {i}", price="1.00", category=child)
+
+
+@pytest.mark.parametrize("url_name", ["category-list-create", "product-list-create"])
+def test_list_query_count_does_not_grow(client, url_name):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    def count(n):
+        Category.objects.all().delete()
+        _make_categories(n)
+        with CaptureQueriesContext(connection) as ctx:
+            assert client.get(reverse(url_name)).status_code == 200
+        return len(ctx.captured_queries)
+
+    assert count(2) == count(20)
+
+
+def test_list_paths_and_children_counts(django_assert_num_queries):
+    from shop import serializers
+    _make_categories(20)
+    # the rows, their parents or categories, and one query over the tree: however many rows
+    with django_assert_num_queries(3):
+        data = serializers.CategorySerializer(Category.objects.all(), many=True).data
+    by_name = {row["name"]: row for row in data}
+    assert by_name["Child 1"]["full_path"] == "Root > Parent 1 > Child 1"
+    assert by_name["Root"]["children_count"] == 20
+    assert by_name["Child 0"]["children_count"] == 0
+
+    with django_assert_num_queries(3):
+        products = serializers.ProductSerializer(Product.objects.all(), many=True).data
+    assert products[0]["category_path"] == "Root > Parent 0 > Child 0"
@@ -0,0 +1,117 @@
+# shop/tests/test_conditional.py
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from shop.models import Category, Product
+
+
+def revalidate(client, url, response, **extra):
+    return client.get(url, HTTP_IF_NONE_MATCH=response["ETag"], **extra)
+
+
+@pytest.mark.django_db
+def test_product_list_returns_304_without_serializing(client, product):
+    url = reverse("product-list-create")
+    first = client.get(url)
+    assert first.status_code == 200 and first.has_header("ETag") and first.has_header("Last-Modified")
+    with CaptureQueriesContext(connection) as queries:
+        second = revalidate(client, url, first)
+    assert second.status_code == 304
+    assert not any('"shop_product"."name"' in q["sql"] for q in queries.captured_queries)
+
+
+@pytest.mark.django_db
+def test_if_modified_since_returns_304(client, product):
+    url = reverse("product-list-create")
+    first = client.get(url)
+    assert client.get(url, HTTP_IF_MODIFIED_SINCE=first["Last-Modified"]).status_code == 304
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("change", ["update", "delete", "create", "stock", "rename_category"])
+def test_product_list_etag_changes_with_the_catalogue(client, category, product, change):
+    url = reverse("product-list-create")
+    first = client.get(url)
+    if change == "update":
+        product.name = "Renamed"
+        product.save()
+    elif change == "delete":
+        product.delete()
+    elif change == "create":
+        Product.objects.create(name="New", price="1.00", category=category)
+    elif change == "stock":
+        from shop.stock import reserve_stock
+        reserve_stock({product.id: 1})
+    else:
+        category.name = "Gadgets"
+        category.save()
+    assert revalidate(client, url, first).status_code == 200
+
+
+@pytest.mark.django_db
+def test_etag_differs_per_query_string(client, category, product):
+    url = reverse("product-list-create")
+    first = client.get(url)
+    other = client.get(url + f"?category_id={category.id}")
+    assert first["ETag"] != other["ETag"]
+    assert revalidate(client, url + f"?category_id={category.id}", first).status_code == 200
+
+
+@pytest.mark.django_db
+def test_category_detail_revalidates_after_ancestor_rename(client, category):
+    child = Category.objects.create(name="Phones", parent=category)
+    url = reverse("category-detail", args=[child.id])
+    first = client.get(url)
+    assert revalidate(client, url, first).status_code == 304
+    category.name = "Gadgets"
+    category.save()
+    second = revalidate(client, url, first)
+    assert second.status_code == 200
+    assert second.data["full_path"] == "Gadgets > Phones"
+
+
+@pytest.mark.django_db
+def test_category_list_revalidates(client, category):
+    url = reverse("category-list-create")
+    first = client.get(url)
+    assert revalidate(client, url, first).status_code == 304
+
+
+@pytest.mark.django_db
+def test_cache_control_comes_from_settings(client, product, settings):
+    settings.CACHE_CONTROL = {"product-list-create": {"public": True, "max_age": 5}}
+    response = client.get(reverse("product-list-create"))
+    assert "max-age=5" in response["Cache-Control"] and "public" in response["Cache-Control"]
+    assert not client.get(reverse("category-list-create")).has_header("Cache-Control")
+
+
+@pytest.mark.django_db
+def test_products_page_revalidates(client, product):
+    from django.test import Client
+    web = Client()
+    url = reverse("product-list")
+    first = web.get(url)
+    assert first.status_code == 200
+    assert web.get(url, HTTP_IF_NONE_MATCH=first["ETag"]).status_code == 304
+    assert "private" in first["Cache-Control"]
+
+
+@pytest.mark.django_db
+def test_every_worker_hands_out_the_same_etag(client, product):
+    from django.core.cache import cache
+    from shop import categories
+
+    url = reverse("product-list-create")
+    first = client.get(url)
+    # another worker: its own (empty) local cache and no tree snapshot yet
+    cache.clear()
+    categories._tree = None
+    assert revalidate(client, url, first).status_code == 304
+
+
+@pytest.mark.django_db
+def test_delete_advances_the_category_stamp(category, product):
+    before = Category.objects.get(pk=category.pk).updated_at
+    product.delete()
+    assert Category.objects.get(pk=category.pk).updated_at > before
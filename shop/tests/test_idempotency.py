@@ -0,0 +1,63 @@
+import pytest
+from datetime import timedelta
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from shop.models import IdempotencyKey, Notification, Order, Product
+
+pytestmark = pytest.mark.django_db
+
+
+def post_order(client, customer, product, key, quantity=1):
+    data = {"customer_id": customer.id, "items": [{"product_id": product.id, "quantity": quantity}]}
+    return client.post(reverse("order-create"), data, format="json", HTTP_IDEMPOTENCY_KEY=key)
+
+
+def test_retry_replays_without_new_order(client, customer, product, django_assert_num_queries):
+    first = post_order(client, customer, product, "abc")
+    assert first.status_code == 201
+
+    with django_assert_num_queries(1):
+        retry = post_order(client, customer, product, "abc")
+    assert retry.status_code == 201
+    assert retry["Idempotent-Replayed"] == "true"
+    assert retry.json() == first.json()
+    assert Order.objects.count() == 1
+    assert Notification.objects.count() == 1
+
+
+def test_key_reused_with_different_body_is_rejected(client, customer, product):
+    post_order(client, customer, product, "abc")
+    r = post_order(client, customer, product, "abc", quantity=2)
+    assert r.status_code == 422
+    assert Order.objects.count() == 1
+
+
+def test_requests_without_key_are_not_deduplicated(client, customer, product):
+    post_order(client, customer, product, "")
+    post_order(client, customer, product, "")
+    assert Order.objects.count() == 2
+
+
+def test_expired_key_runs_again(client, customer, product):
+    post_order(client, customer, product, "abc")
+    IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+    assert post_order(client, customer, product, "abc").status_code == 201
+    assert Order.objects.count() == 2
+
+
+def test_generic_create_view_is_idempotent(client, category):
+    url = reverse("product-list-create")
+    data = {"name": "Laptop", "price": "1000.00", "category_id": category.id}
+    client.post(url, data, format="json", HTTP_IDEMPOTENCY_KEY="p1")
+    client.post(url, data, format="json", HTTP_IDEMPOTENCY_KEY="p1")
+    assert Product.objects.filter(name="Laptop").count() == 1
+
+
+def test_purge_command_removes_expired_keys(client, customer, product):
+    post_order(client, customer, product, "old")
+    post_order(client, customer, product, "new")
+    IdempotencyKey.objects.filter(key="old").update(expires_at=timezone.now() - timedelta(seconds=1))
+    call_command("purge_idempotency_keys")
+    assert list(IdempotencyKey.objects.values_list("key", flat=True)) == ["new"]
@@ -0,0 +1,97 @@
+import re
+import time
+
+import pytest
+from django.test import Client
+from django.urls import reverse
+
+from shop.metrics import RequestTimings, _current, reset_metrics, timed
+
+
+@pytest.fixture(autouse=True)
+def sample_everything(settings):
+    settings.METRICS_SAMPLE_RATE = 1.0
+    settings.METRICS_TOKEN = ""
+    reset_metrics()
+    yield
+    reset_metrics()
+
+
+def durations(response):
+    return dict(re.findall(r"(\w+);dur=([\d.]+)", response["Server-Timing"]))
+
+
+@pytest.mark.django_db
+def test_sampled_requests_are_broken_down(client, product):
+    r = client.get(reverse("product-list-create"))
+    timing = durations(r)
+    assert set(timing) == {"db", "serialize", "render", "external", "total"}
+    assert float(timing["serialize"]) > 0
+    assert float(timing["total"]) >= float(timing["db"])
+    assert re.search(r'db;dur=[\d.]+;desc="\d+ queries"', r["Server-Timing"])
+
+    page = Client().get(reverse("product-list"))
+    assert float(durations(page)["render"]) > 0
+
+
+@pytest.mark.django_db
+def test_unsampled_requests_only_report_the_total(settings, client, product):
+    settings.METRICS_SAMPLE_RATE = 0
+    r = client.get(reverse("product-list-create"))
+    assert set(durations(r)) == {"total"}
+    body = client.get(reverse("metrics")).content.decode()
+    assert 'shop_http_request_duration_seconds_count{view="product-list-create",method="GET",status="200"} 1' in body
+    assert "shop_http_request_db_queries_count" not in body
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint_exposes_histograms(client, product):
+    client.get(reverse("product-list-create"))
+    r = client.get(reverse("metrics"))
+    assert r["Content-Type"].startswith("text/plain; version=0.0.4")
+    body = r.content.decode()
+    assert "# TYPE shop_http_request_duration_seconds histogram" in body
+    assert 'shop_http_request_duration_seconds_bucket{view="product-list-create",method="GET",status="200",le="+Inf"} 1' in body
+    assert 'shop_http_request_component_seconds_count{view="product-list-create",component="serialize"} 1' in body
+    assert 'shop_http_request_db_queries_count{view="product-list-create"} 1' in body
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint_checks_the_token(settings, client):
+    settings.METRICS_TOKEN = "secret"
+    assert client.get(reverse("metrics")).status_code == 403
+    assert client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer secret").status_code == 200
+
+
+def test_nested_timed_blocks_count_once():
+    timings = RequestTimings()
+    token = _current.set(timings)
+    try:
+        with timed("external"):
+            with timed("external"):
+                time.sleep(0.05)
+    finally:
+        _current.reset(token)
+    assert 0.05 <= timings.durations["external"] < 0.1
+
+    with timed("external"):  # outside a sampled request
+        pass
+    assert timings.durations["render"] == 0
+
+
+def test_sms_and_email_sends_count_as_external(settings):
+    from django.core.mail import EmailMessage
+    from shop.mailer import Mailer
+    from shop.sms import FakeBackend, SMSGateway
+
+    settings.EMAIL_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
+    timings = RequestTimings()
+    token = _current.set(timings)
+    try:
+        SMSGateway(FakeBackend(latency=0.05)).send("hi", ["+254700000000"])
+        assert timings.durations["external"] >= 0.05
+        before = timings.durations["external"]
+        Mailer().send_messages([EmailMessage("subject", "body", to=["a@b.com"])])
+        assert timings.durations["external"] > before
+    finally:
+        _current.reset(token)
@@ -0,0 +1,251 @@
+import time
+
+import pytest
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from shop import notifications
+from shop.models import Notification, Order
+
+pytestmark = pytest.mark.django_db
+
+
+class FailingTransport:
+    def send(self, notification):
+        raise notifications.DeliveryError("gateway down")
+
+
+@pytest.fixture()
+def locmem_transports(settings):
+    settings.NOTIFICATION_SMS_TRANSPORT = "shop.notifications.LocMemTransport"
+    settings.NOTIFICATION_EMAIL_TRANSPORT = "shop.notifications.LocMemTransport"
+    notifications.outbox.clear()
+    yield notifications.outbox
+    notifications.outbox.clear()
+
+
+@pytest.fixture()
+def admin_user():
+    return User.objects.create_user(username="boss", email="boss@example.com", is_staff=True)
+
+
+def test_order_create_queues_messages(client, customer, product, admin_user, locmem_transports):
+    url = reverse("order-create")
+    data = {"customer_id": customer.id, "items": [{"product_id": product.id, "quantity": 1}]}
+    r = client.post(url, data, format="json")
+    assert r.status_code == 201
+    assert r.data["confirmation_messages"] == {
+        "confirmation_text_status": "queued", "admin_email_status": "queued",
+    }
+    order = Order.objects.get(customer=customer)
+    assert set(order.notifications.values_list("channel", flat=True)) == {"sms", "email"}
+    assert locmem_transports == []
+
+
+def test_failed_order_queues_nothing(client, customer):
+    url = reverse("order-create")
+    data = {"customer_id": customer.id, "items": [{"product_id": 999, "quantity": 1}]}
+    client.post(url, data, format="json")
+    assert not Notification.objects.exists()
+
+
+def test_dispatch_delivers_queued(customer, product, admin_user, locmem_transports):
+    order = Order.objects.create(customer=customer)
+    notifications.queue_confirmation_messages(customer, customer.user, order, product, 1)
+    call_command("dispatch_notifications")
+    assert len(locmem_transports) == 2
+    assert not Notification.objects.exclude(status="sent").exists()
+
+
+def test_dispatch_retries_with_backoff_then_dead_letters(settings, monkeypatch, customer):
+    monkeypatch.setattr(notifications, "get_transport", lambda channel: FailingTransport())
+    settings.NOTIFICATION_MAX_ATTEMPTS = 3
+    settings.NOTIFICATION_BACKOFF_SECONDS = 10
+    n = Notification.objects.create(channel="sms", recipients=[customer.phone], body="hi")
+    now = timezone.now()
+
+    assert notifications.dispatch_batch(now=now) == {"sent": 0, "retried": 1, "dead": 0}
+    n.refresh_from_db()
+    assert n.next_attempt_at == now + timedelta(seconds=10)
+    assert n.last_error == "gateway down"
+
+    # not due yet
+    assert notifications.dispatch_batch(now=now) == {"sent": 0, "retried": 0, "dead": 0}
+
+    now = n.next_attempt_at
+    notifications.dispatch_batch(now=now)
+    n.refresh_from_db()
+    assert n.next_attempt_at == now + timedelta(seconds=20)
+
+    assert notifications.dispatch_batch(now=n.next_attempt_at)["dead"] == 1
+    n.refresh_from_db()
+    assert n.status == "dead"
+    assert n.attempts == 3
+
+
+def test_claimed_rows_are_leased_while_they_are_sent(settings, monkeypatch, customer):
+    settings.NOTIFICATION_LEASE_SECONDS = 60
+    n = Notification.objects.create(channel="sms", recipients=[customer.phone], body="hi")
+    now = timezone.now()
+    seen = []
+
+    class PeekingTransport:
+        def send(self, notification):
+            # another dispatcher running now finds nothing due
+            seen.append(notifications.dispatch_batch(now=now))
+            seen.append(Notification.objects.values_list("attempts", "next_attempt_at").get(pk=notification.pk))
+
+    monkeypatch.setattr(notifications, "get_transport", lambda channel: PeekingTransport())
+    assert notifications.dispatch_batch(now=now)["sent"] == 1
+    assert seen == [{"sent": 0, "retried": 0, "dead": 0}, (1, now + timedelta(seconds=60))]
+    n.refresh_from_db()
+    assert (n.status, n.attempts) == ("sent", 1)
+
+
+def test_rows_of_a_dispatcher_that_died_are_retried_after_the_lease(settings, monkeypatch, customer, locmem_transports):
+    settings.NOTIFICATION_LEASE_SECONDS = 60
+    n = Notification.objects.create(channel="sms", recipients=[customer.phone], body="hi")
+    now = timezone.now()
+    notifications._claim(100, now)  # and never records the outcome
+    assert notifications.dispatch_batch(now=now + timedelta(seconds=59))["sent"] == 0
+    assert notifications.dispatch_batch(now=now + timedelta(seconds=60))["sent"] == 1
+    n.refresh_from_db()
+    assert n.attempts == 2
+
+
+# ---------- SMS gateway ----------
+
+def test_gateway_is_built_once(settings):
+    from shop.sms import get_gateway
+    settings.SMS_BACKEND = "shop.sms.FakeBackend"
+    assert get_gateway() is get_gateway()
+
+
+def test_gateway_coalesces_identical_texts(settings):
+    from shop.sms import get_gateway
+    settings.SMS_BACKEND = "shop.sms.FakeBackend"
+    settings.SMS_MAX_RECIPIENTS_PER_CALL = 2
+    gateway = get_gateway()
+    statuses = gateway.send_many([
+        ("+254700000001", "sale"), ("+254700000002", "sale"),
+        ("+254700000003", "sale"), ("+254700000004", "other"),
+    ])
+    assert statuses == ["Success"] * 4
+    assert [len(recipients) for _, recipients in gateway.backend.calls] == [2, 1, 1]
+
+
+def test_gateway_reports_per_recipient_failures():
+    from shop.sms import SMSGateway, FakeBackend
+    gateway = SMSGateway(FakeBackend(failure_rate=0.5, seed=7))
+    statuses = gateway.send("hi", [f"+2547000000{i:02d}" for i in range(20)])
+    assert set(statuses.values()) == {"Success", "InvalidPhoneNumber"}
+
+
+def test_sms_transport_batches_notifications(settings, customer):
+    from shop.sms import get_gateway
+    settings.SMS_BACKEND = "shop.sms.FakeBackend"
+    for i in range(3):
+        Notification.objects.create(channel="sms", recipients=[f"+25470000000{i}"], body="Flash sale today")
+    assert notifications.dispatch_batch()["sent"] == 3
+    assert len(get_gateway().backend.calls) == 1
+
+
+# ---------- Email ----------
+
+def test_admin_emails_cached_until_user_saved(admin_user, django_assert_num_queries):
+    from shop.mailer import get_admin_emails
+    assert get_admin_emails() == ["boss@example.com"]
+    with django_assert_num_queries(0):
+        assert get_admin_emails() == ["boss@example.com"]
+    User.objects.create_user(username="boss2", email="boss2@example.com", is_staff=True)
+    assert sorted(get_admin_emails()) == ["boss2@example.com", "boss@example.com"]
+
+
+def test_admin_emails_expire_for_changes_made_elsewhere(settings, admin_user):
+    from shop.mailer import get_admin_emails
+    settings.ADMIN_EMAILS_CACHE_TIMEOUT = 1
+    assert get_admin_emails() == ["boss@example.com"]
+    User.objects.filter(pk=admin_user.pk).update(is_staff=False)  # no signal, as in another process
+    time.sleep(1.1)
+    assert get_admin_emails() == []
+
+
+def test_email_batch_uses_one_connection(monkeypatch, admin_user):
+    from django.core import mail
+    from shop import mailer
+    mailer.reset_mailer()
+    opened = []
+    real_get_connection = mailer.get_connection
+    monkeypatch.setattr(mailer, "get_connection", lambda **kw: opened.append(1) or real_get_connection(**kw))
+    for i in range(3):
+        Notification.objects.create(channel="email", recipients=[admin_user.email], subject=f"s{i}", body="b")
+    assert notifications.dispatch_batch()["sent"] == 3
+    assert len(mail.outbox) == 3
+    assert len(opened) == 1
+    mailer.reset_mailer()
+
+
+def test_only_the_emails_that_failed_are_retried(monkeypatch):
+    sent = []
+
+    class FlakyMailer:
+        def send_messages(self, email_messages):
+            for message in email_messages:
+                if message.to == ["down@example.com"]:
+                    raise OSError("connection refused")
+                sent.append(message.to)
+            return len(email_messages)
+
+    monkeypatch.setattr(notifications, "get_mailer", lambda: FlakyMailer())
+    ok = Notification.objects.create(channel="email", recipients=["up@example.com"], subject="s", body="b")
+    failed = Notification.objects.create(channel="email", recipients=["down@example.com"], subject="s", body="b")
+    assert notifications.dispatch_batch() == {"sent": 1, "retried": 1, "dead": 0}
+    ok.refresh_from_db()
+    failed.refresh_from_db()
+    assert (ok.status, failed.status, failed.last_error) == ("sent", "queued", "connection refused")
+    assert sent == [["up@example.com"]]
+
+
+def test_mailer_reconnects_without_resending(monkeypatch):
+    import smtplib
+    from django.core.mail import EmailMessage
+    from shop import mailer
+    delivered, drops = [], [True]
+
+    class DroppingConnection:
+        def open(self):
+            pass
+
+        def close(self):
+            pass
+
+        def send_messages(self, email_messages):
+            for message in email_messages:
+                if message.subject == "second" and drops:
+                    drops.pop()
+                    raise smtplib.SMTPServerDisconnected()
+                delivered.append(message.subject)
+            return len(email_messages)
+
+    monkeypatch.setattr(mailer, "get_connection", lambda **kw: DroppingConnection())
+    messages = [EmailMessage(subject, "b", to=["a@b.com"]) for subject in ("first", "second", "third")]
+    assert mailer.Mailer().send_messages(messages) == 3
+    assert delivered == ["first", "second", "third"]
+
+
+def test_email_digest_merges_admin_emails(settings, customer, product, admin_user):
+    from django.core import mail
+    settings.ORDER_EMAIL_DIGEST_SECONDS = 300
+    settings.NOTIFICATION_SMS_TRANSPORT = "shop.notifications.LocMemTransport"
+    for _ in range(2):
+        order = Order.objects.create(customer=customer)
+        notifications.queue_confirmation_messages(customer, customer.user, order, product, 1)
+
+    due_at = Notification.objects.filter(channel="email").first().next_attempt_at
+    assert due_at.timestamp() % 300 == 0
+    notifications.dispatch_batch(now=due_at)
+    assert len(mail.outbox) == 1
+    assert mail.outbox[0].subject == "2 new orders placed"
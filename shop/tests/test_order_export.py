@@ -0,0 +1,99 @@
+import csv
+import io
+import json
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from shop.models import Order, Product
+from shop.order_export import COLUMNS, export_orders
+from shop.orders import create_order
+
+
+@pytest.fixture()
+def orders(customer, category):
+    products = [
+        Product.objects.create(name=f"Item {i}", price="2.50", category=category, stock_quantity=100)
+        for i in range(3)
+    ]
+    placed = [
+        create_order(customer, [{"product_id": p.id, "quantity": 2} for p in products[:i + 1]])[0]
+        for i in range(3)
+    ]
+    Order.objects.filter(pk=placed[0].pk).update(status="shipped")
+    return placed
+
+
+def read_csv(text):
+    return list(csv.DictReader(io.StringIO(text)))
+
+
+@pytest.mark.django_db
+def test_csv_has_a_row_per_item(orders, customer):
+    rows = read_csv("".join(export_orders(Order.objects.all(), "csv")))
+    assert len(rows) == 1 + 2 + 3
+    assert list(rows[0]) == COLUMNS
+    first = rows[0]
+    assert (first["order_number"], first["customer_phone"], first["product_name"]) == (
+        orders[0].order_number, customer.phone, "Item 0"
+    )
+    assert (first["category"], first["quantity"], first["subtotal"]) == ("Electronics", "2", "5.00")
+
+
+@pytest.mark.django_db
+def test_ndjson_and_columnar_agree(orders):
+    records = [json.loads(line) for line in "".join(export_orders(Order.objects.all(), "ndjson")).splitlines()]
+    batches = [json.loads(line) for line in "".join(export_orders(Order.objects.all(), "columnar", 4)).splitlines()]
+    assert [len(batch["order_number"]) for batch in batches] == [4, 2]
+    columns = {name: sum((batch[name] for batch in batches), []) for name in COLUMNS}
+    assert [record["unit_price"] for record in records] == columns["unit_price"] == ["2.50"] * 6
+
+
+@pytest.mark.django_db
+def test_queries_do_not_grow_with_orders(orders, customer, category):
+    def count():
+        with CaptureQueriesContext(connection) as queries:
+            "".join(export_orders(Order.objects.all(), "csv", chunk_size=100))
+        return len(queries)
+
+    before = count()
+    product = Product.objects.create(name="Extra", price="1.00", category=category, stock_quantity=100)
+    for _ in range(5):
+        create_order(customer, [{"product_id": product.id, "quantity": 1}])
+    assert count() == before
+
+
+@pytest.mark.django_db
+def test_export_endpoint_filters_and_streams(client, orders):
+    client.force_authenticate(User.objects.create_superuser(username="finance", password="pass"))
+    r = client.get(reverse("order-export") + "?status=shipped")
+    assert r.streaming
+    assert r["Content-Disposition"].startswith('attachment; filename="orders-')
+    rows = read_csv(b"".join(r.streaming_content).decode())
+    assert {row["order_number"] for row in rows} == {orders[0].order_number}
+
+    r = client.get(reverse("order-export") + "?export_format=ndjson&date_from=2000-01-01")
+    assert r["Content-Type"] == "application/x-ndjson"
+    assert len(b"".join(r.streaming_content).splitlines()) == 6
+    assert client.get(reverse("order-export") + "?export_format=xlsx").status_code == 400
+    assert client.get(reverse("order-export") + "?date_to=soon").status_code == 400
+
+
+@pytest.mark.django_db
+def test_export_endpoint_is_for_staff(client, customer):
+    client.force_authenticate(customer.user)
+    assert client.get(reverse("order-export")).status_code == 403
+
+
+@pytest.mark.django_db
+def test_export_orders_command(orders, tmp_path, capsys):
+    call_command("export_orders", "--status", "pending")
+    assert len(read_csv(capsys.readouterr().out)) == 5
+
+    path = tmp_path / "orders.ndjson"
+    call_command("export_orders", "--format", "ndjson", "--output", str(path))
+    assert len(path.read_text().splitlines()) == 6
@@ -0,0 +1,219 @@
+import datetime
+
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from shop.models import Customer, Order, Product
+from shop.orders import create_order
+
+
+def place(customer, product, quantity=1, status=None, created_at=None):
+    order, _ = create_order(customer, [{"product_id": product.id, "quantity": quantity}])
+    updates = {}
+    if status:
+        updates["status"] = status
+    if created_at:
+        updates["created_at"] = created_at
+    if updates:
+        Order.objects.filter(pk=order.pk).update(**updates)
+    return order
+
+
+@pytest.fixture()
+def products(category):
+    return [
+        Product.objects.create(name=f"Item {i}", price="10.00", category=category, stock_quantity=100)
+        for i in range(3)
+    ]
+
+
+@pytest.fixture()
+def other_customer():
+    user = User.objects.create_user(username="u2", password="pass")
+    return Customer.objects.create(user=user, phone="+254711111111")
+
+
+@pytest.mark.django_db
+def test_list_requires_login(client):
+    r = client.get(reverse("order-create"))
+    assert r.status_code == 403
+
+
+@pytest.mark.django_db
+def test_list_is_scoped_to_the_customer(client, customer, other_customer, products):
+    mine = place(customer, products[0])
+    place(other_customer, products[1])
+    client.force_authenticate(customer.user)
+    r = client.get(reverse("order-create"))
+    assert [o["order_number"] for o in r.data] == [mine.order_number]
+    assert r.data[0]["items"][0]["product_detail"]["name"] == "Item 0"
+
+
+@pytest.mark.django_db
+def test_detail_by_order_number(client, customer, other_customer, products):
+    mine = place(customer, products[0], quantity=2)
+    theirs = place(other_customer, products[1])
+    client.force_authenticate(customer.user)
+    r = client.get(reverse("order-detail", args=[mine.order_number]))
+    assert r.status_code == 200
+    assert r.data["items"][0]["quantity"] == 2
+    assert client.get(reverse("order-detail", args=[theirs.order_number])).status_code == 404
+
+
+@pytest.mark.django_db
+def test_status_and_date_filters(client, customer, products):
+    now = timezone.now()
+    old = place(customer, products[0], created_at=now - datetime.timedelta(days=10))
+    shipped = place(customer, products[1], status="shipped")
+    pending = place(customer, products[2])
+    client.force_authenticate(customer.user)
+    url = reverse("order-create")
+
+    r = client.get(url + "?status=shipped,delivered")
+    assert [o["order_number"] for o in r.data] == [shipped.order_number]
+    day = timezone.localdate(now - datetime.timedelta(days=10)).isoformat()
+    r = client.get(url + f"?date_from={day}&date_to={day}")
+    assert [o["order_number"] for o in r.data] == [old.order_number]
+    r = client.get(url + f"?date_from={timezone.localdate(now - datetime.timedelta(days=1)).isoformat()}")
+    assert {o["order_number"] for o in r.data} == {shipped.order_number, pending.order_number}
+
+    assert client.get(url + "?status=lost").status_code == 400
+    assert client.get(url + "?date_from=yesterday").status_code == 400
+
+
+@pytest.mark.django_db
+def test_pages_follow_the_link_header(client, customer, products):
+    orders = [place(customer, products[i % 3]) for i in range(5)]
+    client.force_authenticate(customer.user)
+    r = client.get(reverse("order-create") + "?page_size=2")
+    seen = [o["order_number"] for o in r.data]
+    while "Link" in r and 'rel="next"' in r["Link"]:
+        r = client.get(r["Link"].split(">")[0].lstrip("<"))
+        seen += [o["order_number"] for o in r.data]
+    assert seen == [o.order_number for o in reversed(orders)]
+
+
+@pytest.mark.django_db
+def test_list_query_count_is_flat(client, customer, products):
+    client.force_authenticate(customer.user)
+    url = reverse("order-create")
+    place(customer, products[0])
+    with CaptureQueriesContext(connection) as one:
+        client.get(url)
+    for i in range(6):
+        place(customer, products[i % 3], quantity=2)
+    with CaptureQueriesContext(connection) as many:
+        r = client.get(url)
+    assert len(r.data) == 7
+    assert len(many) == len(one)
+
+
+# ---------- Web "My Orders" page ----------
+
+@pytest.mark.django_db
+def test_orders_page_shows_only_the_customers_orders(client, customer, other_customer, products):
+    mine = place(customer, products[0])
+    theirs = place(other_customer, products[1])
+    client.force_login(customer.user)
+    page = client.get(reverse("orders")).content.decode()
+    assert mine.order_number in page
+    assert theirs.order_number not in page
+    assert "Item 0" in page
+
+
+@pytest.mark.django_db
+def test_orders_page_filters_and_pages(client, settings, customer, products):
+    settings.ORDERS_PAGE_SIZE = 2
+    orders = [place(customer, products[i % 3]) for i in range(3)]
+    Order.objects.filter(pk=orders[0].pk).update(status="shipped")
+    client.force_login(customer.user)
+
+    r = client.get(reverse("orders"))
+    assert [o.order_number for o in r.context["orders"]] == [orders[2].order_number, orders[1].order_number]
+    r = client.get(reverse("orders") + r.context["next_url"])
+    assert [o.order_number for o in r.context["orders"]] == [orders[0].order_number]
+
+    r = client.get(reverse("orders") + "?status=shipped")
+    assert [o.order_number for o in r.context["orders"]] == [orders[0].order_number]
+    r = client.get(reverse("orders") + "?end=not-a-date")
+    assert r.status_code == 200
+    assert list(r.context["orders"]) == []
+
+
+@pytest.mark.django_db
+def test_orders_page_query_count_is_flat(client, customer, products):
+    client.force_login(customer.user)
+    place(customer, products[0])
+    with CaptureQueriesContext(connection) as one:
+        client.get(reverse("orders"))
+    for i in range(8):
+        place(customer, products[i % 3], quantity=2)
+    with CaptureQueriesContext(connection) as many:
+        r = client.get(reverse("orders"))
+    assert len(r.context["orders"]) == 9
+    assert len(many) == len(one)
+
+
+# ---------- Dashboard ----------
+
+@pytest.mark.django_db
+def test_dashboard_summary(client, customer, products):
+    place(customer, products[0], quantity=2)
+    place(customer, products[1], status="cancelled")
+    client.force_login(customer.user)
+    r = client.get(reverse("dashboard"))
+    summary = r.context["summary"]
+    assert summary["order_count"] == 2
+    assert dict(summary["status_counts"]) == {"Pending": 1, "Cancelled": 1}
+    assert summary["lifetime_spend"] == 20
+    assert [p["name"] for p in r.context["products"]] == ["Item 2", "Item 1", "Item 0"]
+
+
+@pytest.mark.django_db
+def test_dashboard_is_served_from_the_cache(client, customer, products):
+    place(customer, products[0])
+    client.force_login(customer.user)
+    client.get(reverse("dashboard"))
+    with CaptureQueriesContext(connection) as queries:
+        client.get(reverse("dashboard"))
+    orders = [q["sql"] for q in queries.captured_queries if "shop_order" in q["sql"]]
+    assert len(orders) == 1 and "MAX" in orders[0]  # only the state of the user's orders
+    tables = " ".join(q["sql"] for q in queries.captured_queries)
+    assert "shop_product" not in tables and "shop_orderitem" not in tables
+
+
+@pytest.mark.django_db
+def test_dashboard_follows_orders_changed_by_another_worker(client, customer, products):
+    order = place(customer, products[0])
+    client.force_login(customer.user)
+    client.get(reverse("dashboard"))
+    # as another worker would: nothing reaches this worker's cache
+    Order.objects.filter(pk=order.pk).update(status="shipped", updated_at=timezone.now())
+    r = client.get(reverse("dashboard"))
+    assert dict(r.context["summary"]["status_counts"]) == {"Shipped": 1}
+
+
+@pytest.mark.django_db
+def test_dashboard_follows_order_and_product_changes(client, customer, other_customer, products):
+    client.force_login(customer.user)
+    client.get(reverse("dashboard"))
+    place(customer, products[0])
+    place(other_customer, products[1])
+    products[2].name = "Renamed"
+    products[2].save()
+    r = client.get(reverse("dashboard"))
+    assert r.context["summary"]["order_count"] == 1
+    assert r.context["products"][0]["name"] == "Renamed"
+
+
+@pytest.mark.django_db
+def test_dashboard_without_a_customer_creates_nothing(client, user):
+    client.force_login(user)
+    r = client.get(reverse("dashboard"))
+    assert r.status_code == 200
+    assert r.context["summary"]["order_count"] == 0
+    assert not Customer.objects.filter(user=user).exists()
@@ -0,0 +1,56 @@
+import multiprocessing
+
+import pytest
+from django.db import IntegrityError
+
+from shop import order_numbers
+from shop.models import Order
+from shop.order_numbers import SnowflakeGenerator
+
+pytestmark = pytest.mark.django_db
+
+
+def _generate(_):
+    return [order_numbers.next_order_number() for _ in range(5000)]
+
+
+def test_snowflake_numbers_sort_in_creation_order():
+    generator = SnowflakeGenerator(worker_id=3)
+    numbers = [generator() for _ in range(10000)]
+    assert numbers == sorted(numbers)
+    assert len(set(numbers)) == len(numbers)
+    assert all(len(n) <= Order._meta.get_field("order_number").max_length for n in numbers)
+
+
+def test_snowflake_unique_across_processes(settings):
+    settings.ORDER_NUMBER_GENERATOR = "shop.order_numbers.SnowflakeGenerator"
+    order_numbers.next_order_number()  # built in the parent, re-keyed in each child after fork
+    with multiprocessing.get_context("fork").Pool(8) as pool:
+        batches = pool.map(_generate, range(8))
+    numbers = [n for batch in batches for n in batch]
+    assert len(set(numbers)) == len(numbers)
+    assert all(batch == sorted(batch) for batch in batches)
+
+
+def test_sequence_generator(settings, customer):
+    settings.ORDER_NUMBER_GENERATOR = "shop.order_numbers.SequenceGenerator"
+    first = Order.objects.create(customer=customer)
+    second = Order.objects.create(customer=customer)
+    assert first.order_number < second.order_number
+    assert first.order_number.startswith("ORD-0000")
+
+
+def test_collision_is_retried(monkeypatch, customer):
+    taken = Order.objects.create(customer=customer).order_number
+    numbers = iter([taken, "ORD-FRESH"])
+    monkeypatch.setattr(order_numbers, "next_order_number", lambda: next(numbers))
+    order = Order.objects.create(customer=customer)
+    assert order.order_number == "ORD-FRESH"
+
+
+def test_collision_gives_up_after_max_attempts(settings, monkeypatch, customer):
+    settings.ORDER_NUMBER_MAX_ATTEMPTS = 2
+    taken = Order.objects.create(customer=customer).order_number
+    monkeypatch.setattr(order_numbers, "next_order_number", lambda: taken)
+    with pytest.raises(IntegrityError):
+        Order.objects.create(customer=customer)
@@ -0,0 +1,119 @@
+# shop/tests/test_pagination.py
+import base64
+import json
+import re
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from shop.models import Category, Customer, Product
+
+
+def link(response, rel):
+    match = re.search(rf'<([^>]+)>; rel="{rel}"', response.get("Link", ""))
+    return match.group(1) if match else None
+
+
+def walk(client, url):
+    pages, response = [], client.get(url)
+    while True:
+        assert response.status_code == 200
+        pages.append([row["id"] for row in response.data])
+        next_url = link(response, "next")
+        if not next_url:
+            return pages, response
+        response = client.get(next_url)
+
+
+@pytest.fixture()
+def products(category):
+    # repeated prices so the id tie-breaker matters
+    return Product.objects.bulk_create(
+        [Product(name=f"P{i}", price=f"{10 + i % 3}.00", category=category) for i in range(7)]
+    )
+
+
+@pytest.mark.django_db
+def test_product_pages_cover_every_row_once(client, products):
+    pages, _ = walk(client, reverse("product-list-create") + "?page_size=3")
+    assert [len(page) for page in pages] == [3, 3, 1]
+    ids = [pk for page in pages for pk in page]
+    assert ids == sorted((p.id for p in products), reverse=True)
+
+
+@pytest.mark.django_db
+def test_product_price_ordering_breaks_ties_by_id(client, products):
+    pages, _ = walk(client, reverse("product-list-create") + "?ordering=price&page_size=2")
+    ids = [pk for page in pages for pk in page]
+    expected = Product.objects.order_by("price", "id").values_list("id", flat=True)
+    assert ids == list(expected)
+
+
+@pytest.mark.django_db
+def test_previous_link_returns_the_earlier_page(client, products):
+    url = reverse("product-list-create") + "?ordering=price&page_size=3"
+    first = client.get(url)
+    second = client.get(link(first, "next"))
+    back = client.get(link(second, "prev"))
+    assert [row["id"] for row in back.data] == [row["id"] for row in first.data]
+    assert link(first, "prev") is None
+
+
+@pytest.mark.django_db
+def test_filters_apply_across_pages(client, products):
+    other = Category.objects.create(name="Books")
+    Product.objects.create(name="Novel", price="5.00", category=other)
+    url = reverse("product-list-create") + f"?category_name={other.name}&page_size=1"
+    pages, _ = walk(client, url)
+    assert len(pages) == 1 and len(pages[0]) == 1
+
+
+@pytest.mark.django_db
+def test_page_size_is_capped(client, products, settings):
+    settings.API_MAX_PAGE_SIZE = 4
+    response = client.get(reverse("product-list-create") + "?page_size=1000")
+    assert len(response.data) == 4
+
+
+@pytest.mark.django_db
+def test_bad_cursor_and_ordering_are_rejected(client, products):
+    url = reverse("product-list-create")
+    assert client.get(url + "?cursor=not-a-cursor").status_code == 404
+    assert client.get(url + "?ordering=name").status_code == 400
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("payload", [
+    {"o": "created", "v": ["garbage", "1"]},
+    {"o": ["x"], "v": []},
+    {"o": "created", "v": 5},
+    {"o": "price", "v": ["abc", "1"]},
+    {"o": "nope", "v": ["1", "1"]},
+    ["o", "v"],
+])
+def test_tampered_cursors_are_not_found(client, customer, products, payload):
+    cursor = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+    assert client.get(reverse("product-list-create") + f"?cursor={cursor}").status_code == 404
+    assert client.get(reverse("product-list") + f"?cursor={cursor}").status_code == 404
+    client.force_login(customer.user)
+    assert client.get(reverse("orders") + f"?cursor={cursor}").status_code == 404
+
+
+@pytest.mark.django_db
+def test_deep_page_uses_a_seek_not_an_offset(client, products):
+    url = reverse("product-list-create") + "?page_size=2"
+    _, last = walk(client, url)
+    with CaptureQueriesContext(connection) as queries:
+        client.get(last.wsgi_request.get_full_path())
+    select = next(q["sql"] for q in queries.captured_queries if 'FROM "shop_product"' in q["sql"])
+    assert "OFFSET" not in select.upper()
+
+
+@pytest.mark.django_db
+def test_customer_pages(client):
+    for i in range(5):
+        Customer.objects.create(user=User.objects.create_user(username=f"c{i}"), phone=f"+2547000000{i}")
+    pages, _ = walk(client, reverse("customer-list-create") + "?page_size=2&ordering=created")
+    ids = [pk for page in pages for pk in page]
+    assert ids == list(Customer.objects.order_by("created_at", "id").values_list("id", flat=True))
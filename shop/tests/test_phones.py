@@ -0,0 +1,77 @@
+# shop/tests/test_phones.py
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.urls import reverse
+from shop.forms import CustomerPhoneForm
+from shop.models import Customer
+from shop.phones import normalize_phone, normalize_phone_prefix
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("+254712345678", "+254712345678"),
+    ("+254 712-345-678", "+254712345678"),
+    ("+2540712345678", "+254712345678"),
+    ("00254712345678", "+254712345678"),
+    ("0712345678", "+254712345678"),
+    ("712345678", "+254712345678"),
+    ("+44 20 7946 0958", "+442079460958"),
+    ("12", ""),
+    ("", ""),
+])
+def test_normalize_phone(raw, expected):
+    assert normalize_phone(raw) == expected
+
+
+def test_normalize_phone_prefix():
+    assert normalize_phone_prefix("2547") == "+2547"
+    assert normalize_phone_prefix("0712") == "+254712"
+
+
+@pytest.fixture()
+def customers():
+    return [
+        Customer.objects.create(user=User.objects.create_user(username=f"c{i}"), phone=phone)
+        for i, phone in enumerate(["+254712345678", "0722 000 111", "+447911123456"])
+    ]
+
+
+def phones(response):
+    return sorted(Customer.objects.get(pk=row["id"]).phone_e164 for row in response.data)
+
+
+@pytest.mark.django_db
+def test_save_stores_normalized_columns(customers):
+    customer = Customer.objects.get(pk=customers[1].pk)
+    assert customer.phone_e164 == "+254722000111"
+    assert customer.phone_digits_reversed == "111000227452"
+    customer.phone = "+44 7911 123 457"
+    customer.save(update_fields=["phone"])
+    assert Customer.objects.get(pk=customer.pk).phone_e164 == "+447911123457"
+
+
+@pytest.mark.django_db
+def test_phone_form_is_normalized(user):
+    form = CustomerPhoneForm(data={"country_code": "+254", "phone": "0711 222 333"}, instance=Customer(user=user))
+    assert form.is_valid()
+    assert form.save().phone_e164 == "+254711222333"
+
+
+@pytest.mark.django_db
+def test_api_phone_modes(client, customers):
+    url = reverse("customer-list-create")
+    assert phones(client.get(url + "?phone=0712345678&phone_match=exact")) == ["+254712345678"]
+    assert phones(client.get(url + "?phone=2547")) == ["+254712345678", "+254722000111"]
+    assert phones(client.get(url + "?phone=%2B44&phone_match=prefix")) == ["+447911123456"]
+    assert phones(client.get(url + "?phone=0111&phone_match=suffix")) == ["+254722000111"]
+    assert phones(client.get(url + "?phone=abc&phone_match=exact")) == []
+    assert client.get(url + "?phone=1&phone_match=contains").status_code == 400
+
+
+@pytest.mark.django_db
+def test_backfill_command(customers):
+    Customer.objects.update(phone_e164="", phone_digits_reversed="")
+    call_command("backfill_customer_phones", "--batch-size", "2")
+    assert sorted(Customer.objects.values_list("phone_e164", flat=True)) == [
+        "+254712345678", "+254722000111", "+447911123456",
+    ]
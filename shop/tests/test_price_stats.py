@@ -0,0 +1,112 @@
+import pytest
+from decimal import Decimal
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.urls import reverse
+
+from shop.models import Category, CategoryPriceStats, Product
+from shop.price_stats import find_inconsistencies, refresh_categories
+
+pytestmark = pytest.mark.django_db
+
+
+def stats(category):
+    return CategoryPriceStats.objects.get(category=category)
+
+
+def test_create_update_delete_keep_rollup_consistent(tree):
+    root, food, bread, tech = tree
+    loaf = Product.objects.create(name="Loaf", price="2.00", category=bread)
+    flour = Product.objects.create(name="Flour", price="4.00", category=food)
+    Product.objects.create(name="Phone", price="100.00", category=tech)
+
+    s = stats(root)
+    assert (s.subtree_count, s.subtree_sum, s.subtree_min, s.subtree_max) == (3, Decimal("106.00"), Decimal("2.00"), Decimal("100.00"))
+    assert (stats(food).direct_count, stats(food).subtree_count) == (1, 2)
+
+    loaf.price = Decimal("9.00")
+    loaf.save()
+    assert stats(food).subtree_min == Decimal("4.00")
+    assert stats(bread).direct_max == Decimal("9.00")
+
+    flour.category = tech
+    flour.save()
+    assert stats(food).subtree_count == 1
+    assert stats(tech).subtree_min == Decimal("4.00")
+
+    Product.objects.get(name="Phone").delete()
+    assert stats(tech).subtree_max == Decimal("4.00")
+    assert find_inconsistencies() == []
+
+
+def test_category_move_and_delete(tree):
+    root, food, bread, tech = tree
+    Product.objects.create(name="Loaf", price="2.00", category=bread)
+    Category.objects.get(pk=bread.pk).move_to(Category.objects.get(pk=tech.pk))
+    assert stats(food).subtree_count == 0
+    assert stats(tech).subtree_count == 1
+    assert find_inconsistencies() == []
+
+    Category.objects.get(pk=tech.pk).delete()
+    assert stats(root).subtree_count == 0
+    assert find_inconsistencies() == []
+
+
+def test_avg_price_is_a_single_lookup(client, tree, django_assert_num_queries):
+    root, food, bread, _ = tree
+    Product.objects.create(name="Loaf", price="2.00", category=bread)
+    Product.objects.create(name="Flour", price="4.00", category=food)
+    with django_assert_num_queries(1):
+        r = client.get(reverse("category-avg-price", args=[food.id]))
+    assert r.data == {"category": "Food", "average_price": Decimal("3")}
+
+
+def test_price_stats_endpoint(client, tree):
+    root, food, bread, _ = tree
+    Product.objects.create(name="Loaf", price="2.00", category=bread)
+    Product.objects.create(name="Flour", price="4.00", category=food)
+    r = client.get(reverse("category-price-stats", args=[food.id]))
+    assert r.status_code == 200
+    assert r.data["direct"]["count"] == 1
+    assert r.data["subtree"]["min_price"] == Decimal("2.00")
+    assert r.data["subtree"]["max_price"] == Decimal("4.00")
+    assert client.get(reverse("category-price-stats", args=[999])).status_code == 404
+
+
+def test_a_missing_row_is_computed_on_its_own(client, tree):
+    root, food, bread, tech = tree
+    Product.objects.create(name="Loaf", price="2.00", category=bread)
+    Product.objects.create(name="Flour", price="4.00", category=food)
+    CategoryPriceStats.objects.filter(category__in=[food, tech]).delete()
+    r = client.get(reverse("category-price-stats", args=[food.id]))
+    assert (r.data["direct"]["count"], r.data["subtree"]["count"]) == (1, 2)
+    assert r.data["subtree"]["min_price"] == Decimal("2.00")
+    # only the requested row is stored
+    assert not CategoryPriceStats.objects.filter(category=tech).exists()
+
+
+def test_rows_missing_from_before_the_rollup_are_not_zero_seeded(client, tree):
+    root, food, bread, tech = tree
+    Product.objects.create(name="Loaf", price="10.00", category=bread)
+    CategoryPriceStats.objects.all().delete()
+    Product.objects.create(name="Roll", price="20.00", category=bread)
+    r = client.get(reverse("category-avg-price", args=[bread.id]))
+    assert r.data["average_price"] == Decimal("15")
+    r = client.get(reverse("category-price-stats", args=[root.id]))
+    assert (r.data["subtree"]["count"], r.data["subtree"]["min_price"]) == (2, Decimal("10.00"))
+
+    CategoryPriceStats.objects.all().delete()
+    Product.objects.create(name="Phone", price="100.00", category=tech)
+    refresh_categories([tech.id])
+    assert find_inconsistencies() == []
+
+
+def test_check_and_rebuild_commands(tree):
+    root, food, bread, _ = tree
+    Product.objects.create(name="Loaf", price="2.00", category=bread)
+    CategoryPriceStats.objects.filter(category=food).update(subtree_count=7)
+    with pytest.raises(CommandError):
+        call_command("check_category_stats")
+    call_command("rebuild_category_stats")
+    call_command("check_category_stats")
+    assert stats(food).subtree_count == 1
@@ -0,0 +1,128 @@
+import io
+import json
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.urls import reverse
+
+from shop.models import Category, CategoryPriceStats, Product
+from shop.product_import import import_products
+from shop.search import search_ids
+
+
+@pytest.fixture()
+def admin(client):
+    user = User.objects.create_superuser(username="admin", password="pass")
+    client.force_authenticate(user)
+    return user
+
+
+CSV = (
+    "name,description,price,stock_quantity,category_name\n"
+    "Phone,Smart phone,699.00,5,electronics\n"
+    "Cable,,9.99,,Electronics\n"
+    "Broken,,not-a-price,1,Electronics\n"
+    "Lost,,1.00,1,Nowhere\n"
+)
+
+
+@pytest.mark.django_db
+def test_csv_import_reports_rejected_rows(category):
+    report = import_products(io.BytesIO(CSV.encode()), "csv")
+    assert (report.created, report.updated, report.error_count) == (2, 0, 2)
+    assert [e["line"] for e in report.errors] == [4, 5]
+    assert set(report.errors[0]["errors"]) == {"price"}
+    assert set(report.errors[1]["errors"]) == {"category"}
+    cable = Product.objects.get(name="Cable")
+    assert (cable.category, cable.stock_quantity, cable.price) == (category, 100, Decimal("9.99"))
+
+
+@pytest.mark.django_db
+def test_ndjson_rows_with_an_id_update_in_place(category, product):
+    other = Category.objects.create(name="Audio")
+    lines = [
+        {"id": product.id, "name": "Phone 2", "price": "650.00", "category_id": other.id},
+        {"name": "Speaker", "price": 40, "category_id": other.id, "is_active": False},
+        {"id": 999999, "name": "Ghost", "price": "1.00", "category_id": other.id},
+        "not an object",
+    ]
+    body = "\n".join(json.dumps(line) for line in lines) + "\n{oops\n"
+    report = import_products(io.StringIO(body), "ndjson")
+    assert (report.created, report.updated) == (1, 1)
+    assert [(e["line"], list(e["errors"])) for e in report.errors] == [(4, ["row"]), (5, ["row"]), (3, ["id"])]
+    product.refresh_from_db()
+    assert (product.name, product.price, product.category) == ("Phone 2", Decimal("650.00"), other)
+    assert Product.objects.get(name="Speaker").is_active is False
+
+
+@pytest.mark.django_db
+def test_partial_update_keeps_the_columns_it_does_not_carry(category):
+    product = Product.objects.create(
+        name="Phone", description="keep me", price="699.00", category=category, stock_quantity=3, is_active=False
+    )
+    body = f"id,name,price,category_id\n{product.id},Phone X,650.00,{category.id}\n"
+    report = import_products(io.BytesIO(body.encode()), "csv")
+    assert (report.updated, report.error_count) == (1, 0)
+    product.refresh_from_db()
+    assert (product.name, product.price) == ("Phone X", Decimal("650.00"))
+    assert (product.description, product.stock_quantity, product.is_active) == ("keep me", 3, False)
+
+    import_products(io.StringIO(json.dumps({"id": product.id, "stock_quantity": 7}) + "\n"), "ndjson")
+    product.refresh_from_db()
+    assert (product.name, product.stock_quantity, product.category) == ("Phone X", 7, category)
+
+
+@pytest.mark.django_db
+def test_import_refreshes_derived_data(category):
+    import_products(io.BytesIO(CSV.encode()), "csv", batch_size=1, chunk_size=1)
+    assert CategoryPriceStats.objects.get(category=category).direct_count == 2
+    assert [pk for pk, _ in search_ids("cable")] == [Product.objects.get(name="Cable").id]
+
+
+@pytest.mark.django_db
+def test_import_refreshes_only_the_categories_it_touched(category, product):
+    audio, books = Category.objects.create(name="Audio"), Category.objects.create(name="Books")
+    CategoryPriceStats.objects.filter(category=books).update(direct_count=42)  # stale, but not touched
+    body = json.dumps({"id": product.id, "category_id": audio.id}) + "\n"
+    import_products(io.StringIO(body), "ndjson")
+    stats = {s.category_id: s for s in CategoryPriceStats.objects.all()}
+    assert (stats[category.id].direct_count, stats[category.id].direct_max) == (0, None)
+    assert (stats[audio.id].direct_count, stats[audio.id].subtree_max) == (1, Decimal("699.00"))
+    assert stats[books.id].direct_count == 42
+    assert [pk for pk, _ in search_ids("phone audio")] == [product.id]
+
+
+@pytest.mark.django_db
+def test_import_endpoint_streams_the_body(client, admin, category):
+    url = reverse("product-import")
+    r = client.generic("POST", url, CSV.encode(), content_type="text/csv")
+    assert r.status_code == 200
+    assert (r.data["created"], r.data["error_count"]) == (2, 2)
+
+    upload = SimpleUploadedFile("more.ndjson", b'{"name": "Mouse", "price": "5", "category_name": "electronics"}\n')
+    r = client.post(url, {"file": upload}, format="multipart")
+    assert r.data["created"] == 1
+    assert client.generic("POST", url, b"<xml/>", content_type="application/xml").status_code == 415
+    r = client.generic("POST", url, b"title\nx\n", content_type="text/csv")
+    assert r.status_code == 400
+
+
+@pytest.mark.django_db
+def test_import_endpoint_is_for_staff(client, user):
+    client.force_authenticate(user)
+    r = client.generic("POST", reverse("product-import"), CSV.encode(), content_type="text/csv")
+    assert r.status_code == 403
+    assert not Product.objects.exists()
+
+
+@pytest.mark.django_db
+def test_import_products_command(tmp_path, category, capsys):
+    path = tmp_path / "catalogue.csv"
+    path.write_text(CSV)
+    call_command("import_products", str(path), "--batch-size", "2")
+    out, err = capsys.readouterr()
+    assert "Created 2 and updated 0 products" in out
+    assert "line 4: price:" in err
@@ -0,0 +1,146 @@
+import itertools
+from collections import namedtuple
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.urls import URLPattern, resolve, reverse
+
+from shop import api_urls, urls
+from shop.models import Category, Customer, Product
+from shop.orders import create_order
+
+# every endpoint is measured once the database holds 1, 10 and then 100 of everything; a budget
+# that holds at all three cannot hide a query per row (some steps up once, e.g. when a page fills)
+SCALES = (1, 10, 100)
+
+
+class World:
+    """Categories (a binary tree), products, customers and orders grown to `n` of each between requests."""
+
+    def __init__(self, customer):
+        self.customer = customer
+        self.admin = User.objects.create_superuser(username="admin")
+        self.categories, self.products, self.customers = [], [], []
+        self.orders = 0
+        self.big_order = None
+        self.serial = itertools.count()
+
+    def grow(self, n):
+        while len(self.categories) < n:
+            i = len(self.categories)
+            parent = self.categories[(i - 1) // 2] if i else None
+            self.categories.append(Category.objects.create(name=f"Category {i}", parent=parent))
+        while len(self.products) < n:
+            i = len(self.products)
+            self.products.append(Product.objects.create(
+                name=f"Item {i}", description="A thing", price=f"{i + 1}.00",
+                category=self.categories[i], stock_quantity=10000,
+            ))
+        while len(self.customers) < n:
+            user = User.objects.create_user(username=f"shopper{len(self.customers)}")  # no password: hashing is slow
+            self.customers.append(Customer.objects.create(user=user, phone=f"+2547{len(self.customers):08d}"))
+        while self.orders < n:
+            pair = self.products[self.orders % len(self.products)], self.products[-1]
+            create_order(self.customer, [{"product_id": p.id, "quantity": 1} for p in pair])
+            self.orders += 1
+        # one order holding every product, for the order detail page
+        self.big_order = create_order(self.customer, [{"product_id": p.id, "quantity": 1} for p in self.products])[0]
+
+    def import_csv(self, n):
+        rows = [f"Imported {next(self.serial)},,{i + 1}.00,5,Category 0" for i in range(n)]
+        return "name,description,price,stock_quantity,category_name\n" + "\n".join(rows) + "\n"
+
+
+Case = namedtuple("Case", "name budget user send args status", defaults=("customer", None, None, 200))
+
+
+def get(client, url, world, n):
+    return client.get(url)
+
+
+def get_streamed(client, url, world, n):
+    response = client.get(url)
+    b"".join(response.streaming_content)
+    return response
+
+
+CASES = [
+    # shop/urls.py
+    Case("home", 3),
+    Case("login", 2, status=302),
+    Case("logout", 4, status=302),
+    Case("dashboard", 9),
+    Case("collect-phone", 5, status=302),
+    Case("product-list", 8),
+    Case("order_product", 18, status=302, args=lambda w: [w.products[-1].id],
+         send=lambda client, url, w, n: client.post(url, {"quantity": 1})),
+    Case("orders", 5),
+    Case("set_usertype", 4, send=lambda client, url, w, n: client.post(url, {"usertype": "normal"}, format="json")),
+    Case("api-docs", 0),
+    Case("guide", 0),
+    # shop/api_urls.py
+    Case("category-list-create", 8),
+    Case("category-detail", 8, args=lambda w: [w.categories[-1].id]),
+    Case("category-avg-price", 3, args=lambda w: [w.categories[0].id]),
+    Case("category-price-stats", 3, args=lambda w: [w.categories[0].id]),
+    Case("product-list-create", 10),
+    Case("product-import", 18, user="admin",
+         send=lambda client, url, w, n: client.generic("POST", url, w.import_csv(n).encode(), content_type="text/csv")),
+    Case("customer-list-create", 4),
+    Case("user-create", 5, status=201, send=lambda client, url, w, n: client.post(url, {
+        "username": f"new{next(w.serial)}", "password": "pass", "first_name": "New", "phone": f"+25471{next(w.serial):07d}",
+    }, format="json")),
+    Case("order-create", 7),
+    Case("order-export", 4, user="admin", send=get_streamed),
+    Case("order-detail", 7, args=lambda w: [w.big_order.order_number]),
+]
+
+
+# "home" and "logout" are also project-level names, so endpoints are looked up in their own urlconf
+MOUNTS = {urls: "/shop", api_urls: "/api"}
+
+
+def url_names(urlconf):
+    return {pattern.name for pattern in urlconf.urlpatterns if isinstance(pattern, URLPattern) and pattern.name}
+
+
+def endpoint(name, args=None):
+    urlconf = next(urlconf for urlconf in MOUNTS if name in url_names(urlconf))
+    return MOUNTS[urlconf] + reverse(name, urlconf=urlconf, args=args)
+
+
+def test_every_endpoint_has_a_budget():
+    assert url_names(urls) | url_names(api_urls) == {case.name for case in CASES}
+    for case in CASES:
+        assert resolve(endpoint(case.name, [1] if case.args else None)).url_name == case.name
+
+
+@pytest.fixture(autouse=True)
+def check_the_database_every_time(settings):
+    # the worst case, and the same whatever the timing
+    settings.CATEGORY_TREE_CHECK_INTERVAL = 0
+    settings.RESPONSE_CACHE_CHECK_INTERVAL = 0
+
+
+@pytest.fixture()
+def world(customer):
+    return World(customer)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("case", CASES, ids=lambda case: case.name)
+def test_query_budget(case, world, client, query_budget):
+    counts = {}
+    for n in SCALES:
+        world.grow(n)
+        cache.clear()  # measure the uncached path
+        client.logout()
+        if case.user:
+            client.force_login(world.admin if case.user == "admin" else world.customer.user)
+        url = endpoint(case.name, case.args(world) if case.args else None)
+        label = f"{case.name} with {n} rows" + (f" (after {counts} at smaller scales)" if counts else "")
+        with query_budget(case.budget, label) as recorder:
+            response = (case.send or get)(client, url, world, n)
+        assert response.status_code == case.status, label
+        counts[n] = len(recorder)
@@ -0,0 +1,164 @@
+# shop/tests/test_response_cache.py
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.urls import reverse
+from django.utils import timezone
+from shop.models import Category, Product
+from shop.response_cache import get_counters, invalidate_responses
+
+
+@pytest.mark.django_db
+def test_second_request_is_served_from_cache(client, product):
+    url = reverse("product-list-create")
+    first = client.get(url)
+    second = client.get(url)
+    assert first["X-Cache"] == "MISS" and second["X-Cache"] == "HIT"
+    assert second.content == first.content
+    assert second["Content-Type"] == first["Content-Type"]
+    assert get_counters()["product-list-create"] == {"hit": 1, "miss": 1}
+
+
+@pytest.mark.django_db
+def test_query_params_are_normalized(client, category, product):
+    url = reverse("product-list-create")
+    client.get(url + f"?category_id={category.id}&page_size=10")
+    assert client.get(url + f"?page_size=10&category_id={category.id}&category_name=")["X-Cache"] == "HIT"
+    assert client.get(url + "?page_size=5")["X-Cache"] == "MISS"
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("change", ["save", "delete", "category", "move", "stock"])
+def test_writes_invalidate_cached_responses(client, category, product, change):
+    url = reverse("product-list-create")
+    client.get(url)
+    if change == "save":
+        product.price = "1.00"
+        product.save()
+    elif change == "delete":
+        product.delete()
+    elif change == "category":
+        Category.objects.create(name="Books")
+    elif change == "move":
+        other = Category.objects.create(name="Books")
+        invalidate_responses()
+        client.get(url)
+        node = Category.objects.get(pk=category.pk)
+        node.move_to(Category.objects.get(pk=other.pk))
+    else:
+        from shop.stock import reserve_stock
+        reserve_stock({product.id: 1})
+    response = client.get(url)
+    assert response["X-Cache"] == "MISS"
+
+
+@pytest.mark.django_db
+def test_writes_made_by_another_worker_are_picked_up(client, product, settings):
+    settings.RESPONSE_CACHE_CHECK_INTERVAL = 0
+    url = reverse("product-list-create")
+    client.get(url)
+    assert client.get(url)["X-Cache"] == "HIT"
+    # as another worker would: no signal reaches this worker's cache
+    Product.objects.filter(pk=product.pk).update(price="1.00", updated_at=timezone.now())
+    response = client.get(url)
+    assert response["X-Cache"] == "MISS" and response.data[0]["price"] == "1.00"
+
+
+@pytest.mark.django_db
+def test_responses_are_cached_per_host(client, product, settings):
+    settings.ALLOWED_HOSTS = ["shop.example", "testserver"]
+    url = reverse("product-list-create") + "?page_size=1"
+    Product.objects.create(name="Pen", price="2.00", category=product.category)
+    client.get(url)
+    response = client.get(url, HTTP_HOST="shop.example")
+    assert response["X-Cache"] == "MISS"
+    assert "http://shop.example/" in response["Link"]
+
+
+@pytest.mark.django_db
+def test_post_is_never_cached(client, category):
+    url = reverse("product-list-create")
+    client.get(url)
+    r = client.post(url, {"name": "Laptop", "price": "10.00", "category_id": category.id}, format="json")
+    assert r.status_code == 201 and not r.has_header("X-Cache")
+    assert len(client.get(url).data) == 1
+
+
+@pytest.mark.django_db
+def test_category_detail_is_cached_per_pk(client, category):
+    other = Category.objects.create(name="Books")
+    client.get(reverse("category-detail", args=[category.id]))
+    assert client.get(reverse("category-detail", args=[other.id]))["X-Cache"] == "MISS"
+    assert client.get(reverse("category-detail", args=[category.id]))["X-Cache"] == "HIT"
+
+
+@pytest.mark.django_db
+def test_browsable_api_pages_are_not_shared(product, user):
+    from django.contrib.auth.models import User
+    from django.test import Client
+    url = reverse("product-list-create")
+    first = Client()
+    first.force_login(user)
+    assert first.get(url, HTTP_ACCEPT="text/html")["X-Cache"] == "MISS"
+    second = Client()
+    second.force_login(User.objects.create_user(username="u2"))
+    response = second.get(url, HTTP_ACCEPT="text/html")
+    assert response["X-Cache"] == "MISS"
+    assert user.username not in response.content.decode()
+
+
+@pytest.fixture()
+def shared_cache(settings, tmp_path):
+    settings.CACHES = {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+        "responses": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": str(tmp_path)},
+    }
+    settings.RESPONSE_CACHE_ALIAS = "responses"
+
+
+@pytest.mark.django_db
+def test_file_based_backend(client, product, shared_cache, tmp_path):
+    url = reverse("category-list-create")
+    assert client.get(url)["X-Cache"] == "MISS"
+    assert client.get(url)["X-Cache"] == "HIT"
+    assert any(tmp_path.iterdir())
+
+
+@pytest.mark.django_db
+def test_products_page_is_cached_per_browser(product):
+    from django.test import Client
+    web = Client()
+    url = reverse("product-list")
+    assert not web.get(url).has_header("X-Cache")  # no CSRF cookie yet
+    web.cookies["csrftoken"] = "a" * 32
+    assert web.get(url)["X-Cache"] == "MISS"
+    assert web.get(url)["X-Cache"] == "HIT"
+    other = Client()
+    other.cookies["csrftoken"] = "b" * 32
+    assert other.get(url)["X-Cache"] == "MISS"
+
+
+@pytest.mark.django_db
+def test_stats_command(client, product, capsys, shared_cache):
+    client.get(reverse("product-list-create"))
+    call_command("response_cache_stats", "--reset")
+    assert "product-list-create" in capsys.readouterr().out
+    assert get_counters()["product-list-create"] == {"hit": 0, "miss": 0}
+
+
+def test_stats_command_refuses_a_per_process_cache():
+    with pytest.raises(CommandError, match="/metrics"):
+        call_command("response_cache_stats")
+
+
+@pytest.mark.django_db
+def test_counters_are_exposed_on_metrics(client, product, settings):
+    from shop.metrics import reset_metrics
+    settings.METRICS_TOKEN = ""
+    reset_metrics()
+    url = reverse("product-list-create")
+    client.get(url)
+    client.get(url)
+    body = client.get(reverse("metrics")).content.decode()
+    assert 'shop_response_cache_lookups_total{name="product-list-create",outcome="hit"} 1' in body
+    assert 'shop_response_cache_lookups_total{name="product-list-create",outcome="miss"} 1' in body
@@ -0,0 +1,85 @@
+# shop/tests/test_search.py
+import re
+import pytest
+from django.test import Client
+from django.urls import reverse
+from shop.models import Category, Product
+from shop.search import rebuild_index, search_ids
+
+
+def names(response):
+    return [row["name"] for row in response.data]
+
+
+@pytest.fixture()
+def catalogue(category):
+    phones = Category.objects.create(name="Phones", parent=category)
+    books = Category.objects.create(name="Books")
+    return {
+        "phone": Product.objects.create(name="Smart phone", description="Android", price="300.00", category=phones),
+        "case": Product.objects.create(name="Leather case", description="Fits any phone", price="20.00", category=phones),
+        "novel": Product.objects.create(name="Mystery novel", description="Paperback", price="9.00", category=books),
+        "charger": Product.objects.create(name="Charger", description="USB", price="15.00", category=category),
+    }
+
+
+@pytest.mark.django_db
+def test_name_matches_rank_above_description_matches(client, catalogue):
+    r = client.get(reverse("product-list-create") + "?search=phone")
+    assert names(r) == ["Smart phone", "Leather case"]
+
+
+@pytest.mark.django_db
+def test_search_matches_category_path_and_stems(client, catalogue):
+    r = client.get(reverse("product-list-create") + "?search=electronics")
+    assert set(names(r)) == {"Smart phone", "Leather case", "Charger"}
+    assert names(client.get(reverse("product-list-create") + "?search=phones"))[0] == "Smart phone"
+
+
+@pytest.mark.django_db
+def test_search_keeps_category_filters(client, catalogue, category):
+    r = client.get(reverse("product-list-create") + "?search=phone&category_name=Electronics")
+    assert names(r) == []
+    r = client.get(reverse("product-list-create") + f"?search=electronics&category_id={category.id}")
+    assert names(r) == ["Charger"]
+
+
+@pytest.mark.django_db
+def test_search_results_are_paginated(client, catalogue):
+    url = reverse("product-list-create") + "?search=electronics&page_size=2"
+    first = client.get(url)
+    next_url = re.search(r'<([^>]+)>; rel="next"', first["Link"]).group(1)
+    second = client.get(next_url)
+    assert len(first.data) == 2 and len(second.data) == 1
+    assert not set(names(first)) & set(names(second))
+
+
+@pytest.mark.django_db
+def test_index_follows_renames_moves_and_deletes(catalogue, category):
+    phones = Category.objects.get(name="Phones")
+    phones.name = "Mobiles"
+    phones.save()
+    assert {pk for pk, _ in search_ids("mobiles")} == {catalogue["phone"].id, catalogue["case"].id}
+
+    books = Category.objects.get(name="Books")
+    books.move_to(Category.objects.get(pk=category.pk))
+    assert [pk for pk, _ in search_ids("mystery electronics")] == [catalogue["novel"].id]
+
+    catalogue["novel"].delete()
+    assert search_ids("mystery") == []
+
+
+@pytest.mark.django_db
+def test_rebuild_index_covers_bulk_created_products(category):
+    Product.objects.bulk_create([Product(name="Bulk kettle", price="5.00", category=category)])
+    assert search_ids("kettle") == []
+    rebuild_index()
+    assert len(search_ids("kettle")) == 1
+
+
+@pytest.mark.django_db
+def test_products_page_search(catalogue):
+    r = Client().get(reverse("product-list") + "?search=phone")
+    assert r.status_code == 200
+    assert [p.name for p in r.context["products"]] == ["Smart phone", "Leather case"]
+    assert Client().get(reverse("product-list") + "?search=phone&cursor=bad").status_code == 404
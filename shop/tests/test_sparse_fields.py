@@ -0,0 +1,89 @@
+# shop/tests/test_sparse_fields.py
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from shop.api_serializers import OrderSerializer
+from shop.models import Category, Order, Product
+from shop.orders import create_order
+
+
+@pytest.fixture()
+def products(category):
+    phones = Category.objects.create(name="Phones", parent=category)
+    return [Product.objects.create(name=f"P{i}", price="5.00", category=phones) for i in range(3)]
+
+
+@pytest.mark.django_db
+def test_fields_limit_the_product_list(client, products):
+    with CaptureQueriesContext(connection) as queries:
+        r = client.get(reverse("product-list-create") + "?fields=id,name")
+    assert [set(row) for row in r.data] == [{"id", "name"}] * 3
+    # only the conditional-GET aggregates touch the category table
+    category_reads = [q["sql"] for q in queries.captured_queries if '"shop_category"."name"' in q["sql"]]
+    assert category_reads == []
+
+
+@pytest.mark.django_db
+def test_nested_fields_match_on_both_list_paths(client, products, settings):
+    url = reverse("product-list-create") + "?fields=id,price,category_detail.full_path"
+    fast = client.get(url)
+    assert fast.data[0]["category_detail"] == {"full_path": "Electronics > Phones"}
+    settings.API_FAST_LIST_SERIALIZATION = False
+    standard = client.get(url)
+    assert standard.content == fast.content
+
+
+@pytest.mark.django_db
+def test_unrequested_full_path_is_not_computed(client, products):
+    url = reverse("category-list-create")
+    with CaptureQueriesContext(connection) as full:
+        client.get(url)
+    with CaptureQueriesContext(connection) as sparse:
+        r = client.get(url + "?fields=id,name")
+    assert len(sparse) < len(full)
+    assert 'SELECT "shop_category"."id", "shop_category"."name" FROM' in sparse.captured_queries[-1]["sql"]
+    assert set(r.data[0]) == {"id", "name"}
+
+
+@pytest.mark.django_db
+def test_expand_parent_and_user(client, products, customer):
+    child = Category.objects.get(name="Phones")
+    r = client.get(reverse("category-detail", args=[child.id]) + "?expand=parent&fields=name,parent.name")
+    assert r.data == {"name": "Phones", "parent": {"name": "Electronics"}}
+    r = client.get(reverse("customer-list-create") + "?expand=user&fields=id,user.username")
+    assert r.data[0]["user"] == {"username": customer.user.username}
+
+
+@pytest.mark.django_db
+def test_post_ignores_fields_for_input(client, category):
+    url = reverse("product-list-create") + "?fields=id"
+    r = client.post(url, {"name": "Lamp", "price": "3.00", "category_id": category.id}, format="json")
+    assert r.status_code == 201
+    assert set(r.data) == {"id"}
+
+
+@pytest.mark.django_db
+def test_order_create_response_fields(client, customer, products):
+    url = reverse("order-create") + "?fields=order_number,total_amount"
+    payload = {"customer_id": customer.id, "items": [{"product_id": products[0].id, "quantity": 2}]}
+    r = client.post(url, payload, format="json")
+    assert r.status_code == 201
+    assert set(r.data["order"]) == {"order_number", "total_amount"}
+
+
+@pytest.mark.django_db
+def test_optimized_order_queryset_has_flat_query_count(customer, products):
+    def render(fields):
+        serializer = OrderSerializer(many=True, fields=fields).child
+        queryset = serializer.optimize_queryset(Order.objects.all())
+        with CaptureQueriesContext(connection) as queries:
+            OrderSerializer(queryset, many=True, fields=fields).data
+        return len(queries)
+
+    create_order(customer, [{"product_id": products[0].id}])
+    one = render(None)
+    for product in products:
+        create_order(customer, [{"product_id": product.id, "quantity": 1}])
+    assert render(None) == one
+    assert render({"order_number": {}}) == 1
@@ -0,0 +1,65 @@
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.urls import reverse
+
+from shop.models import Category, CategoryPriceStats, Order, Product
+from shop.orders import create_order
+from shop.stock import OutOfStock, reserve_stock
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(params=["optimistic", "locking"])
+def mode(request, settings):
+    settings.STOCK_RESERVATION_MODE = request.param
+    return request.param
+
+
+def test_reserve_decrements_all_items(mode, product, category):
+    other = Product.objects.create(name="Case", price="5.00", category=category, stock_quantity=3)
+    reserve_stock({product.id: 4, other.id: 3})
+    product.refresh_from_db()
+    other.refresh_from_db()
+    assert (product.stock_quantity, other.stock_quantity) == (6, 0)
+
+
+def test_reserve_is_all_or_nothing(mode, product, category):
+    other = Product.objects.create(name="Case", price="5.00", category=category, stock_quantity=1)
+    with pytest.raises(OutOfStock) as exc:
+        reserve_stock({product.id: 4, other.id: 2})
+    assert exc.value.shortages == {other.id: 1}
+    product.refresh_from_db()
+    assert product.stock_quantity == 10
+
+
+def test_order_create_rejects_oversell(client, customer, product):
+    url = reverse("order-create")
+    data = {"customer_id": customer.id, "items": [{"product_id": product.id, "quantity": 11}]}
+    r = client.post(url, data, format="json")
+    assert r.status_code == 409
+    assert r.data["shortages"] == {product.id: 10}
+    assert not Order.objects.exists()
+
+
+def test_cancelling_order_releases_stock_once(customer, product):
+    order, _ = create_order(customer, [{"product_id": product.id, "quantity": 4}])
+    product.refresh_from_db()
+    assert product.stock_quantity == 6
+
+    order.status = "cancelled"
+    order.save()
+    order.save()
+    product.refresh_from_db()
+    assert product.stock_quantity == 10
+
+
+@pytest.mark.django_db(transaction=True)
+def test_stock_benchmark_has_no_lost_updates(mode, capsys):
+    call_command("stock_benchmark", threads=4, orders=15, stock=40)
+    out = capsys.readouterr().out
+    assert "placed=40 out_of_stock=20" in out
+    assert "final_stock=0" in out
+    # it cleans up after itself
+    assert not Category.objects.exists() and not CategoryPriceStats.objects.exists()
+    assert not Product.objects.exists() and not User.objects.exists()
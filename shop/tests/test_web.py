@@ -71,15 +71,14 @@ def test_sendmail_failure(mock_send):
     result = services.sendmail("subject", "body", toEmails=["a@b.com"])
     assert "Failed" in result
 
-@patch("shop.services.africastalking.SMS.send", return_value={"SMSMessageData": {"Recipients":[{"status":"Success"}]}})
-@patch("shop.services.africastalking.initialize")
-def test_sendText_success(mock_init, mock_send):
+def test_sendText_success(settings):
+    settings.SMS_BACKEND = "shop.sms.FakeBackend"
     result = services.sendText("+254700000000", "hi")
     assert result == "Success"
 
-@patch("shop.services.africastalking.SMS.send", side_effect=Exception("boom"))
-@patch("shop.services.africastalking.initialize")
-def test_sendText_failure(mock_init, mock_send):
+def test_sendText_failure(settings):
+    settings.SMS_BACKEND = "shop.sms.FakeBackend"
+    settings.SMS_BACKEND_OPTIONS = {"failure_rate": 1.0}
     result = services.sendText("+254700000000", "hi")
     assert "Failed" in result
 
@@ -2,55 +2,109 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.contrib.auth import logout
-from django.http import JsonResponse, HttpResponseBadRequest, HttpResponseForbidden
+from django.http import HttpResponse, JsonResponse, HttpResponseBadRequest, HttpResponseForbidden, Http404
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
 from django.views.decorators.csrf import csrf_exempt
+from django.db import transaction
+from django.db.models import Prefetch
+from django.core.exceptions import ValidationError
+from django.conf import settings
+from rest_framework.exceptions import NotFound
 import json
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
+from urllib.parse import urlencode
 
 from .models import Product, Category, Customer, Order, OrderItem
 from .forms import CustomerPhoneForm
+from .categories import get_category_options, get_subtree_ids
+from .conditional import conditional_get, products_page_state
+from .response_cache import cached_fragment, cached_response
+from .pagination import OrderKeysetPagination, paginate_keyset, paginate_search
+from .orders import create_order, filter_orders
+from .dashboard import get_dashboard
+from .metrics import render_metrics
+from .stock import OutOfStock
+from .notifications import queue_confirmation_messages
 import json
 
-from django.core.mail import send_mail
-from django.contrib.auth.models import User
-from .services import sendmail,sendText
 from django.views.generic import TemplateView
 
 def home_view(request):
-    products = Product.objects.filter(is_active=True)[:10]
-    print(products)
+    products = Product.objects.filter(is_active=True).select_related("category")[:10]
     return render(request, "home.html", {"products": products})
 
+# stands in for the CSRF token in the cached product grid; each response fills in its own
+CSRF_PLACEHOLDER = "__csrf_token__"
+CATALOGUE_PARAMS = ("category", "min_price", "max_price", "search", "cursor")
+
+
+def _price(value):
+    try:
+        return Decimal(value) if value else None
+    except InvalidOperation:
+        return None
+
+
+def _page_url(params, cursor):
+    if not cursor:
+        return None
+    return "?" + urlencode({**{k: v for k, v in params.items() if k != "cursor"}, "cursor": cursor})
+
+
+@conditional_get(products_page_state)
+@cached_response("product-list", vary_on_user=True)
 def products_view(request):
     products = Product.objects.filter(is_active=True)
-    categories = Category.objects.all()
+    params = {key: request.GET[key] for key in CATALOGUE_PARAMS if request.GET.get(key)}
 
     # --- Filtering ---
-    category_id = request.GET.get("category")
-    min_price = request.GET.get("min_price")
-    max_price = request.GET.get("max_price")
+    category_id = params.get("category")
+    min_price = _price(params.get("min_price"))
+    max_price = _price(params.get("max_price"))
 
     if category_id:
-        category = get_object_or_404(Category, id=category_id)
         # include selected category + all descendants
-        category_ids = category.get_descendants(include_self=True).values_list("id", flat=True)
+        try:
+            category_ids = get_subtree_ids(category_id)
+        except Category.DoesNotExist:
+            raise Http404("Category not found")
         products = products.filter(category_id__in=category_ids)
 
-    if min_price:
-        try:
-            products = products.filter(price__gte=Decimal(min_price))
-        except:
-            pass
+    if min_price is not None:
+        products = products.filter(price__gte=min_price)
+
+    if max_price is not None:
+        products = products.filter(price__lte=max_price)
 
-    if max_price:
+    # --- One page: ranked when searching, newest first by keyset otherwise ---
+    search = params.get("search", "").strip()
+    page_size = getattr(settings, "API_PAGE_SIZE", 50)
+
+    def render_grid():
         try:
-            products = products.filter(price__lte=Decimal(max_price))
-        except:
-            pass
+            if search:
+                rows, next_cursor = paginate_search(products, search, params.get("cursor"), page_size)
+                previous_cursor = None
+            else:
+                rows, next_cursor, previous_cursor = paginate_keyset(products, params.get("cursor"), page_size)
+        except NotFound:
+            raise Http404("Invalid cursor")
+        return render_to_string("product_grid.html", {
+            "products": rows,
+            "next_url": _page_url(params, next_cursor),
+            "previous_url": _page_url(params, previous_cursor),
+            "csrf_placeholder": CSRF_PLACEHOLDER,
+        })
+
+    # shared by every visitor, per filter combination and page; dropped on product and category saves
+    grid = cached_fragment("product-grid", sorted(params.items()) + [page_size], render_grid)
 
     context = {
-        "products": products,
-        "categories": categories,
+        "grid": mark_safe(grid.replace(CSRF_PLACEHOLDER, get_token(request))),
+        "category_options": get_category_options(),
+        "search": search,
     }
     return render(request, "products.html", context)
 
@@ -58,58 +112,8 @@ def products_view(request):
 
 @login_required
 def dashboard_view(request):
-    customer, created = Customer.objects.get_or_create(user=request.user)
-    print('customer',customer)
-    print('user',request.user)
-    # customer = request.user.customer  # access your Customer model
-        # Get last 5 orders of the logged-in user
-    recent_orders = Order.objects.filter(customer=customer).order_by('-created_at')[:5]
-
-    # Get some products (you can customize this later)
-    products = Product.objects.filter(is_active=True)[:5]
-
-    context = {
-        "recent_orders": recent_orders,
-        "products": products
-    }
-    return render(request, "dashboard.html", {"context": context})
-
-
-def send_confirmation_messages(customer,user,order,product,quantity):
-    
-    phone_number = customer.phone  # make sure phone is saved in international format, e.g., +2547xxxxxxx
-    print('customer_phone',phone_number)
-    text_status=''
-
-    if phone_number:
-        message = f"Hello {customer.user.first_name}, your order {order.order_number} for {quantity} x {product.name} totaling ${order.total_amount} has been received. Thank you for shopping with us!"
-        text_status = sendText(phone_number=phone_number,message=message)
-    else:
-        text_status='User has no phone number'
-
-    admin_users = User.objects.filter(is_staff=True, is_active=True)
-    admin_emails = [u.email for u in admin_users if u.email]
-
-
-    # for email in admin_emails:
-    subject = f"New Order Placed: {order.order_number}"
-    message = f"""
-    Hello Admin,
-
-    A new order has been placed:
-
-    Customer: {user.get_full_name()} ({customer.phone})
-    Product: {product.name}
-    Quantity: {quantity}
-    Total: ${order.total_amount}
-    Text Status: {text_status}
-
-    Please review the order in the dashboard.
-    """
-    mail_res=sendmail(subject=subject,message=message,fromEmail='info@austino.online',toEmails=admin_emails)
-        # print(mail_res)
-
-    return({'confirmation_text_status':text_status,'admin_email_status':mail_res})
+    summary, featured_products = get_dashboard(request.user)
+    return render(request, "dashboard.html", {"summary": summary, "products": featured_products})
 
 
 @login_required
@@ -138,24 +142,19 @@ def order_product(request, product_id):
         if quantity <= 0:
             return HttpResponseBadRequest("Quantity must be at least 1.")
 
-        # Create order + order item
-        order = Order.objects.create(customer=customer)
-        OrderItem.objects.create(
-            order=order,
-            product=product,
-            quantity=quantity,
-            unit_price=product.price,
-        )
-        order.calculate_total()
+        # Create order + order item, queueing confirmation messages in the same transaction
+        try:
+            with transaction.atomic():
+                order, _ = create_order(customer, [{"product_id": product.id, "quantity": quantity}])
+                queue_confirmation_messages(
+                    customer=customer, user=user, order=order, product=product, quantity=quantity
+                )
+        except OutOfStock as e:
+            messages.error(request, f"Only {e.shortages[product.id]} x {product.name} left in stock.")
+            return redirect("product-list")
 
         messages.success(request, f"{product.name} added to your order!")
 
-        # Send confirmation messages
-        messages_results = send_confirmation_messages(
-            customer=customer, user=user, order=order, product=product, quantity=quantity
-        )
-        print("messages_results", messages_results)
-
         return redirect("orders")
 
     # If not POST → redirect
@@ -165,20 +164,40 @@ def order_product(request, product_id):
 
 @login_required
 def orders_view(request):
-    orders = Order.objects.all()
+    """The requesting customer's orders, newest first, a keyset page at a time."""
+    customer = getattr(request.user, "customer", None)
+    orders = Order.objects.filter(customer=customer) if customer else Order.objects.none()
 
     status = request.GET.get("status")
-    if status and status != "all":
-        orders = orders.filter(status=status)
-
-    start_date = request.GET.get("start")
-    end_date = request.GET.get("end")
-    if start_date:
-        orders = orders.filter(created_at__gte=start_date)
-    if end_date:
-        orders = orders.filter(created_at__lte=end_date)
+    filter_errors = {}
+    try:
+        orders = filter_orders(
+            orders, status if status != "all" else None, request.GET.get("start"), request.GET.get("end")
+        )
+    except ValidationError as e:
+        filter_errors = e.message_dict
+        orders = orders.none()
+
+    # two queries per page however many orders and items it holds: the orders, then their items with products
+    items = OrderItem.objects.select_related("product").only(
+        "order_id", "quantity", "unit_price", "product__id", "product__name",
+    )
+    orders = orders.prefetch_related(Prefetch("items", items))
+    try:
+        page, next_cursor, previous_cursor = paginate_keyset(
+            orders, request.GET.get("cursor"), getattr(settings, "ORDERS_PAGE_SIZE", 20), OrderKeysetPagination
+        )
+    except NotFound:
+        raise Http404("Invalid cursor")
 
-    return render(request, "orders.html", {"orders": orders})
+    params = {key: request.GET[key] for key in ("status", "start", "end") if request.GET.get(key)}
+    return render(request, "orders.html", {
+        "orders": page,
+        "status_choices": Order.STATUS_CHOICES,
+        "filter_errors": filter_errors,
+        "next_url": _page_url(params, next_cursor),
+        "previous_url": _page_url(params, previous_cursor),
+    })
 
 
 @login_required
@@ -234,4 +253,12 @@ def set_usertype(request):
 
 
 class DocsView(TemplateView):
-    template_name = "docs.html"
\ No newline at end of file
+    template_name = "docs.html"
+
+
+def metrics_view(request):
+    """Request histograms in the Prometheus text format (bearer METRICS_TOKEN when set)."""
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return HttpResponseForbidden("Forbidden")
+    return HttpResponse(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")